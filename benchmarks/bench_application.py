@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Compare building the application per request with a per-worker one.
+
+Run it with ``python benchmarks/bench_application.py``.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import shutil
+import tempfile
+import time
+
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse
+
+from timegate.application import create_app
+
+REQUESTS = 2000
+URL = '/timegate/http://www.example.com/resourceA'
+
+
+def requests_per_second(app, count=REQUESTS):
+    """Return the number of TimeGate requests served per second."""
+    client = Client(app, BaseResponse)
+    start = time.time()
+    for _ in range(count):
+        assert client.get(URL).status_code == 302
+    return count / (time.time() - start)
+
+
+def main():
+    temp_dir = tempfile.mkdtemp()
+    # The lock and derived values directories are created next to it.
+    cache_dir = os.path.join(temp_dir, 'cache')
+    config = dict(
+        HANDLER_MODULE='simple',
+        CACHE_USE=True,
+        CACHE_FILE=cache_dir,
+    )
+
+    def per_request(environ, start_response):
+        # What ``application`` used to do on every hit.
+        return create_app(config=config)(environ, start_response)
+
+    try:
+        before = requests_per_second(per_request)
+        after = requests_per_second(create_app(config=config))
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print('per request: %10.1f req/s' % before)
+    print('per worker:  %10.1f req/s' % after)
+    print('speedup:     %10.1fx' % (after / before))
+
+
+if __name__ == '__main__':
+    main()
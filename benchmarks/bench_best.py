@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Compare linear and binary best memento selection.
+
+Run it with ``python benchmarks/bench_best.py``.
+"""
+
+from __future__ import absolute_import, print_function
+
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from dateutil.tz import tzutc
+
+from timegate.utils import (closest, closest_before, closest_before_binary,
+                            closest_binary)
+
+SIZES = (10000, 100000)
+LOOKUPS = 100
+
+
+def make_timemap(size):
+    """Build a sorted TimeMap of ``size`` mementos, one per hour."""
+    start = datetime(2000, 1, 1, tzinfo=tzutc())
+    return [('http://example.com/%d' % i, start + timedelta(hours=i))
+            for i in range(size)]
+
+
+def main():
+    random.seed(0)
+    for size in SIZES:
+        timemap = make_timemap(size)
+        first, last = timemap[0][1], timemap[-1][1]
+        targets = [first + (last - first) * random.random()
+                   for _ in range(LOOKUPS)]
+        for function in (closest, closest_binary,
+                         closest_before, closest_before_binary):
+            duration = timeit.timeit(
+                lambda: [function(timemap, t) for t in targets], number=1)
+            print('%-22s n=%-7d %10.2f us/lookup' % (
+                function.__name__, size, duration / LOOKUPS * 1e6))
+
+
+if __name__ == '__main__':
+    main()
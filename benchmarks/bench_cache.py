@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Compare pickled and binary cache entries of large TimeMaps.
+
+Run it with ``python benchmarks/bench_cache.py``.
+"""
+
+from __future__ import absolute_import, print_function
+
+import pickle
+import timeit
+from datetime import datetime, timedelta
+
+from dateutil.tz import tzutc
+
+from timegate.backends import dumps_entry, loads_entry
+from timegate.timemap import TimeMap
+
+SIZES = (1000, 100000)
+REPEAT = 5
+
+
+def make_mementos(size):
+    """Build GitHub-like mementos, one commit per hour."""
+    start = datetime(2000, 1, 1, tzinfo=tzutc())
+    return [('https://github.com/user/repo/tree/%040x' % i,
+             start + timedelta(hours=i)) for i in range(size)]
+
+
+def best_of(function):
+    """Return the best duration of a function call in milliseconds."""
+    return min(timeit.repeat(function, number=1, repeat=REPEAT)) * 1e3
+
+
+def main():
+    now = datetime.utcnow().replace(tzinfo=tzutc())
+    for size in SIZES:
+        mementos = make_mementos(size)
+        timemap = TimeMap.from_mementos(mementos)
+        entries = [
+            ('pickle', pickle.dumps((now, mementos), -1), pickle.loads),
+            ('binary', dumps_entry(now, timemap), loads_entry),
+            ('binary+prefix', dumps_entry(now, timemap, compress=True),
+             loads_entry),
+        ]
+        for name, data, loads in entries:
+            print('%-14s n=%-7d %10d bytes %9.2f ms load %9.2f ms lookup' % (
+                name, size, len(data),
+                best_of(lambda: loads(data)),
+                best_of(lambda: loads(data)[1][size // 2]),
+            ))
+
+
+if __name__ == '__main__':
+    main()
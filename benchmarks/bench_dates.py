@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Compare the fuzzy dateutil parsing of dates with the fast parsers.
+
+Run it with ``python benchmarks/bench_dates.py``. Each format is parsed
+by dateutil, by the detecting parser and by the parser of the declared
+format.
+"""
+
+from __future__ import absolute_import, print_function
+
+import time
+from datetime import datetime, timedelta
+
+from timegate.utils import date_parser, parse_fuzzy
+
+DATES = 100000
+FORMATS = [
+    ('iso8601', '%Y-%m-%dT%H:%M:%SZ'),
+    ('wayback', '%Y%m%d%H%M%S'),
+    ('rfc1123', '%a, %d %b %Y %H:%M:%S GMT'),
+]
+
+
+def seconds(parse, datestrs):
+    """Return the duration of parsing all the date strings."""
+    start = time.time()
+    for datestr in datestrs:
+        parse(datestr)
+    return time.time() - start
+
+
+def main():
+    first = datetime(2000, 1, 1)
+    dates = [first + timedelta(minutes=7 * i) for i in range(DATES)]
+    print('%d dates          dateutil   detected   declared' % DATES)
+    for name, date_format in FORMATS:
+        datestrs = [date.strftime(date_format) for date in dates]
+        print('%-20s %8.3f s %8.3f s %8.3f s' % (
+            name,
+            seconds(parse_fuzzy, datestrs),
+            seconds(date_parser(), datestrs),
+            seconds(date_parser(name), datestrs),
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Compare closing the client connections with keeping them alive.
+
+Run it with ``python benchmarks/bench_keepalive.py``. A local HTTP/1.1
+WSGI server serves the TimeGate while clients follow the TimeGate then
+the TimeMap of a resource, as Memento clients do. Through TLS each new
+connection costs a handshake more.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from timegate.application import create_app
+
+CLIENTS = 4
+HOPS = 500
+RESOURCE = 'http://www.example.com/resourceA'
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """Request handler keeping HTTP/1.1 connections alive."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately: without it, the delayed
+    # acknowledgement of the headers holds the body back.
+    disable_nagle_algorithm = True
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def hops_per_second(url, clients=CLIENTS, hops=HOPS):
+    """Return the TimeGate and TimeMap requests served per second."""
+    def client():
+        session = requests.Session()
+        for _ in range(hops):
+            response = session.get(url + '/timegate/' + RESOURCE,
+                                   allow_redirects=False)
+            assert response.status_code == 302
+            response = session.get(url + '/timemap/link/' + RESOURCE)
+            assert response.status_code == 200
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return clients * hops * 2 / (time.time() - start)
+
+
+def serve(app):
+    """Serve an application on a local port, in a background thread."""
+    server = make_server('127.0.0.1', 0, app, threaded=True,
+                         request_handler=KeepAliveRequestHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def main():
+    temp_dir = tempfile.mkdtemp()
+    # The lock and derived values directories are created next to it.
+    cache_dir = os.path.join(temp_dir, 'cache')
+    results = {}
+    try:
+        for keep_alive in (False, True):
+            server = serve(create_app(config=dict(
+                HANDLER_MODULE='simple',
+                CACHE_USE=True,
+                CACHE_FILE=cache_dir,
+                KEEP_ALIVE=keep_alive,
+            )))
+            url = 'http://%s:%d' % server.server_address
+            try:
+                results[keep_alive] = hops_per_second(url)
+            finally:
+                server.shutdown()
+                server.server_close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print('Connection: close: %10.1f req/s' % results[False])
+    print('keep-alive:        %10.1f req/s' % results[True])
+    print('speedup:           %10.1fx' % (results[True] / results[False]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Compare a connection per API request with the pooled handler session.
+
+Run it with ``python benchmarks/bench_session.py``. The stub is local and
+plain HTTP: through a network and TLS the saving per request is larger.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import time
+
+import requests
+
+from timegate.handler import Handler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub import StubServer  # noqa isort:skip
+
+REQUESTS = 500
+BODY = b'[{"sha": "0000000000000000000000000000000000000000"}]'
+
+
+def ms_per_request(get, url, count=REQUESTS):
+    """Return the mean duration of a request in milliseconds."""
+    start = time.time()
+    for i in range(count):
+        assert get(url, params={'page': i}).status_code == 200
+    return (time.time() - start) / count * 1e3
+
+
+def main():
+    stub = StubServer(
+        lambda path: (200, {'Content-Type': 'application/json'}, BODY)
+    ).start()
+    url = stub.url + '/repos/user/repo/commits'
+    try:
+        before = ms_per_request(requests.get, url)
+        after = ms_per_request(Handler().session.get, url)
+    finally:
+        stub.stop()
+
+    print('connection per request: %8.3f ms/request' % before)
+    print('pooled session:         %8.3f ms/request' % after)
+    print('saved:                  %8.3f ms/request' % (before - after))
+
+
+if __name__ == '__main__':
+    main()
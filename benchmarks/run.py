@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Benchmark suite of the TimeGate endpoints.
+
+Run it with ``python benchmarks/run.py``, ``--help`` listing its options.
+A synthetic handler retrieves TimeMaps of each size from a local stub API
+answering after the given latency. Every scenario is timed per request
+and the results are written as JSON, to be compared across releases with
+``--baseline``.
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from dateutil.tz import tzutc
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse
+
+import timegate
+from timegate.application import create_app
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import RESOURCE, SyntheticHandler, SyntheticStub  # noqa isort:skip
+
+SIZES = (1, 1000, 100000)
+LATENCIES = (0.05, )
+REQUESTS = 20
+ACCEPT_DATETIME = 'Sat, 01 Jan 2005 00:00:00 GMT'
+
+
+class NullRefresher(object):
+    """Refresher dropping the refreshes, so that stale values stay so."""
+
+    def submit(self, key, function):
+        return True
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def make_app(api, temp_dir):
+    """Build the application serving the resources of the stub API.
+
+    :param api: The base URL of the stub API.
+    :param temp_dir: The directory of the cache files, and of the lock and
+        derived values directories next to them.
+    """
+    return create_app(config=dict(
+        HANDLER_MODULE=SyntheticHandler(api),
+        BASE_URI='',
+        CACHE_USE=True,
+        CACHE_FILE=os.path.join(temp_dir, 'cache'),
+        CACHE_MAX_VALUES=1000,
+    ))
+
+
+def outdate(app, uri_r):
+    """Make the cached TimeMap of a resource stale."""
+    # Within CACHE_STALE past CACHE_TOLERANCE
+    timestamp = datetime.now(tzutc()) - timedelta(
+        seconds=app.config['CACHE_TOLERANCE'] + 60)
+    app.cache.backend.set(uri_r, (timestamp, app.cache.peek(uri_r)))
+    if app.cache.memory is not None:
+        app.cache.memory.delete(uri_r)
+
+
+def scenarios(uri_r):
+    """Return the scenarios of a resource.
+
+    :return: The list of ``(name, path, headers, prepare)`` tuples, where
+        *prepare* is None or a callable taking the application, called
+        before each request.
+    """
+    no_cache = [('Cache-Control', 'no-cache')]
+    return [
+        ('timegate', '/timegate/' + uri_r, [], None),
+        ('timegate_accept_datetime', '/timegate/' + uri_r,
+         [('Accept-Datetime', ACCEPT_DATETIME)], None),
+        ('timemap_link', '/timemap/link/' + uri_r, [], None),
+        ('timemap_json', '/timemap/json/' + uri_r, [], None),
+        ('timemap_link_miss', '/timemap/link/' + uri_r, no_cache, None),
+        ('timemap_link_stale', '/timemap/link/' + uri_r, [],
+         lambda app: outdate(app, uri_r)),
+    ]
+
+
+def summary(durations):
+    """Return the statistics of request durations, in milliseconds."""
+    durations = sorted(d * 1e3 for d in durations)
+    count = len(durations)
+    return dict(
+        requests=count,
+        mean_ms=sum(durations) / count,
+        median_ms=durations[count // 2],
+        p95_ms=durations[int(math.ceil(0.95 * count)) - 1],
+        min_ms=durations[0],
+        max_ms=durations[-1],
+        requests_per_second=count * 1e3 / sum(durations),
+    )
+
+
+def run_scenario(app, path, headers, prepare, count):
+    """Time the requests of a scenario.
+
+    :return: The list of durations in seconds.
+    """
+    client = Client(app, BaseResponse)
+    durations = []
+    for _ in range(count):
+        if prepare is not None:
+            prepare(app)
+        start = time.time()
+        response = client.get(path, headers=headers)
+        data = response.data
+        durations.append(time.time() - start)
+        assert response.status_code in (200, 302), (path, data)
+    return durations
+
+
+def partial_run(app, path, headers, prepare):
+    """Return a function running a scenario a given number of times."""
+    return lambda count: run_scenario(app, path, headers, prepare, count)
+
+
+def cold_start(api, uri_r, count):
+    """Time building an application and serving its first request.
+
+    Each application has an empty cache.
+
+    :return: The list of durations in seconds.
+    """
+    durations = []
+    for _ in range(count):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            start = time.time()
+            app = make_app(api, temp_dir)
+            response = Client(app, BaseResponse).get('/timegate/' + uri_r)
+            durations.append(time.time() - start)
+            assert response.status_code == 302
+        finally:
+            shutil.rmtree(temp_dir)
+    return durations
+
+
+def run(sizes=SIZES, latencies=LATENCIES, count=REQUESTS, only=None):
+    """Run the scenarios.
+
+    :param sizes: The numbers of mementos of the TimeMaps.
+    :param latencies: The latencies of the stub API, in seconds.
+    :param count: The number of requests of each scenario.
+    :param only: (Optional) Substring of the names of the scenarios to run.
+    :return: The list of results.
+    """
+    results = []
+    for latency in latencies:
+        stub = SyntheticStub(latency).start()
+        temp_dir = tempfile.mkdtemp()
+        try:
+            app = make_app(stub.url, temp_dir)
+            app.cache.refresher = NullRefresher()
+            for size in sizes:
+                uri_r = RESOURCE % size
+                timed = [(name, partial_run(app, path, headers, prepare))
+                         for (name, path, headers, prepare)
+                         in scenarios(uri_r)]
+                timed.append(('cold_start', lambda count, uri_r=uri_r:
+                              cold_start(stub.url, uri_r, count)))
+                # Caches the TimeMap for the scenarios of cache hits.
+                Client(app, BaseResponse).get('/timemap/link/' + uri_r)
+                for name, function in timed:
+                    if only and only not in name:
+                        continue
+                    result = dict(scenario=name, size=size, latency=latency)
+                    result.update(summary(function(count)))
+                    print('%-26s n=%-7d latency=%-5g %9.2f ms/request' % (
+                        name, size, latency, result['mean_ms']),
+                        file=sys.stderr)
+                    results.append(result)
+        finally:
+            stub.stop()
+            shutil.rmtree(temp_dir)
+    return results
+
+
+def compare(results, baseline):
+    """Print the mean duration of the results relative to a baseline."""
+    before = dict(((r['scenario'], r['size'], r['latency']), r['mean_ms'])
+                  for r in baseline['results'])
+    for result in results:
+        key = (result['scenario'], result['size'], result['latency'])
+        if key in before:
+            print('%-26s n=%-7d latency=%-5g %8.2fx the baseline time' % (
+                key + (result['mean_ms'] / before[key], )), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--sizes', default=','.join(str(size) for size in SIZES),
+        help='comma-separated numbers of mementos (default: %(default)s)')
+    parser.add_argument(
+        '--latencies', default=','.join(str(latency) for latency in LATENCIES),
+        help='comma-separated latencies of the stub API in seconds '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--requests', type=int, default=REQUESTS,
+        help='requests per scenario (default: %(default)s)')
+    parser.add_argument(
+        '--only', help='run the scenarios whose name contains this string')
+    parser.add_argument(
+        '--output', help='write the JSON results to this file (default: '
+                         'standard output)')
+    parser.add_argument(
+        '--baseline', help='JSON results of a former run to compare with')
+    args = parser.parse_args(argv)
+
+    results = run(
+        sizes=[int(size) for size in args.sizes.split(',')],
+        latencies=[float(latency) for latency in args.latencies.split(',')],
+        count=args.requests,
+        only=args.only,
+    )
+    report = dict(
+        timegate=timegate.__version__,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        date=datetime.now(tzutc()).isoformat(),
+        results=results,
+    )
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
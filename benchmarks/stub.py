@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Local HTTP/1.1 stub standing for the archive APIs in benchmarks."""
+
+from __future__ import absolute_import, print_function
+
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """Threaded server answering every GET with ``respond(path)``."""
+
+    daemon_threads = True
+
+    def __init__(self, respond, delay=0):
+        """Constructor method.
+
+        :param respond: Callable returning the ``(status, headers, body)``
+        of the response to a path, ``body`` being bytes.
+        :param delay: (Optional) Seconds to wait before responding, standing
+        for the latency of the API.
+        """
+        self.respond = respond
+        self.delay = delay
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _StubHandler)
+
+    @property
+    def url(self):
+        """Base URL of the stub."""
+        return 'http://%s:%d' % self.server_address
+
+    def start(self):
+        """Serve in a background thread."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving."""
+        self.shutdown()
+        self.server_close()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+
+    # Keep-alive needs HTTP/1.1 and a Content-Length.
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately: without it, the delayed
+    # acknowledgement of the headers holds the body back.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.server.delay:
+            threading.Event().wait(self.server.delay)
+        status, headers, body = self.server.respond(self.path)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+    def log_message(self, *args):
+        pass
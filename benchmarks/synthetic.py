@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Synthetic handler retrieving TimeMaps of any size from a local stub."""
+
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+from timegate.errors import HandlerError
+from timegate.handler import Handler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub import StubServer  # noqa isort:skip
+
+FIRST = datetime(2000, 1, 1)
+"""Datetime of the first memento of every TimeMap."""
+
+RESOURCE = 'http://www.example.com/%d'
+"""URI-R of the resource with a given number of mementos."""
+
+_MEMENTOS_PATH = re.compile(r'/mementos/(\d+)$')
+
+
+def make_mementos(size):
+    """Return ``size`` mementos as the stub API lists them, one per hour."""
+    return [['http://archive.example.com/%d/%d' % (size, i),
+             (FIRST + timedelta(hours=i)).strftime('%Y-%m-%dT%H:%M:%SZ')]
+            for i in range(size)]
+
+
+class SyntheticStub(StubServer):
+    """Stub API answering ``/mementos/<size>`` with that many mementos."""
+
+    def __init__(self, latency=0):
+        """Constructor method.
+
+        :param latency: (Optional) Seconds to wait before responding.
+        """
+        self._bodies = {}
+        StubServer.__init__(self, self.mementos, delay=latency)
+
+    def mementos(self, path):
+        match = _MEMENTOS_PATH.match(path)
+        if not match:
+            return 404, {}, b''
+        size = int(match.group(1))
+        if size not in self._bodies:
+            self._bodies[size] = json.dumps(
+                make_mementos(size)).encode('utf-8')
+        return 200, {'Content-Type': 'application/json'}, self._bodies[size]
+
+
+class SyntheticHandler(Handler):
+    """Handler of the resources ``RESOURCE % size`` of a stub API."""
+
+    date_format = 'iso8601'
+
+    def __init__(self, api):
+        """Constructor method.
+
+        :param api: The base URL of the ``SyntheticStub``.
+        """
+        Handler.__init__(self)
+        self.api = api
+
+    def get_all_mementos(self, uri_r):
+        size = uri_r.rstrip('/').rsplit('/', 1)[-1]
+        if not size.isdigit():
+            raise HandlerError('Unknown resource.', 404)
+        response = self.request('%s/mementos/%s' % (self.api, size))
+        if not response:
+            raise HandlerError('Unknown resource.', 404)
+        return response.json()
@@ -25,17 +25,27 @@ tests_require = [
     'pytest-cov>=1.8.0',
     'pytest-pep8>=1.0.6',
     'pytest>=2.8.0',
+    'fakeredis>=0.8.0',
+    'httpx>=0.18.0; python_version>="3.6"',
     'httpretty>=0.8.14',
+    'hypothesis>=3.0.0',
     'mock>=2.0.0',
 ]
 
 extras_require = {
     ':python_version<"3.0"': [
         'ConfigParser>=3.3.0r2',
+        'futures>=3.0.0',
+    ],
+    'asgi': [
+        'httpx>=0.18.0',
     ],
     'docs': [
         'Sphinx>=1.4.2',
     ],
+    'redis': [
+        'redis>=2.10.0',
+    ],
     'uwsgi': [
         'uWSGI>=2.0.3',
     ],
@@ -56,8 +66,11 @@ install_requires = [
     'LinkHeader>=0.4.3',
     'lxml>=3.4.1',
     'python-dateutil>=2.1',
-    'requests>=2.2.1',
-    'werkzeug>=0.9.6',
+    # Retry(raise_on_status=...) of the urllib3 1.15 bundled since 2.10.0
+    'requests>=2.10.0',
+    # FileSystemBackend extends the file counting of werkzeug 0.15 caches,
+    # which were removed from werkzeug 1.0.
+    'werkzeug>=0.15.0,<1.0',
 ]
 
 packages = find_packages()
@@ -12,8 +12,13 @@
 
 from __future__ import absolute_import, print_function
 
+import sys
+
 import pytest
 
+# The ASGI application requires Python 3.5.
+collect_ignore = ['test_asgi.py'] if sys.version_info < (3, 5) else []
+
 
 @pytest.fixture()
 def app(tmpdir):
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+
+"""ASGI application tests."""
+
+from __future__ import absolute_import, print_function
+
+import asyncio
+
+import pytest
+
+from timegate.asgi import ASGITimeGate, AsyncHandler
+from timegate.examples.simple import ExampleHandler
+
+
+class AsyncExampleHandler(AsyncHandler):
+    """Example handler with coroutines."""
+
+    def __init__(self):
+        AsyncHandler.__init__(self)
+        self.example = ExampleHandler()
+        self.calls = []
+
+    async def get_all_mementos(self, uri_r):
+        self.calls.append(uri_r)
+        await asyncio.sleep(0.1)
+        return self.example.get_all_mementos(uri_r)
+
+
+async def call(app, path, headers=()):
+    """Send a GET request to an ASGI application."""
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': b'',
+        'headers': [(b'host', b'localhost')] + list(headers),
+        'server': ('localhost', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    return (start['status'], dict(start['headers']),
+            b''.join(m.get('body', b'') for m in messages[1:]))
+
+
+def run(coroutine):
+    """Run a coroutine in a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_sync_handler(app):
+    """Test that synchronous handlers are served from threads."""
+    asgi = ASGITimeGate(app)
+    status, headers, body = run(call(
+        asgi, '/timegate/http://www.example.com/resourceA'))
+    assert status == 302
+    assert headers[b'location'] == b'http://www.example.com/resourceA_v3'
+
+    status, _, body = run(call(
+        asgi, '/timemap/link/http://www.example.com/resourceA'))
+    assert status == 200
+    assert b'resourceA_v1' in body
+
+    status, _, _ = run(call(asgi, '/'))
+    assert status == 404
+
+
+@pytest.mark.parametrize('cache', [True, False])
+def test_async_handler(app, cache):
+    """Test that concurrent requests to asynchronous handlers coalesce."""
+    handler = AsyncExampleHandler()
+    app.config['HANDLER_MODULE'] = handler
+    app.config['CACHE_USE'] = cache
+    app.reload()
+    asgi = ASGITimeGate(app)
+
+    async def requests():
+        return await asyncio.gather(*[call(
+            asgi, '/timegate/http://www.example.com/resourceA',
+            [(b'accept-datetime', b'Sat, 16 Oct 2010 14:00:00 GMT')]
+        ) for _ in range(4)])
+
+    responses = run(requests())
+    assert [status for (status, _, _) in responses] == [302] * 4
+    assert set(headers[b'location'] for (_, headers, _) in responses) == \
+        set([b'http://www.example.com/resourceA_v2'])
+    assert handler.calls == ['http://www.example.com/resourceA']
+
+    status, _, body = run(call(
+        asgi, '/timemap/json/http://www.example.com/resourceB'))
+    assert status == 200
+    assert b'resourceB_v2' in body
+
+    status, _, _ = run(call(
+        asgi, '/timemap/json/http://www.example.com/missing'))
+    assert status == 404
+
+
+def test_http_caching(app):
+    """Test the request cache directives and the conditional requests."""
+    asgi = ASGITimeGate(app)
+    uri = '/timegate/http://www.example.com/resourceA'
+    status, headers, body = run(call(
+        asgi, uri, [(b'cache-control', b'only-if-cached')]))
+    assert status == 504
+
+    status, headers, body = run(call(asgi, uri))
+    assert status == 302
+    assert b'public' in headers[b'cache-control']
+    status, headers, body = run(call(
+        asgi, uri, [(b'if-none-match', headers[b'etag'])]))
+    assert status == 304
+
+
+def test_parsed_off_loop(app, monkeypatch):
+    """Test that asynchronous handler responses are parsed in threads."""
+    import threading
+    from timegate import asgi as timegate_asgi
+    parse_response = timegate_asgi._parse_response
+    threads = []
+
+    def _parse_response(*args):
+        threads.append(threading.current_thread())
+        return parse_response(*args)
+
+    monkeypatch.setattr(timegate_asgi, '_parse_response', _parse_response)
+    app.config['HANDLER_MODULE'] = AsyncExampleHandler()
+    app.reload()
+    status, _, _ = run(call(
+        ASGITimeGate(app), '/timemap/link/http://www.example.com/resourceA'))
+    assert status == 200
+    assert threads and threading.main_thread() not in threads
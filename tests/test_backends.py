@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+
+"""Cache backends tests."""
+
+from __future__ import absolute_import, print_function
+
+import time
+from datetime import datetime
+
+import pytest
+from dateutil.tz import tzutc
+
+from timegate.backends import FileSystemBackend, RedisBackend, SQLiteBackend
+from timegate.timemap import TimeMap
+
+TIMEMAP = TimeMap(['http://www.example.com/resourceA_v1',
+                   'http://www.example.com/resourceA_v2'], [0, 60])
+
+
+@pytest.fixture(params=['filesystem', 'sqlite', 'redis'])
+def backend(request, tmpdir):
+    """Each backend, against a local stand-in for Redis."""
+    if request.param == 'filesystem':
+        return FileSystemBackend(tmpdir.strpath, default_timeout=60)
+    elif request.param == 'sqlite':
+        return SQLiteBackend(tmpdir.join('cache.sqlite').strpath,
+                             threshold=3, default_timeout=60)
+    fakeredis = pytest.importorskip('fakeredis')
+    return RedisBackend(client=fakeredis.FakeStrictRedis(),
+                        default_timeout=60)
+
+
+def test_backend(backend):
+    """Test the backend interface."""
+    timestamp = datetime(2016, 1, 1, tzinfo=tzutc())
+    assert backend.get('http://www.example.com/resourceA') is None
+    assert backend.set('http://www.example.com/resourceA',
+                       (timestamp, TIMEMAP))
+    assert backend.set('http://www.example.com/resourceB', 1)
+    assert backend.get('http://www.example.com/resourceA') == \
+        (timestamp, TIMEMAP)
+    assert backend.get_many('http://www.example.com/resourceB',
+                            'http://www.example.com/resourceC') == [1, None]
+
+    assert backend.touch('http://www.example.com/resourceB', timeout=120)
+    assert not backend.touch('http://www.example.com/resourceC')
+    assert backend.delete('http://www.example.com/resourceB')
+    assert backend.get('http://www.example.com/resourceB') is None
+
+
+def test_expiration(backend):
+    """Test that expired values are not returned."""
+    backend.set('http://www.example.com/resourceA', 1, timeout=1)
+    backend.touch('http://www.example.com/resourceA', timeout=1)
+    assert backend.get('http://www.example.com/resourceA') == 1
+    time.sleep(2.1)
+    assert backend.get('http://www.example.com/resourceA') is None
+
+
+def test_sqlite_threshold(tmpdir):
+    """Test that the SQLite backend deletes the oldest values."""
+    backend = SQLiteBackend(tmpdir.join('cache.sqlite').strpath,
+                            threshold=2, default_timeout=60)
+    for i, timeout in enumerate([30, 10, 20]):
+        backend.set(str(i), i, timeout=timeout)
+    assert backend.get_many('0', '1', '2') == [0, None, 2]
+
+
+def test_sqlite_application(tmpdir):
+    """Test selecting the backend in the configuration."""
+    from timegate.application import TimeGate
+    app = TimeGate(config=dict(
+        CACHE_USE=True,
+        CACHE_BACKEND='sqlite',
+        CACHE_FILE=tmpdir.strpath,
+    ))
+    assert isinstance(app.cache.backend, SQLiteBackend)
+    app.cache.set('http://www.example.com/resourceA', TIMEMAP)
+    assert tmpdir.join('timegate.sqlite').check()
+    assert app.cache.get_all('http://www.example.com/resourceA') == TIMEMAP
+    assert app.cache.derived_backend.table != app.cache.backend.table
+
+
+def test_sqlite_tables(tmpdir):
+    """Test that the tables of a file are bounded separately."""
+    filename = tmpdir.join('cache.sqlite').strpath
+    timemaps = SQLiteBackend(filename, threshold=1)
+    derived = SQLiteBackend(filename, threshold=1, table='derived')
+    timemaps.set('a', 1)
+    derived.set('a', 2)
+    derived.set('b', 3)
+    assert timemaps.get_many('a', 'b') == [1, None]
+    assert derived.get_many('a', 'b') == [None, 3]
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+
+"""Cache tests."""
+
+from __future__ import absolute_import, print_function
+
+import time
+from datetime import datetime
+
+import pytest
+from dateutil.tz import tzutc
+
+from timegate.backends import loads_entry
+from timegate.cache import Cache
+from timegate.timemap import TimeMap
+
+MEMENTOS = [
+    ('http://www.example.com/resourceA_v1',
+     datetime(1999, 9, 30, 1, 50, 50, tzinfo=tzutc())),
+    ('http://www.example.com/resourceA_v2',
+     datetime(2010, 10, 16, 13, 27, 27, tzinfo=tzutc())),
+]
+
+
+@pytest.fixture()
+def cache(tmpdir):
+    """Cache in a temporary directory."""
+    return Cache(tmpdir.mkdir('cache').strpath, 86400, 86400, 10)
+
+
+def test_binary_entries(cache):
+    """Test that TimeMaps are stored in the binary format."""
+    cache.set('http://www.example.com/resourceA', MEMENTOS)
+    with open(cache.backend._get_filename(
+            'http://www.example.com/resourceA'), 'rb') as f:
+        data = f.read()
+    assert b'TGCE' in data
+
+    timemap = cache.get_all('http://www.example.com/resourceA')
+    assert isinstance(timemap, TimeMap)
+    assert timemap == MEMENTOS
+
+
+def test_legacy_entries(cache):
+    """Test that pickled entries of former versions are still read."""
+    from werkzeug.contrib.cache import FileSystemCache
+    legacy = FileSystemCache(cache.path)
+    timestamp = datetime.utcnow().replace(tzinfo=tzutc())
+    legacy.set('http://www.example.com/resourceA', (timestamp, MEMENTOS))
+
+    timemap = cache.get_all('http://www.example.com/resourceA')
+    assert isinstance(timemap, TimeMap)
+    assert timemap == MEMENTOS
+
+
+def test_loads_entry():
+    """Test that only binary entries are decoded."""
+    with pytest.raises(ValueError):
+        loads_entry(b'\x80\x04' + b'\x00' * 16)
+
+
+def test_memory_tier(tmpdir):
+    """Test the in-memory tier in front of the files."""
+    cache = Cache(tmpdir.mkdir('cache').strpath, 86400, 86400, 10,
+                  memory_max_values=1)
+    cache.set('http://www.example.com/resourceA', MEMENTOS)
+    cache.set('http://www.example.com/resourceB', MEMENTOS[:1])
+    assert len(cache.memory) == 1
+
+    assert cache.get_all('http://www.example.com/resourceB') == MEMENTOS[:1]
+    assert cache.get_all('http://www.example.com/resourceA') == MEMENTOS
+    assert cache.get_all('http://www.example.com/resourceA') == MEMENTOS
+    assert cache.get_all('http://www.example.com/resourceC') is None
+    assert cache.stats == dict(memory_hits=2, memory_misses=2,
+                               backend_hits=1, backend_misses=1,
+                               stale_hits=0)
+
+
+def test_memory_tier_shared(tmpdir):
+    """Test that outdated values in memory are looked up in the backend."""
+    from dateutil.relativedelta import relativedelta
+    path = tmpdir.mkdir('cache').strpath
+    cache_a = Cache(path, 60, 86400, 10, memory_max_values=10)
+    cache_b = Cache(path, 60, 86400, 10, memory_max_values=10)
+    uri_r = 'http://www.example.com/resourceA'
+    timestamp, _ = cache_a.set(uri_r, MEMENTOS)
+    outdated = timestamp + relativedelta(seconds=90)
+    assert cache_a.get_entry_until(uri_r, outdated) is None
+
+    # Another process caches a fresh value.
+    cache_b.set(uri_r, MEMENTOS[:1])
+    cache_b.backend.set(uri_r, (outdated, cache_b.peek(uri_r)))
+    assert cache_a.get_entry_until(uri_r, outdated) == \
+        (outdated, MEMENTOS[:1])
+    assert cache_a.memory.get(uri_r)[0] == outdated
+
+
+def test_lru_cache():
+    """Test LRU eviction by count and by size."""
+    from timegate.cache import LRUCache
+    lru = LRUCache(2, max_bytes=10)
+    lru.set('a', 1, size=4)
+    lru.set('b', 2, size=4)
+    assert lru.get('a') == 1
+    lru.set('c', 3, size=4)
+    assert lru.get('b') is None
+    assert lru.get('a') == 1
+    lru.set('d', 4, size=8)
+    assert len(lru) == 1 and lru.nbytes == 8
+    lru.set('e', 5, size=11)
+    assert lru.get('e') is None
+
+    lru.set('f', 6, timeout=-1)
+    assert lru.get('f') is None
+    assert lru.nbytes == 8
+
+
+def test_lru_cache_sizeof():
+    """Test that values growing in memory are measured again when read."""
+    from timegate.cache import LRUCache
+    lru = LRUCache(10, max_bytes=10, sizeof=len)
+    a, b = [1], [2]
+    lru.set('a', a, size=len(a))
+    lru.set('b', b, size=len(b))
+    a.extend(range(8))
+    assert lru.get('a') == a
+    assert lru.nbytes == 10
+    b.append(3)
+    assert lru.get('b') == b
+    assert lru.get('a') is None
+    assert lru.nbytes == 2
+
+
+def test_stale_while_revalidate(tmpdir):
+    """Test that outdated TimeMaps are served while refreshed."""
+    import threading
+    from dateutil.relativedelta import relativedelta
+    cache = Cache(tmpdir.mkdir('cache').strpath, 60, 86400, 10, stale=60)
+    uri_r = 'http://www.example.com/resourceA'
+    cache.set(uri_r, MEMENTOS)
+    timestamp = cache._get(uri_r)[0]
+    refreshed = threading.Event()
+
+    def refresh():
+        cache.set(uri_r, MEMENTOS[:1])
+        refreshed.set()
+
+    assert cache.get_until(uri_r, timestamp, refresh) == MEMENTOS
+    assert cache.stats['stale_hits'] == 0
+
+    outdated = timestamp + relativedelta(seconds=90)
+    assert cache.get_until(uri_r, outdated) is None
+    assert cache.get_until(uri_r, outdated, refresh) == MEMENTOS
+    assert refreshed.wait(5)
+    cache.refresher.shutdown()
+    assert cache.stats['stale_hits'] == 1
+    assert cache.refresher.stats['refreshes'] == 1
+    assert cache.get_all(uri_r) == MEMENTOS[:1]
+
+    expired = timestamp + relativedelta(seconds=150)
+    assert cache.get_until(uri_r, expired, refresh) is None
+
+
+def test_refresher_drops():
+    """Test that refreshes are deduplicated and bounded."""
+    import threading
+    from timegate.cache import Refresher
+    refresher = Refresher(1, max_pending=2)
+    release = threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        release.wait(5)
+
+    assert refresher.submit('a', refresh)
+    assert refresher.submit('a', refresh)
+    assert refresher.submit('b', refresh)
+    assert not refresher.submit('c', refresh)
+    release.set()
+    refresher.shutdown()
+    assert len(calls) == 2
+    assert refresher.stats == dict(refreshes=2, refreshes_failed=0,
+                                   refreshes_dropped=1)
+
+
+def test_refresher_shutdown():
+    """Test that refreshes can be submitted while the workers stop."""
+    import sys
+    import threading
+    from timegate.cache import Refresher
+    refresher = Refresher(1, max_pending=1000)
+    errors = []
+
+    def submit():
+        try:
+            for key in range(500):
+                refresher.submit(key, lambda: None)
+        except Exception as e:
+            errors.append(e)
+
+    def shutdown():
+        for _ in range(500):
+            refresher.shutdown(wait=False)
+
+    interval = sys.getswitchinterval()
+    # Switch threads often, so that shutdowns interleave with submits.
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=submit),
+                   threading.Thread(target=shutdown)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+        refresher.shutdown()
+    assert not errors
+
+
+@pytest.mark.parametrize('memory', [0, 10])
+def test_bodies(tmpdir, memory):
+    """Test that bodies are only returned for the TimeMap they render."""
+    cache = Cache(tmpdir.mkdir('cache').strpath, 86400, 86400, 10,
+                  memory_max_values=memory)
+    uri_r = 'http://www.example.com/resourceA'
+    timestamp = cache.set(uri_r, MEMENTOS)[0]
+    assert cache.get_body(uri_r, 'link', timestamp) is None
+
+    cache.set_body(uri_r, 'link', timestamp, b'<body>')
+    if cache.memory is not None:
+        cache.derived_memory.delete('link ' + uri_r)
+    # The timestamp of the TimeMap survives its serialization.
+    assert cache.get_entry_until(uri_r, timestamp)[0] == timestamp
+    assert cache.get_body(uri_r, 'link', timestamp) == b'<body>'
+    assert cache.get_body(uri_r, 'json', timestamp) is None
+
+    time.sleep(0.01)
+    new_timestamp = cache.set(uri_r, MEMENTOS[:1])[0]
+    assert cache.get_body(uri_r, 'link', new_timestamp) is None
+
+
+@pytest.mark.parametrize('memory', [0, 2])
+def test_derived_values_apart(tmpdir, memory):
+    """Test that bodies and errors do not evict TimeMaps."""
+    cache = Cache(tmpdir.mkdir('cache').strpath, 86400, 86400, 2,
+                  memory_max_values=memory, negative_ttl=10)
+    uris = ['http://www.example.com/resource%d' % i for i in range(2)]
+    for uri_r in uris:
+        timestamp = cache.set(uri_r, MEMENTOS)[0]
+        for name in ('link', 'json'):
+            cache.set_body(uri_r, name, timestamp, b'<body>' * 100)
+        cache.set_error(uri_r + '/missing', 404, 'Not Found')
+    for uri_r in uris:
+        assert cache.get_all(uri_r) == MEMENTOS
+        assert cache.get_error(uri_r + '/missing') == (404, 'Not Found')
+    assert cache.stats['backend_hits'] == (0 if memory else 2)
+
+
+@pytest.mark.parametrize('memory', [0, 10])
+def test_errors(tmpdir, memory, monkeypatch):
+    """Test that handler errors are cached, 5xx ones with a backoff."""
+    cache = Cache(tmpdir.mkdir('cache').strpath, 86400, 86400, 10,
+                  memory_max_values=memory, negative_ttl=10,
+                  negative_max_ttl=35, negative_5xx=True)
+    uri_r = 'http://www.example.com/resourceA'
+    now = [time.time()]
+    monkeypatch.setattr('timegate.cache.time', lambda: now[0])
+
+    cache.set_error(uri_r, 400, 'Bad request')
+    assert cache.get_error(uri_r) is None
+    cache.set_error(uri_r, 404, 'Not Found')
+    assert cache.get_error(uri_r) == (404, 'Not Found')
+
+    # 10, 20 then 35 seconds
+    for ttl in (10, 20, 35, 35):
+        cache.set_error(uri_r, 502, 'Bad Gateway')
+        now[0] += ttl - 1
+        assert cache.get_error(uri_r) == (502, 'Bad Gateway')
+        now[0] += 2
+        assert cache.get_error(uri_r) is None
+
+    cache.set(uri_r, MEMENTOS)
+    cache.set_error(uri_r, 502, 'Bad Gateway')
+    now[0] += 11
+    assert cache.get_error(uri_r) is None
@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+
+"""Handler tests."""
+
+from __future__ import absolute_import, print_function
+
+import threading
+from datetime import datetime
+
+import pytest
+from dateutil.tz import tzutc
+
+from timegate import utils as timegate_utils
+from timegate.errors import HandlerError
+from timegate.handler import (Handler, iterparse, parsed_request,
+                              parsed_since_request)
+from timegate.timemap import TimeMap
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    """Threaded local server counting the requests in flight.
+
+    ``peak`` is the largest number of requests served at once, and
+    ``gathered`` is set once ``expected`` requests were.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        HTTPServer.__init__(self, *args, **kwargs)
+        self.in_flight = self.peak = self.expected = 0
+        self.gathered = threading.Event()
+        self.lock = threading.Lock()
+
+    def enter(self):
+        """Count a request in flight."""
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            if self.expected and self.in_flight >= self.expected:
+                self.gathered.set()
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+class API(BaseHTTPRequestHandler):
+    """API answering with the next status of the server.
+
+    Requests for ``/gather`` are answered once the server ``gathered`` its
+    expected requests, and requests for ``/hold`` once it is ``released``.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.clients.add(self.client_address)
+        self.server.headers = self.headers
+        self.server.enter()
+        try:
+            if self.path == '/gather':
+                self.server.gathered.wait(5)
+            elif self.path == '/hold':
+                self.server.released.wait(10)
+        finally:
+            self.server.leave()
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'[]')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def api():
+    """Local API server."""
+    server = Server(('127.0.0.1', 0), API)
+    server.clients = set()
+    server.statuses = []
+    server.released = threading.Event()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    server.url = 'http://%s:%d/' % server.server_address
+    yield server
+    server.released.set()
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_keep_alive(api):
+    """Test that the requests of a handler reuse their connection."""
+    handler = Handler()
+    for _ in range(3):
+        assert handler.request(api.url).status_code == 200
+    assert len(api.clients) == 1
+
+
+def test_session_retries(api):
+    """Test that unavailable APIs are retried."""
+    from timegate import constants
+    from timegate.config import Config
+    config = Config(None)
+    config.from_object(constants)
+    config.update(HTTP_MAX_RETRIES=1, HTTP_BACKOFF_FACTOR=0)
+    handler = Handler()
+    handler.configure(config)
+
+    api.statuses = [503]
+    assert handler.request(api.url).status_code == 200
+    api.statuses = [503, 503]
+    assert handler.request(api.url).status_code == 503
+
+
+def test_configure(api):
+    """Test that the request settings are resolved from the configuration."""
+    from timegate import constants
+    from timegate.config import Config
+    config = Config(None)
+    config.from_object(constants)
+    config.update(USER_AGENT='TimeGate test', API_TIME_OUT=3)
+    handler = Handler()
+    handler.headers = {'Accept': 'application/json'}
+    handler.configure(config)
+    assert handler.timeout == 3
+
+    handler.request(api.url, headers={'X-Test': '1'})
+    assert api.headers['User-Agent'] == 'TimeGate test'
+    assert api.headers['Accept'] == 'application/json'
+    assert api.headers['X-Test'] == '1'
+
+
+def test_fetch_many(api):
+    """Test that resources are requested concurrently within a deadline."""
+    handler = Handler()
+    uris = [api.url + 'gather', api.url + 'hold', api.url + 'gather',
+            'http://127.0.0.1:1/unreachable', api.url + 'gather']
+    # The held request is answered after fetch_many returns.
+    api.expected = 4
+    results = handler.fetch_many(uris, parse=lambda r: r.status_code,
+                                 deadline=1)
+    assert results == [(uris[0], 200), (uris[2], 200), (uris[4], 200)]
+    assert api.peak == 4
+
+
+class Commits(BaseHTTPRequestHandler):
+    """GitHub commits API listing ``server.pages`` pages of 3 commits.
+
+    The ``Link`` header gives the ``last`` page when ``server.last`` is
+    true: pages after the first are then answered once all of them are
+    requested.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        import json
+        import re
+        match = re.search(r'[?&]page=(\d+)', self.path)
+        page = int(match.group(1)) if match else 1
+        self.server.requested.append(page)
+        self.server.enter()
+        if page > 1 and self.server.last:
+            self.server.gathered.wait(5)
+        self.server.leave()
+        commits = [{
+            'sha': '%d-%d' % (page, i),
+            'html_url': 'https://github.com/u/r/commit/%d-%d' % (page, i),
+            'commit': {'committer': {
+                'date': '2016-01-%02dT00:00:0%dZ' % (page, i)}},
+        } for i in range(3)]
+        body = json.dumps(commits).encode('utf-8')
+
+        base = self.server.url + '/repos/u/r/commits?per_page=100&page=%d'
+        links = []
+        if page < self.server.pages:
+            links.append('<%s>; rel="next"' % (base % (page + 1)))
+            if self.server.last:
+                links.append('<%s>; rel="last"' % (base % self.server.pages))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if links:
+            self.send_header('Link', ', '.join(links))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.parametrize('last', [True, False])
+def test_fetch_pages(last):
+    """Test that the pages of a listing are requested concurrently."""
+    from timegate.examples.github import GitHubHandler
+    server = Server(('127.0.0.1', 0), Commits)
+    server.pages = 5
+    server.last = last
+    server.expected = server.pages - 1
+    server.requested = []
+    server.url = 'http://%s:%d' % server.server_address
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        handler = GitHubHandler()
+        handler.api = server.url
+        mementos = list(handler.get_all_mementos('https://github.com/u/r'))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert mementos == [
+        ('https://github.com/u/r/tree/%d-%d' % (page, i),
+         '2016-01-%02dT00:00:0%dZ' % (page, i))
+        for page in range(1, 6) for i in range(3)]
+    assert sorted(server.requested) == [1, 2, 3, 4, 5]
+    # Without the last page, each page gives the next one.
+    assert server.peak == (server.pages - 1 if last else 1)
+
+
+def test_fetch_pages_errors():
+    """Test that the errors of the pages are raised rather than a timeout."""
+    class Page(object):
+        def __init__(self, number):
+            self.number = number
+            self.links = {}
+            if number == 1:
+                self.links['last'] = {'url': 'http://api/c?page=3'}
+
+    class Pages(Handler):
+        def request(self, resource, **kwargs):
+            return Page(int(resource.rsplit('=', 1)[1]))
+
+    def parse(page):
+        if page.number == 3:
+            raise HandlerError('API rate limit exceeded.', 403)
+        return [page.number]
+
+    handler = Pages()
+    assert handler.fetch_pages('http://api/c?page=1',
+                               lambda page: [page.number]) == [1, 2, 3]
+    with pytest.raises(HandlerError) as excinfo:
+        handler.fetch_pages('http://api/c?page=1', parse, deadline=60)
+    assert excinfo.value.code == 403
+    assert 'rate limit' in excinfo.value.description
+
+
+def test_page_uris():
+    """Test the URIs of the pages of a listing."""
+    from timegate.handler import page_uris
+    assert page_uris('http://api/c?page=4&per_page=2') == [
+        'http://api/c?page=2&per_page=2', 'http://api/c?page=3&per_page=2',
+        'http://api/c?page=4&per_page=2']
+    assert page_uris('http://api/c?per_page=2&page=1') == []
+    assert page_uris('http://api/c?apage=3') == []
+    assert page_uris(None) == []
+
+
+class Mementos(Handler):
+    """Handler returning the mementos it is given, in any form."""
+
+    def __init__(self, response):
+        Handler.__init__(self)
+        self.response = response
+
+    def get_all_mementos(self, uri_r):
+        return self.response()
+
+    def get_mementos_since(self, uri_r, since):
+        return self.response()
+
+
+MEMENTOS = [
+    ('http://example.com/m2', '2015-01-03T22:00:00Z'),
+    ('http://example.com/m1', '20150102220000'),
+]
+
+
+@pytest.mark.parametrize('response', [
+    lambda: MEMENTOS,
+    lambda: map(tuple, MEMENTOS),
+    lambda: (memento for memento in MEMENTOS),
+    lambda: TimeMap.from_mementos(
+        (uri, timegate_utils.validate_date(date)) for (uri, date) in MEMENTOS),
+])
+def test_parsed_responses(response):
+    """Test lists, iterators, generators and TimeMaps responses."""
+    mementos = parsed_request(Mementos(response).get_all_mementos, 'uri')
+    assert mementos.uris == ['http://example.com/m1', 'http://example.com/m2']
+    assert mementos[0][1] == datetime(2015, 1, 2, 22, tzinfo=tzutc())
+
+
+def test_trusted_handler(monkeypatch):
+    """Test that the mementos of trusted handlers are not validated."""
+    def validate_uristr(uristr):
+        raise AssertionError('The URI is validated.')
+    monkeypatch.setattr(timegate_utils, 'validate_uristr', validate_uristr)
+
+    date = datetime(2015, 1, 3, 22, tzinfo=tzutc())
+    handler = Mementos(lambda: iter([('http://example.com/m', date)]))
+    handler.trusted = True
+    assert parsed_request(handler.get_all_mementos, 'uri') == \
+        [('http://example.com/m', date)]
+
+
+@pytest.mark.parametrize('trusted', [True, False])
+def test_naive_datetimes(trusted):
+    """Test that naive datetimes are UTC, also mixed with aware ones."""
+    aware = datetime(2015, 1, 3, 22, tzinfo=tzutc())
+    naive = datetime(2015, 1, 2, 22)
+    handler = Mementos(lambda: [('http://example.com/m2', aware),
+                                ('http://example.com/m1', naive)])
+    handler.trusted = trusted
+    assert parsed_request(handler.get_all_mementos, 'uri') == [
+        ('http://example.com/m1', naive.replace(tzinfo=tzutc())),
+        ('http://example.com/m2', aware)]
+
+
+def test_bad_responses(monkeypatch):
+    """Test empty, malformed and too big responses."""
+    with pytest.raises(HandlerError) as excinfo:
+        parsed_request(Mementos(lambda: iter([])).get_all_mementos, 'uri')
+    assert excinfo.value.code == 404
+    empty = Mementos(lambda: (m for m in []))
+    assert not parsed_since_request(empty.get_mementos_since, 'uri', None)
+
+    with pytest.raises(HandlerError) as excinfo:
+        parsed_request(Mementos(lambda: ['uri']).get_all_mementos, 'uri')
+    assert excinfo.value.code == 503
+
+    monkeypatch.setattr('timegate.handler.TM_MAX_SIZE', 1)
+    with pytest.raises(HandlerError) as excinfo:
+        parsed_request(Mementos(lambda: iter(MEMENTOS)).get_all_mementos, 'u')
+    assert excinfo.value.code == 502
+
+
+class Streamed(object):
+    """Response streaming its body in small chunks."""
+
+    url = 'http://example.com/'
+
+    def __init__(self, body):
+        self.body = body
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), 3):
+            yield self.body[start:start + 3]
+
+    def close(self):
+        self.closed = True
+
+
+def test_iterparse():
+    """Test that elements are yielded with their tail, then released."""
+    response = Streamed(
+        b'<html><body><div class="list">' +
+        b''.join(b'<a href="/m%d">m</a> %d<br>' % (i, i) for i in range(5)) +
+        b'</div><a href="/last">last</a></body></html>')
+    links = []
+    for a in iterparse(response, 'a', html=True):
+        links.append((a.get('href'), a.tail, a.getparent().get('class')))
+        assert len(a.getparent()) <= 4
+    assert links == [('/m%d' % i, ' %d' % i, 'list') for i in range(5)] + \
+        [('/last', None, None)]
+    assert response.closed
+
+    response = Streamed(
+        b'<?xml version="1.0"?><r xmlns="urn:x"><v n="1"><d>a</d></v>'
+        b'<v n="2"><d>b</d></v></r>')
+    assert [(v.get('n'), v.findtext('{urn:x}d'))
+            for v in iterparse(response, ['{urn:x}v'])] == \
+        [('1', 'a'), ('2', 'b')]
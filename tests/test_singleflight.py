@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+
+"""Single-flight tests."""
+
+from __future__ import absolute_import, print_function
+
+import threading
+import time
+
+import pytest
+
+from timegate.singleflight import SingleFlight
+
+
+def run_concurrently(function, count=8):
+    """Run a function in several threads and return their results."""
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(function()))
+               for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.mark.parametrize('locks', [False, True])
+def test_concurrent_calls_coalesced(tmpdir, locks):
+    """Test that concurrent calls for a key make a single call."""
+    single_flight = SingleFlight(tmpdir.strpath if locks else None)
+    calls = []
+
+    def function():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'result'
+
+    results = run_concurrently(lambda: single_flight.do('key', function))
+    assert results == ['result'] * 8
+    assert len(calls) == 1
+    # Later calls are not coalesced with finished ones.
+    assert single_flight.do('key', function) == 'result'
+    assert len(calls) == 2
+
+
+def test_errors_shared():
+    """Test that waiting calls get the error of the call."""
+    single_flight = SingleFlight()
+    calls = []
+
+    def function():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError('failed')
+
+    def do():
+        try:
+            single_flight.do('key', function)
+        except ValueError as e:
+            return str(e)
+
+    assert run_concurrently(do) == ['failed'] * 8
+    assert len(calls) == 1
+
+
+def test_check_after_waiting_for_lock(tmpdir):
+    """Test that a process waiting for the lock checks for the result."""
+    other_process = SingleFlight(tmpdir.strpath)
+    single_flight = SingleFlight(tmpdir.strpath)
+    store = {}
+    started = threading.Event()
+
+    def function():
+        started.set()
+        time.sleep(0.2)
+        store['key'] = 'result'
+        return 'result'
+
+    thread = threading.Thread(target=other_process.do,
+                              args=('key', function))
+    thread.start()
+    started.wait()
+    result = single_flight.do('key', lambda: 'called',
+                              check=lambda: store.get('key'))
+    thread.join()
+    assert result == 'result'
+
+
+def test_keys_locked_separately(tmpdir):
+    """Test that other processes only wait for calls of the same key."""
+    other_process = SingleFlight(tmpdir.strpath)
+    single_flight = SingleFlight(tmpdir.strpath, timeout=5)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 'slow'
+
+    thread = threading.Thread(target=other_process.do, args=('a', slow))
+    thread.start()
+    started.wait()
+    for key in ('b', 'c', 'd'):
+        checks = []
+        assert single_flight.do(key, lambda: key,
+                                check=lambda: checks.append(1)) == key
+        assert not checks
+    assert len(tmpdir.listdir()) == 1
+    release.set()
+    thread.join()
+    # Released lock files are deleted.
+    assert tmpdir.listdir() == []
@@ -13,6 +13,7 @@
 from __future__ import absolute_import, print_function
 
 import json
+import time
 
 import pytest
 
@@ -147,3 +148,432 @@ def test_uri_validation_exceptions():
     from timegate.utils import validate_uristr
     with pytest.raises(Exception):
         validate_uristr(None)
+
+
+def test_create_app(tmpdir):
+    """Test that the application is built once and reused."""
+    from timegate.application import create_app
+    from werkzeug.test import Client
+    from werkzeug.wrappers import BaseResponse
+    app = create_app(config=dict(
+        HANDLER_MODULE='simple',
+        BASE_URI='http://www.example.com/',
+        CACHE_USE=True,
+        CACHE_FILE=tmpdir.mkdir('cache').strpath,
+    ))
+    handler, url_map, cache = app.handler, app.url_map, app.cache
+    assert cache is not None
+
+    client = Client(app, BaseResponse)
+    for _ in range(2):
+        response = client.get('/timegate/resourceA')
+        assert response.status_code == 302
+    assert app.handler is handler
+    assert app.url_map is url_map
+    assert app.cache is cache
+
+    app.config['CACHE_USE'] = False
+    app.reload()
+    assert app.cache is None
+    assert app.handler is not handler
+    assert app.url_map is not url_map
+
+
+def test_application_reuse():
+    """Test that the WSGI application object is built once per process."""
+    from timegate import application
+    assert application.get_app() is application.get_app()
+    app = application.get_app()
+    closed = []
+    app.close = lambda: closed.append(app)
+    application.reload_app()
+    assert application.get_app() is not app
+    assert closed == [app]
+
+
+def test_reload_config_apart():
+    """Test that building a new configuration leaves the current one."""
+    from timegate.application import DEFAULT_CONFIG_FILE, create_app
+    app = create_app(config=dict(
+        HANDLER_MODULE='simple',
+        BASE_URI='http://www.example.com/',
+        CACHE_USE=False,
+    ))
+    config = app.config
+    values = dict(config)
+
+    other = create_app(config=dict(
+        HANDLER_MODULE='simple',
+        BASE_URI='http://other.example.com/',
+        CACHE_USE=False,
+    ))
+    assert other.config is not config
+    assert dict(app.config) == values
+
+    app.reload(DEFAULT_CONFIG_FILE)
+    assert app.config is not config
+    assert dict(config) == values
+
+
+def test_concurrent_misses_coalesced(app):
+    """Test that concurrent cache misses retrieve the TimeMap once."""
+    import threading
+    import time
+    from werkzeug.test import Client
+    from werkzeug.wrappers import BaseResponse
+
+    get_all_mementos = app.handler.get_all_mementos
+    calls = []
+
+    def slow_get_all_mementos(uri_r):
+        calls.append(uri_r)
+        time.sleep(0.2)
+        return get_all_mementos(uri_r)
+
+    app.handler.get_all_mementos = slow_get_all_mementos
+    statuses = []
+
+    def get():
+        client = Client(app, BaseResponse)
+        statuses.append(client.get(
+            '/timemap/link/http://www.example.com/resourceA').status_code)
+
+    threads = [threading.Thread(target=get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert statuses == [200] * 4
+    assert len(calls) == 1
+
+
+def test_incremental_refresh(tmpdir):
+    """Test that outdated TimeMaps are refreshed with the new mementos."""
+    from datetime import datetime, timedelta
+    from dateutil.tz import tzutc
+    from timegate.application import TimeGate
+    from timegate.examples.simple import ExampleHandler
+    from timegate.handler import parsed_request
+    from werkzeug.test import Client
+    from werkzeug.wrappers import BaseResponse
+
+    class SinceHandler(ExampleHandler):
+        whole = False
+
+        def get_all_mementos(self, uri_r):
+            assert self.whole, 'The whole TimeMap is retrieved.'
+            return ExampleHandler.get_all_mementos(self, uri_r)
+
+        def get_mementos_since(self, uri_r, since):
+            self.since = since
+            return [m for m in ExampleHandler.get_all_mementos(self, uri_r)
+                    if m[1] >= since.strftime('%Y-%m-%dT%H:%M:%SZ')]
+
+    handler = SinceHandler()
+    app = TimeGate(config=dict(
+        HANDLER_MODULE=handler,
+        BASE_URI='http://www.example.com/',
+        CACHE_USE=True,
+        CACHE_FILE=tmpdir.mkdir('cache').strpath,
+        CACHE_STALE=0,
+        CACHE_MEMORY_MAX_VALUES=0,
+    ))
+    uri_r = 'http://www.example.com/resourceA'
+    mementos = parsed_request(ExampleHandler.get_all_mementos, handler, uri_r)
+    outdated = datetime.now(tzutc()) - timedelta(days=2)
+    app.cache.set(uri_r, mementos[:2])
+    app.cache.backend.set(uri_r, (outdated, mementos[:2]))
+
+    client = Client(app, BaseResponse)
+    response = client.get('/timemap/json/' + uri_r)
+    assert response.status_code == 200
+    data = json.loads(response.data.decode('utf-8'))
+    assert len(data['mementos']['list']) == 3
+    assert handler.since == mementos[1][1]
+    assert app.cache.get_all(uri_r) == mementos
+
+    # Past CACHE_INCREMENTAL_MAX_AGE, the whole TimeMap is retrieved.
+    app.cache.derived_backend.set(
+        app.cache._complete_key(uri_r),
+        time.time() - app.config['CACHE_INCREMENTAL_MAX_AGE'] - 1)
+    app.cache.backend.set(uri_r, (outdated, mementos[1:]))
+    handler.whole = True
+    response = client.get('/timemap/json/' + uri_r)
+    assert response.status_code == 200
+    assert app.cache.get_all(uri_r) == mementos
+    # It is then updated incrementally again.
+    handler.whole = False
+    app.cache.backend.set(uri_r, (outdated, mementos[:2]))
+    assert client.get('/timemap/json/' + uri_r).status_code == 200
+
+
+@pytest.mark.parametrize('append_only,calls', [(True, 0), (False, 1)])
+def test_historical_cache_hits(app, append_only, calls):
+    """Test that outdated TimeMaps answer for past dates if append-only."""
+    from datetime import datetime, timedelta
+    from dateutil.tz import tzutc
+    from timegate.handler import parsed_request
+    from werkzeug.test import Client
+    from werkzeug.wrappers import BaseResponse
+
+    uri_r = 'http://www.example.com/resourceA'
+    get_all_mementos = app.handler.get_all_mementos
+    mementos = parsed_request(get_all_mementos, uri_r)
+    outdated = datetime.now(tzutc()) - timedelta(days=2)
+    app.cache.backend.set(uri_r, (outdated, mementos))
+    app.config.update(APPEND_ONLY=append_only, CACHE_STALE=0)
+    app.cache.memory = app.cache.refresher = None
+    handler_calls = []
+    app.handler.get_all_mementos = lambda uri: (
+        handler_calls.append(uri) or get_all_mementos(uri))
+
+    client = Client(app, BaseResponse)
+    response = client.get(
+        '/timegate/' + uri_r,
+        headers=[('Accept-Datetime', 'Mon, 01 Jan 2001 00:00:00 GMT')],
+    )
+    assert response.status_code == 302
+    assert len(handler_calls) == calls
+
+
+@pytest.mark.parametrize('uri', [
+    'http://www.example.com/v%d', u'http://www.example.com/\xe9t\xe9-%d',
+    'http://www.example.com/"q"-%d',
+])
+def test_streamed_timemaps(app, uri):
+    """Test that large TimeMaps are streamed with their length."""
+    from timegate.application import STREAM_CHUNK_SIZE
+    from werkzeug.test import Client
+
+    # Bodies are only streamed when they are not cached.
+    app.config['CACHE_USE'] = False
+    app.reload()
+    count = 2 * STREAM_CHUNK_SIZE + 1
+    mementos = [(uri % i, '2000-01-01T00:00:%02dZ' % (i % 60))
+                for i in range(count)]
+    app.handler.get_all_mementos = lambda uri_r: mementos
+    client = Client(app)
+    plain = '"' not in uri and max(uri) < u'\x80'
+
+    for response_type in ('link', 'json'):
+        body, status, headers = client.get(
+            '/timemap/%s/resourceA' % response_type)
+        chunks = list(body)
+        assert status.startswith('200')
+        assert len(chunks) == 3
+        data = b''.join(chunks)
+        if response_type == 'link' or plain:
+            assert int(headers['Content-Length']) == len(data)
+        else:
+            assert 'Content-Length' not in headers
+
+        text = data.decode('utf-8')
+        if response_type == 'json':
+            result = json.loads(text)['mementos']
+            assert len(result['list']) == count
+            assert set(m['uri'] for m in result['list']) == \
+                set(u for (u, _) in mementos)
+            assert result['first'] == result['list'][0]
+            assert result['last'] == result['list'][-1]
+        else:
+            links = text.split(',\n')
+            assert len(links) == count + 4
+            assert links[4].endswith('; rel="first memento"; datetime='
+                                     '"Sat, 01 Jan 2000 00:00:00 GMT"')
+            assert links[-1].endswith('"\n')
+
+
+def test_cached_timemap_bodies(app):
+    """Test that rendered TimeMaps are cached and validated."""
+    from timegate import application
+    from timegate.handler import parsed_request
+    from werkzeug.test import Client
+    from werkzeug.wrappers import BaseResponse
+
+    client = Client(app, BaseResponse)
+    uri = '/timemap/link/http://www.example.com/resourceA'
+    response = client.get(uri)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    last_modified = response.headers['Last-Modified']
+    body = response.data
+
+    renders = []
+    render = application.timemap_link_response
+
+    def counting_render(*args):
+        renders.append(args)
+        return render(*args)
+
+    application.timemap_link_response = counting_render
+    try:
+        response = client.get(uri)
+        assert response.status_code == 200
+        assert response.data == body
+        assert response.headers['ETag'] == etag
+        assert int(response.headers['Content-Length']) == len(body)
+        assert not renders
+
+        # Another base URI is another body.
+        response = client.get(uri, base_url='http://other.example.com/')
+        assert response.status_code == 200
+        assert b'http://other.example.com/timegate/' in response.data
+        assert len(renders) == 1
+
+        for headers in ([('If-None-Match', etag)],
+                        [('If-Modified-Since', last_modified)]):
+            response = client.get(uri, headers=headers)
+            assert response.status_code == 304
+            assert response.data == b''
+
+        # A new TimeMap gets new bodies and validators.
+        mementos = parsed_request(app.handler.get_all_mementos,
+                                  'http://www.example.com/resourceA')
+        app.cache.set('http://www.example.com/resourceA', mementos[:2])
+        response = client.get(uri, headers=[('If-None-Match', etag)])
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert response.data != body
+        assert len(renders) == 2
+    finally:
+        application.timemap_link_response = render
+
+
+def test_timemap_pages(app):
+    """Test paged and time-bounded TimeMaps."""
+    from werkzeug.test import Client
+    from werkzeug.wrappers import BaseResponse
+
+    app.config['TIMEMAP_PAGE_SIZE'] = 2
+    client = Client(app, BaseResponse)
+    host = 'http://localhost/timemap/link/'
+
+    response = client.get('/timemap/link/resourceA')
+    assert response.status_code == 200
+    links = response.data.decode('utf-8').split(',\n')
+    assert len(links) == 7
+    assert links[2].startswith(
+        '<%sresourceA>; rel=self; type=application/link-format; '
+        'from="Thu, 30 Sep 1999 01:50:50 GMT"; '
+        'until="Sat, 16 Oct 2010 13:27:27 GMT"' % host)
+    assert links[4] == ('<%s20150103220000/resourceA>; rel=next; '
+                        'type=application/link-format; '
+                        'from="Sat, 03 Jan 2015 22:00:00 GMT"' % host)
+    assert 'rel="first memento"' in links[5]
+    assert 'rel=memento' in links[6]
+
+    response = client.get('/timemap/link/20150103220000/resourceA')
+    assert response.status_code == 200
+    links = response.data.decode('utf-8').split(',\n')
+    assert len(links) == 6
+    assert links[4].startswith(
+        '<%s19990930015050/resourceA>; rel=prev' % host)
+    assert 'resourceA_v3>; rel="last memento"' in links[5]
+
+    response = client.get('/timemap/json/19990930015050/resourceA')
+    data = json.loads(response.data.decode('utf-8'))
+    assert len(data['mementos']['list']) == 2
+    assert data['pages'] == {
+        'next': 'http://localhost/timemap/json/20150103220000/resourceA'}
+    assert data['timemap_uri']['link_format'] == (
+        'http://localhost/timemap/link/19990930015050/resourceA')
+
+    app.config['TIMEMAP_PAGE_SIZE'] = 0
+    response = client.get(
+        '/timemap/json/20000101000000/20120101000000/resourceA')
+    assert response.status_code == 200
+    data = json.loads(response.data.decode('utf-8'))
+    assert [m['uri'] for m in data['mementos']['list']] == [
+        'http://www.example.com/resourceA_v2']
+    assert 'pages' not in data
+
+    response = client.get(
+        '/timemap/json/20160101000000/20170101000000/resourceA')
+    assert response.status_code == 404
+
+
+def test_cached_errors(app, client):
+    """Test that unknown URI-Rs are remembered unless no-cache is sent."""
+    get_all_mementos = app.handler.get_all_mementos
+    calls = []
+
+    def counted_get_all_mementos(uri_r):
+        calls.append(uri_r)
+        return get_all_mementos(uri_r)
+
+    app.handler.get_all_mementos = counted_get_all_mementos
+    uri = '/timemap/link/http://www.example.com/unknown'
+    assert client.get(uri).status_code == 404
+    assert client.get(uri).status_code == 404
+    assert len(calls) == 1
+    assert client.get(
+        uri, headers=[('Cache-Control', 'no-cache')]).status_code == 404
+    assert len(calls) == 2
+
+    app.cache.delete_error('http://www.example.com/unknown')
+    assert client.get(uri).status_code == 404
+    assert len(calls) == 3
+
+
+def test_http_caching(app, client):
+    """Test the caching headers and the conditional requests."""
+    get_all_mementos = app.handler.get_all_mementos
+    calls = []
+
+    def counted_get_all_mementos(uri_r):
+        calls.append(uri_r)
+        return get_all_mementos(uri_r)
+
+    app.handler.get_all_mementos = counted_get_all_mementos
+    timegate = '/timegate/http://www.example.com/resourceA'
+    timemap = '/timemap/link/http://www.example.com/resourceA'
+    # Pages are not cached as rendered bodies.
+    page = '/timemap/json/19990101000000/http://www.example.com/resourceA'
+
+    # Nothing is cached yet.
+    response = client.get(timegate,
+                          headers=[('Cache-Control', 'only-if-cached')])
+    assert response.status_code == 504
+    assert not calls
+
+    for uri in (timegate, timemap, page):
+        response = client.get(uri)
+        assert response.status_code in (200, 302)
+        assert response.headers['ETag']
+        assert response.headers['Last-Modified']
+        cache_control = response.headers['Cache-Control']
+        assert 'public' in cache_control
+        assert 0 < int(cache_control.split('max-age=')[1]) <= 86400
+
+        response = client.get(uri, headers=[
+            ('If-None-Match', response.headers['ETag'])])
+        assert response.status_code == 304
+        assert not response.data
+    assert len(calls) == 1
+
+    response = client.get(timegate, headers=[
+        ('If-None-Match', response.headers['ETag']),
+        ('Accept-Datetime', 'Sat, 01 Jan 2000 00:00:00 GMT'),
+    ])
+    assert response.status_code == 302
+    assert client.get(timegate, headers=[
+        ('Cache-Control', 'only-if-cached')]).status_code == 302
+    assert len(calls) == 1
+
+    for headers in ([('Cache-Control', 'max-age=0')],
+                    [('Pragma', 'no-cache')]):
+        time.sleep(0.01)
+        assert client.get(timemap, headers=headers).status_code == 200
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize('keep_alive', [True, False])
+def test_keep_alive(app, client, keep_alive):
+    """Test that connections are only closed when configured so."""
+    app.config['KEEP_ALIVE'] = keep_alive
+    for uri in ('/timegate/http://www.example.com/resourceA',
+                '/timemap/link/http://www.example.com/resourceA',
+                '/timemap/link/http://www.example.com/unknown'):
+        response = client.get(uri)
+        assert response.headers.get('Connection') == (
+            None if keep_alive else 'close')
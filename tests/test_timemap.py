@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+
+"""TimeMap tests."""
+
+from __future__ import absolute_import, print_function
+
+import pickle
+from datetime import datetime, timedelta
+
+import pytest
+from dateutil.tz import tzutc
+from hypothesis import given
+from hypothesis import strategies as st
+
+from timegate.timemap import TimeMap
+from timegate.utils import closest, closest_before
+
+EPOCH = datetime(2000, 1, 1, tzinfo=tzutc())
+
+
+def make_mementos(seconds):
+    """Build unsorted mementos with unique URIs from second offsets."""
+    return [('http://example.com/m%d' % i, EPOCH + timedelta(seconds=s))
+            for i, s in enumerate(seconds)]
+
+
+def test_sequence():
+    """Test that a TimeMap behaves like a sorted list of tuples."""
+    mementos = make_mementos([20, 0, 10])
+    timemap = TimeMap.from_mementos(mementos)
+    expected = sorted(mementos, key=lambda m: m[1])
+
+    assert len(timemap) == 3
+    assert timemap == expected
+    assert list(timemap) == expected
+    assert timemap[0] == timemap.first == expected[0]
+    assert timemap[-1] == timemap.last == expected[-1]
+    assert timemap[1:] == expected[1:]
+    assert isinstance(timemap[1:], TimeMap)
+    (uri_m, dt_m) = timemap[1]
+    assert dt_m.tzinfo is not None
+    assert TimeMap.from_mementos(timemap) is timemap
+    assert not TimeMap()
+
+
+def test_microseconds():
+    """Test that datetimes with microseconds are truncated to the second."""
+    before = datetime(1969, 12, 31, 23, 59, 59, 500000, tzinfo=tzutc())
+    after = datetime(2000, 1, 1, 0, 0, 0, 500000, tzinfo=tzutc())
+    timemap = TimeMap.from_mementos([('a', before), ('b', after)])
+    assert list(timemap.timestamps) == [-1, 946684800]
+    assert timemap[0][1] == before.replace(microsecond=0)
+    assert timemap.closest(before)[0] == 'a'
+    assert timemap.closest_before(before)[0] == 'a'
+
+
+def test_pickle():
+    """Test that a TimeMap can be stored by the cache."""
+    timemap = TimeMap.from_mementos(make_mementos([0, 10]))
+    assert pickle.loads(pickle.dumps(timemap, -1)) == timemap
+
+
+def test_http_dates():
+    """Test HTTP dates rendering."""
+    timemap = TimeMap.from_mementos(make_mementos([0]))
+    assert list(timemap.http_dates()) == ['Sat, 01 Jan 2000 00:00:00 GMT']
+
+
+@given(st.lists(st.integers(0, 40), min_size=1), st.integers(-5, 45))
+def test_closest(seconds, target):
+    """Test bisect lookups against the linear selection."""
+    timemap = TimeMap.from_mementos(make_mementos(seconds))
+    accept_datetime = EPOCH + timedelta(seconds=target)
+    assert timemap.closest(accept_datetime) == \
+        closest(list(timemap), accept_datetime)
+    assert timemap.closest_before(accept_datetime) == \
+        closest_before(list(timemap), accept_datetime)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_serialization(compress):
+    """Test the compact binary format."""
+    from timegate.timemap import dumps, loads
+    timemap = TimeMap.from_mementos(
+        make_mementos([30, 0, 10, 10]) + [(u'http://example.com/\xe9', EPOCH)]
+    )
+    data = dumps(timemap, compress=compress)
+    assert loads(data) == timemap
+    assert loads(memoryview(data))[-1] == timemap[-1]
+    assert len(loads(dumps(TimeMap()))) == 0
+
+    with pytest.raises(ValueError):
+        loads(data[:-1])
+    with pytest.raises(ValueError):
+        loads(b'XXXX' + data[4:])
+
+
+def test_merge():
+    """Test that mementos retrieved since the last one are merged."""
+    timemap = TimeMap.from_mementos(make_mementos([0, 10, 20]))
+    since = [timemap[-1], ('http://example.com/new', EPOCH +
+                           timedelta(seconds=30))]
+    merged = timemap.merge(since)
+    assert merged == list(timemap) + since[1:]
+    assert timemap.merge([]) is timemap
+    assert timemap.merge(timemap[:1]) == timemap
+
+
+@pytest.mark.parametrize('uris,plain', [
+    (['http://a/1', 'http://a/22'], True),
+    ([u'http://a/\xe9'], False),
+    (['http://a/"1"'], False),
+    (['http://a/\\1'], False),
+])
+def test_uri_sizes(uris, plain):
+    """Test the sizes of the URIs, decoded or not."""
+    from timegate.timemap import dumps, loads
+    timemap = TimeMap(uris, list(range(len(uris))))
+    nbytes = sum(len(uri.encode('utf-8')) for uri in uris)
+    for tm in (timemap, loads(dumps(timemap))):
+        assert tm.uris_nbytes == nbytes
+        assert tm.plain_uris == plain
+        assert list(tm.iter_uris()) == uris
+
+
+def test_concurrent_decoding():
+    """Test that URIs can be read while another thread decodes them."""
+    import sys
+    import threading
+    from timegate.timemap import dumps, loads
+    mementos = make_mementos(range(200))
+    data = dumps(TimeMap.from_mementos(mementos))
+    errors = []
+
+    def read(timemap):
+        try:
+            for i in range(len(timemap)):
+                assert timemap[i] == mementos[i]
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    # Switch threads often, so that reads interleave with the decoding.
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(300):
+            timemap = loads(data)
+            threads = [threading.Thread(target=read, args=(timemap, ))
+                       for _ in range(2)]
+            threads.append(threading.Thread(target=lambda: timemap.uris))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors
+
+    timemap = loads(data)
+    nbytes = timemap.nbytes
+    assert timemap.uris == [uri for (uri, _) in mementos]
+    assert timemap.nbytes == nbytes + sum(
+        len(uri) + 57 for (uri, _) in mementos)
+    assert timemap.uris_nbytes == sum(len(uri) for (uri, _) in mementos)
+    assert timemap.plain_uris
+
+
+def test_pages():
+    """Test that pages are sliced at datetime boundaries."""
+    from timegate.timemap import Page, from_timestamp
+    timemap = TimeMap(['a', 'b', 'c', 'd', 'e', 'f'], [1, 2, 2, 3, 4, 5])
+
+    page = Page(timemap)
+    assert page.complete and page.mementos == timemap
+    assert page.prev is None and page.next is None
+
+    page = Page(timemap, size=1)
+    assert page.mementos.uris == ['a']
+    assert page.prev is None
+    assert page.next == from_timestamp(2)
+    assert page.has_first and not page.has_last and not page.complete
+
+    # Mementos sharing a datetime are on the same page.
+    page = Page(timemap, start=page.next, size=1)
+    assert page.mementos.uris == ['b', 'c']
+    assert page.prev == from_timestamp(1)
+    assert page.next == from_timestamp(3)
+
+    page = Page(timemap, start=from_timestamp(3), size=2)
+    assert page.mementos.uris == ['d', 'e']
+    assert page.prev == from_timestamp(2)
+    assert page.next == from_timestamp(5)
+
+    page = Page(timemap, start=from_timestamp(2), until=from_timestamp(4))
+    assert page.mementos.uris == ['b', 'c', 'd', 'e']
+    assert not page.has_first and not page.has_last
+    assert page.prev is None and page.next is None
+
+    page = Page(timemap, start=from_timestamp(6))
+    assert len(page.mementos) == 0
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+
+"""Utilities tests."""
+
+from __future__ import absolute_import, print_function
+
+from datetime import datetime, timedelta
+
+import pytest
+from dateutil.tz import tzutc
+from hypothesis import given
+from hypothesis import strategies as st
+
+from timegate.utils import (closest, closest_before, closest_before_binary,
+                            closest_binary, date_parser, parse_fuzzy,
+                            validate_date)
+
+EPOCH = datetime(2000, 1, 1, tzinfo=tzutc())
+
+# Few distinct offsets so that duplicates and equal distances are common.
+offsets = st.integers(min_value=0, max_value=40)
+
+
+def make_timemap(seconds):
+    """Build a sorted TimeMap with unique URIs from second offsets."""
+    return [
+        ('http://example.com/m%d' % i, EPOCH + timedelta(seconds=s))
+        for i, s in enumerate(sorted(seconds))
+    ]
+
+
+@given(st.lists(offsets, min_size=1), st.integers(-5, 45))
+def test_closest_binary(seconds, target):
+    """Test binary search against the linear closest memento."""
+    timemap = make_timemap(seconds)
+    accept_datetime = EPOCH + timedelta(seconds=target)
+    assert closest_binary(timemap, accept_datetime) == \
+        closest(timemap, accept_datetime)
+
+
+@given(st.lists(offsets, min_size=1), st.integers(-5, 45))
+def test_closest_before_binary(seconds, target):
+    """Test binary search against the linear closest previous memento."""
+    timemap = make_timemap(seconds)
+    accept_datetime = EPOCH + timedelta(seconds=target)
+    assert closest_before_binary(timemap, accept_datetime) == \
+        closest_before(timemap, accept_datetime)
+
+
+def test_closest_ties():
+    """Test that the latest of equally close mementos wins."""
+    timemap = make_timemap([0, 10, 10, 20])
+    assert closest_binary(timemap, EPOCH + timedelta(seconds=5))[0] == \
+        'http://example.com/m2'
+    assert closest_binary(timemap, EPOCH + timedelta(seconds=15))[0] == \
+        'http://example.com/m3'
+    assert closest_before_binary(timemap, EPOCH)[0] == \
+        'http://example.com/m0'
+    assert closest_before_binary(timemap, EPOCH - timedelta(1))[0] == \
+        'http://example.com/m0'
+
+
+@given(st.datetimes(min_value=datetime(1000, 1, 1)),
+       st.sampled_from([
+           '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%d %H:%M:%S',
+           '%Y-%m-%dT%H:%M:%S+00:00', '%Y%m%d%H%M%S',
+           '%a, %d %b %Y %H:%M:%S GMT', '%d %b %Y %H:%M:%S UTC',
+       ]))
+def test_fast_dates(date, date_format):
+    """Test the fast date parsers against dateutil."""
+    datestr = date.strftime(date_format)
+    assert validate_date(datestr) == parse_fuzzy(datestr)
+
+
+@pytest.mark.parametrize('datestr', [
+    '2015-01-03T22:00:00+02:00',
+    '2015-01-03',
+    'Jan 3 2015, 10pm',
+    'Modified on 2015-01-03T22:00:00Z',
+])
+def test_fuzzy_dates(datestr):
+    """Test that other dates are still parsed by dateutil."""
+    assert validate_date(datestr) == parse_fuzzy(datestr)
+    assert validate_date(datestr, 'wayback') == parse_fuzzy(datestr)
+
+
+def test_date_parser():
+    """Test declared formats and the detection of the format."""
+    expected = datetime(2015, 1, 3, 22, tzinfo=tzutc())
+    parse = date_parser('%d/%m/%Y %H')
+    assert parse('03/01/2015 22') == expected
+    assert parse('20150103220000') == expected
+    assert parse('2015-01-03T22:00:00Z') == expected
+    with pytest.raises(ValueError):
+        parse('2015-13-03T22:00:00Z')
@@ -14,8 +14,11 @@ from __future__ import absolute_import, print_function
 
 import json
 import logging
+import math
 import os
+import threading
 from datetime import datetime
+from functools import partial
 
 from pkg_resources import iter_entry_points
 
@@ -29,9 +32,13 @@ from werkzeug.utils import cached_property, import_string
 from werkzeug.wrappers import Request, Response
 
 from . import constants
-from .cache import Cache
+from .backends import RedisBackend, SQLiteBackend
+from .cache import DERIVED_VALUES_PER_TIMEMAP, Cache
 from .config import Config
-from .handler import Handler, parsed_request
+from .errors import CacheError, HandlerError
+from .handler import Handler, parsed_request, parsed_since_request
+from .singleflight import SingleFlight
+from .timemap import Page, to_timestamp
 from .utils import best
 
 local = Local()
@@ -46,6 +53,24 @@ request = local('request')
 # logging.getLogger(__name__)
 # logging.basicConfig(level=logging.DEBUG)
 
+STREAM_CHUNK_SIZE = 1000
+"""Number of mementos per chunk of the streamed TimeMaps."""
+
+# Memento entries of the TimeMaps, and a date of the length of all HTTP dates
+MEMENTO_LINK = ',\n<%s>; rel=%s; datetime="%s"'
+MEMENTO_JSON = '%s{"uri": %s, "datetime": "%s"}'
+HTTP_DATE = 'Thu, 01 Jan 1970 00:00:00 GMT'
+
+TIMEMAP_CONTENT_TYPES = {
+    'link': 'application/link-format',
+    'json': 'application/json',
+}
+
+DEFAULT_CONFIG_FILE = os.path.join(
+    os.path.dirname(__file__), 'conf', 'config.ini'
+)
+"""Configuration file used by the WSGI application object."""
+
 
 def url_for(*args, **kwargs):
     """Proxy to URL Map adapter builder."""
@@ -97,14 +122,31 @@ class URIConverter(BaseConverter):
         return value
 
 
+class DateTimeConverter(BaseConverter):
+    """Datetime of 14 digits, e.g. ``20150103220000``, in UTC."""
+
+    regex = r'\d{14}'
+
+    def to_python(self, value):
+        """Return the datetime."""
+        try:
+            return datetime.strptime(value, '%Y%m%d%H%M%S').replace(
+                tzinfo=tzutc())
+        except ValueError:
+            raise ValidationError()
+
+    def to_url(self, value):
+        """Return the 14 digits."""
+        return '%04d%02d%02d%02d%02d%02d' % value.utctimetuple()[:6]
+
+
 class TimeGate(object):
     """Implementation of Memento protocol with configurable handlers."""
 
     def __init__(self, config=None, cache=None):
         """Initialize application with handler."""
-        self.config = Config(None)
-        self.config.from_object(constants)
-        self.config.update(config or {})
+        self.config = load_config(config=config)
+        self._custom_cache = cache
         self.cache = None
         if cache:
             self.cache = cache
@@ -114,6 +156,8 @@ class TimeGate(object):
     @cached_property
     def handler(self):
         handler = load_handler(self.config['HANDLER_MODULE'])
+        if isinstance(handler, Handler):
+            handler.configure(self.config)
         HAS_TIMEGATE = hasattr(handler, 'get_memento')
         HAS_TIMEMAP = hasattr(handler, 'get_all_mementos')
         if self.config['USE_TIMEMAPS'] and (not HAS_TIMEMAP):
@@ -137,18 +181,127 @@ class TimeGate(object):
             Rule('/timemap/<any(json, link):response_type>/'
                  '<uri(base_uri="{0}"):uri_r>'.format(base_uri),
                  endpoint='timemap', methods=['GET', 'HEAD']),
+            # Pages from a datetime and TimeMaps between two datetimes
+            Rule('/timemap/<any(json, link):response_type>/'
+                 '<datetime:start>/<uri(base_uri="{0}"):uri_r>'.format(
+                     base_uri),
+                 endpoint='timemap', methods=['GET', 'HEAD']),
+            Rule('/timemap/<any(json, link):response_type>/'
+                 '<datetime:start>/<datetime:until>/'
+                 '<uri(base_uri="{0}"):uri_r>'.format(base_uri),
+                 endpoint='timemap', methods=['GET', 'HEAD']),
         ]
-        return Map(rules, converters={'uri': URIConverter})
+        return Map(rules, converters={'uri': URIConverter,
+                                      'datetime': DateTimeConverter})
+
+    @cached_property
+    def single_flight(self):
+        """Coalesce concurrent retrievals of the same TimeMap.
+
+        With a cache, the processes sharing the cache directory coalesce
+        their retrievals too.
+        """
+        lock_dir = None
+        if self.cache:
+            lock_dir = self.config['CACHE_FILE'].rstrip('/') + '.locks'
+        return SingleFlight(lock_dir,
+                            timeout=self.config['CACHE_LOCK_TIMEOUT'])
 
     def _build_default_cache(self):
         """Build default cache object."""
+        backend = self._build_cache_backend()
         self.cache = Cache(
             self.config['CACHE_FILE'],
             self.config['CACHE_TOLERANCE'],
             self.config['CACHE_EXP'],
             self.config['CACHE_MAX_VALUES'],
+            compress=self.config['CACHE_COMPRESS'],
+            memory_max_values=self.config['CACHE_MEMORY_MAX_VALUES'],
+            memory_max_bytes=self.config['CACHE_MEMORY_MAX_SIZE'],
+            backend=backend,
+            derived_backend=self._build_derived_cache_backend(backend),
+            stale=self.config['CACHE_STALE'],
+            refresh_workers=self.config['CACHE_REFRESH_WORKERS'],
+            negative_ttl=self.config['CACHE_NEGATIVE_TTL'],
+            negative_max_ttl=self.config['CACHE_NEGATIVE_MAX_TTL'],
+            negative_5xx=self.config['CACHE_NEGATIVE_5XX'],
+            incremental_max_age=self.config['CACHE_INCREMENTAL_MAX_AGE'],
         )
 
+    def _build_cache_backend(self):
+        """Build the cache storage backend selected in the configuration.
+
+        :return: The backend, None for the default file system one.
+        """
+        name = self.config['CACHE_BACKEND']
+        if name == 'filesystem':
+            return None
+        elif name == 'sqlite':
+            return SQLiteBackend(
+                self.config['CACHE_SQLITE_FILE'] or os.path.join(
+                    self.config['CACHE_FILE'], 'timegate.sqlite'),
+                threshold=self.config['CACHE_MAX_VALUES'],
+                default_timeout=self.config['CACHE_EXP'],
+                compress=self.config['CACHE_COMPRESS'],
+            )
+        elif name == 'redis':
+            return RedisBackend(
+                self.config['CACHE_REDIS_URL'],
+                default_timeout=self.config['CACHE_EXP'],
+                compress=self.config['CACHE_COMPRESS'],
+            )
+        raise CacheError('Unknown cache backend "{0}".'.format(name))
+
+    def _build_derived_cache_backend(self, backend):
+        """Build the backend of the rendered bodies and handler errors.
+
+        :param backend: The backend of the TimeMaps.
+        :return: The backend, None for the cache default.
+        """
+        if isinstance(backend, SQLiteBackend):
+            # Their own table, so that they do not evict TimeMaps.
+            return SQLiteBackend(
+                backend.filename,
+                threshold=(self.config['CACHE_MAX_VALUES'] *
+                           DERIVED_VALUES_PER_TIMEMAP),
+                default_timeout=self.config['CACHE_EXP'],
+                table='timegate_derived',
+            )
+        return None
+
+    def reload(self, filename=None):
+        """Reload the configuration and rebuild the derived objects.
+
+        The handler, the URL map and the default cache are built again
+        from the new configuration on their next access.
+
+        :param filename: (Optional) INI file to read the configuration from.
+        """
+        if filename:
+            # Requests being served keep reading the former config.
+            config = Config.fresh(None, self.config)
+            config.from_inifile(filename)
+            self.config = config
+        # Drop the values memoized by ``cached_property``.
+        self.__dict__.pop('handler', None)
+        self.__dict__.pop('url_map', None)
+        self.__dict__.pop('single_flight', None)
+        self.close()
+        self.cache = None
+        if self._custom_cache:
+            self.cache = self._custom_cache
+        elif self.config['CACHE_USE']:
+            self._build_default_cache()
+
+    def close(self):
+        """Stop the background refreshes of the default cache.
+
+        A cache given to the application is left to its owner.
+        """
+        if self.cache and self.cache.refresher and \
+                self.cache is not self._custom_cache:
+            self.cache.refresher.shutdown(wait=False)
+
     def __repr__(self):
         """Representation of this class."""
         return '<{0} {1}>'.format(
@@ -171,6 +324,8 @@ class TimeGate(object):
     def wsgi_app(self, environ, start_response):
         local.request = request = Request(environ)
         response = self.dispatch_request(request)
+        if not self.config['KEEP_ALIVE']:
+            response = close_connection(response, environ)
         return response(environ, start_response)
 
     def __call__(self, environ, start_response):
@@ -189,22 +344,109 @@ class TimeGate(object):
         return parsed_request(self.handler.get_memento,
                               uri_r, accept_datetime)
 
-    def get_all_mementos(self, uri_r):
+    @property
+    def append_only(self):
+        """Whether the handler histories only grow after their last memento.
+
+        It defaults to true for version control systems.
+        """
+        if self.config['APPEND_ONLY'] is None:
+            return self.config['RESOURCE_TYPE'] == 'vcs'
+        return self.config['APPEND_ONLY']
+
+    def get_all_mementos(self, uri_r, until=None):
         """Uses the handler to retrieve a TimeMap for an original resource.
 
         The value is cached if the cache is activated.
 
         :param uri_r: The URI to retrieve and cache the TimeMap of.
+        :param until: (Optional) The datetime up to which the TimeMap must
+        be complete. A cached TimeMap is then used as long as it was fresh
+        at that datetime. Defaults to now.
         :return: The retrieved value.
         """
-        mementos = None
-        if self.cache and request.cache_control != 'no-cache':
-            mementos = self.cache.get_all(uri_r)
-        if mementos is None:
-            mementos = parsed_request(self.handler.get_all_mementos, uri_r)
+        return self.get_timemap_entry(uri_r, until)[1]
+
+    def get_timemap_entry(self, uri_r, until=None):
+        """Return the TimeMap of an original resource and its timestamp.
+
+        See :meth:`get_all_mementos`.
+
+        :return: The ``(timestamp, timemap)`` tuple, the timestamp being
+        when the TimeMap was retrieved.
+        """
+        entry = check = None
+        use_cache = uses_cache(request)
+        # Concurrent retrievals of the same TimeMap are done once.
+        retrieve = partial(self.single_flight.do, uri_r, partial(
+            self._retrieve_all_mementos, uri_r, incremental=use_cache))
+        if self.cache and use_cache:
+            if until is None:
+                until = datetime.utcnow().replace(tzinfo=tzutc())
+            max_age = request.cache_control.max_age
+            entry = self.cache.get_entry_until(uri_r, until, refresh=retrieve,
+                                               max_age=max_age)
+            check = partial(self.cache.get_entry_until, uri_r, until,
+                            max_age=max_age)
+            if entry is None:
+                raise_cached_error(self.cache, uri_r)
+        if entry is None:
+            if only_if_cached(request):
+                abort(504)
+            entry = retrieve(check)
+        return entry
+
+    def _retrieve_all_mementos(self, uri_r, incremental=True):
+        """Retrieve a TimeMap from the handler and cache it.
+
+        When the handler implements ``get_mementos_since`` and an outdated
+        TimeMap is cached, only the mementos since its last one are
+        retrieved and merged into it, until the TimeMap was last retrieved
+        whole more than ``CACHE_INCREMENTAL_MAX_AGE`` seconds ago.
+
+        :param uri_r: The URI-R of the resource.
+        :param incremental: (Optional) When false, the whole TimeMap is
+        retrieved.
+        :return: The ``(timestamp, timemap)`` tuple.
+        """
+        cached = None
+        if (incremental and self.cache and
+                hasattr(self.handler, 'get_mementos_since')):
+            cached = self.cache.peek_updatable(uri_r)
+        try:
+            if cached:
+                since = cached.last[1]
+                logging.info('Retrieving mementos of %s since %s',
+                             uri_r, since)
+                mementos = cached.merge(parsed_since_request(
+                    self.handler.get_mementos_since, uri_r, since))
+            else:
+                mementos = parsed_request(self.handler.get_all_mementos,
+                                          uri_r)
+        except HandlerError as he:
             if self.cache:
-                self.cache.set(uri_r, mementos)
-        return mementos
+                self.cache.set_error(uri_r, he.code, he.description)
+            raise he
+        if self.cache:
+            return self.cache.set(uri_r, mementos, complete=not cached)
+        return (datetime.utcnow().replace(tzinfo=tzutc()), mementos)
+
+    @property
+    def use_timemaps(self):
+        """Whether TimeMaps are served and mementos selected in them."""
+        return (hasattr(self.handler, 'get_all_mementos') and
+                self.config['USE_TIMEMAPS'])
+
+    def timemap_until(self, accept_datetime):
+        """Return the datetime up to which a TimeMap must be complete.
+
+        Past parts of append-only histories cannot change: cached TimeMaps
+        answer for dates before they were retrieved.
+
+        :param accept_datetime: The requested datetime.
+        :return: The datetime, None for now.
+        """
+        return accept_datetime if self.append_only else None
 
     def timegate(self, uri_r):
         """Handle timegate high-level logic.
@@ -215,39 +457,60 @@ class TimeGate(object):
 
         :return: The body of the HTTP response.
         """
-        if 'Accept-Datetime' in request.headers:
-            accept_datetime = parse_date(
-                request.headers['Accept-Datetime']
-            ).replace(tzinfo=tzutc())
-        else:
-            accept_datetime = datetime.utcnow().replace(tzinfo=tzutc())
+        accept_datetime = parse_accept_datetime(request)
 
         # Runs the handler's API request for the Memento
-        mementos = first = last = None
-        HAS_TIMEMAP = hasattr(self.handler, 'get_all_mementos')
-        if HAS_TIMEMAP and self.config['USE_TIMEMAPS']:
+        mementos = memento = timestamp = None
+        if self.use_timemaps:
             logging.debug('Using multiple-request mode.')
-            mementos = self.get_all_mementos(uri_r)
+            timestamp, mementos = self.get_timemap_entry(
+                uri_r, self.timemap_until(accept_datetime))
+
+        if not mementos:
+            logging.debug('Using single-request mode.')
+            if only_if_cached(request):
+                abort(504)
+            memento = self.get_memento(uri_r, accept_datetime)
 
+        return self.timegate_response(uri_r, accept_datetime, mementos,
+                                      memento, timestamp)
+
+    def timegate_response(self, uri_r, accept_datetime, mementos=None,
+                          memento=None, timestamp=None):
+        """Build the TimeGate response.
+
+        :param uri_r: The URI-R of the original resource.
+        :param accept_datetime: The requested datetime.
+        :param mementos: (Optional) The ``TimeMap`` to select the memento in.
+        :param memento: (Optional) The memento returned by the handler,
+            when there is no TimeMap.
+        :param timestamp: (Optional) The datetime at which the TimeMap was
+            retrieved.
+        :return: The ``Response`` object.
+        """
+        first = last = None
         if mementos:
-            first = mementos[0]
-            last = mementos[-1]
+            first = mementos.first
+            last = mementos.last
+            # If the handler returned several Mementos, take the closest
             memento = best(mementos, accept_datetime,
                            self.config['RESOURCE_TYPE'])
-        else:
-            logging.debug('Using single-request mode.')
-            memento = self.get_memento(uri_r, accept_datetime)
 
-        # If the handler returned several Mementos, take the closest
-        return memento_response(
+        response = memento_response(
             memento,
             uri_r,
             first,
             last,
-            has_timemap=HAS_TIMEMAP and self.config['USE_TIMEMAPS'],
+            has_timemap=self.use_timemaps,
         )
-
-    def timemap(self, uri_r, response_type='link'):
+        etag = None
+        if timestamp is not None:
+            # The redirection also depends on the Accept-Datetime.
+            etag = '%s-%x' % (timestamp_etag(timestamp),
+                              int(math.floor(to_timestamp(memento[1]))))
+        return self.cacheable_response(response, timestamp, etag)
+
+    def timemap(self, uri_r, response_type='link', start=None, until=None):
         """Handle TimeMap high-level logic.
 
         It fetches all Mementos for an Original Resource and builds the TimeMap
@@ -255,18 +518,158 @@ class TimeGate(object):
         the message body.
 
         :param req_uri: The requested original resource URI.
-        :param start_response: WSGI callback function.
+        :param response_type: (Optional) ``link`` or ``json``.
+        :param start: (Optional) The datetime of the first memento.
+        :param until: (Optional) The latest datetime of the mementos.
         :return: The body of the HTTP response.
         """
         if not self.config['USE_TIMEMAPS']:
             abort(403)
 
-        mementos = self.get_all_mementos(uri_r)
+        entry = self.get_timemap_entry(uri_r)
+        return self.timemap_entry_response(uri_r, response_type, entry,
+                                           start, until)
+
+    def timemap_entry_response(self, uri_r, response_type, entry,
+                               start=None, until=None):
+        """Build the TimeMap response of a TimeMap and its timestamp.
+
+        The page is sliced from the TimeMap. With a cache, the bodies of
+        the first pages are cached along with the TimeMap.
+
+        :param uri_r: The URI-R of the original resource.
+        :param response_type: ``link`` or ``json``.
+        :param entry: The ``(timestamp, timemap)`` tuple.
+        :param start: (Optional) The datetime of the first memento.
+        :param until: (Optional) The latest datetime of the mementos.
+        :return: The ``Response`` object.
+        """
+        timestamp, mementos = entry
+        page = Page(mementos, start, until, self.config['TIMEMAP_PAGE_SIZE'])
+        if not len(page.mementos):
+            abort(404)
+        if self.cache is None or start is not None:
+            return self.cacheable_response(self.timemap_response(
+                uri_r, response_type, mementos, page), timestamp)
+
+        name = timemap_body_name(request, response_type,
+                                 self.config['TIMEMAP_PAGE_SIZE'])
+        body = self.cache.get_body(uri_r, name, timestamp)
+        if body is None:
+            body = b''.join(self.timemap_response(
+                uri_r, response_type, mementos, page).response)
+            self.cache.set_body(uri_r, name, timestamp, body)
+        return self.cacheable_response(
+            timemap_body_response(body, response_type), timestamp)
+
+    def timemap_response(self, uri_r, response_type, mementos, page=None):
+        """Build the TimeMap response in the requested format.
+
+        :param uri_r: The URI-R of the original resource.
+        :param response_type: ``link`` or ``json``.
+        :param mementos: The ``TimeMap``.
+        :param page: (Optional) The ``Page`` of the TimeMap to send.
+            Defaults to the whole TimeMap.
+        :return: The ``Response`` object.
+        """
         # Generates the TimeMap response body and Headers
         if response_type == 'json':
-            return timemap_json_response(self, mementos, uri_r)
+            return timemap_json_response(self, mementos, uri_r, page)
         else:
-            return timemap_link_response(self, mementos, uri_r)
+            return timemap_link_response(self, mementos, uri_r, page)
+
+    def cacheable_response(self, response, timestamp=None, etag=None):
+        """Add the HTTP caching headers of a response.
+
+        Shared caches may store it as long as the TimeMap it is built from
+        is fresh, i.e. ``CACHE_TOLERANCE`` seconds after its retrieval.
+        Its validators are derived from that retrieval, so that
+        conditional requests are answered with a 304.
+
+        :param response: The ``Response`` object.
+        :param timestamp: (Optional) The datetime at which the TimeMap was
+            retrieved. Defaults to now, without validators.
+        :param etag: (Optional) The ETag, defaults to one derived from the
+            timestamp.
+        :return: The ``Response`` object.
+        """
+        max_age = self.config['CACHE_TOLERANCE']
+        if timestamp is not None:
+            response.set_etag(etag or timestamp_etag(timestamp))
+            response.last_modified = timestamp
+            max_age -= (datetime.utcnow().replace(tzinfo=tzutc()) -
+                        timestamp).total_seconds()
+        response.cache_control.public = True
+        response.cache_control.max_age = max(int(max_age), 0)
+        return response.make_conditional(request)
+
+
+def load_config(filename=None, config=None):
+    """Build a configuration apart from the one of running applications.
+
+    :param filename: (Optional) INI file to read the configuration from.
+    :param config: (Optional) Dictionary overriding the configuration.
+    :return: The new ``Config`` object.
+    """
+    conf = Config.fresh(None)
+    conf.from_object(constants)
+    if filename:
+        conf.from_inifile(filename)
+    conf.update(config or {})
+    return conf
+
+
+def create_app(filename=DEFAULT_CONFIG_FILE, config=None, cache=None):
+    """Build a TimeGate application ready to serve requests.
+
+    The handler, the URL map and the cache are built here once so that
+    the returned application can be reused for the lifetime of a worker.
+
+    :param filename: (Optional) INI file to read the configuration from.
+    :param config: (Optional) Dictionary overriding the configuration.
+    :param cache: (Optional) Cache object to use instead of the default.
+    :return: The ``TimeGate`` instance.
+    """
+    app = TimeGate(config=load_config(filename, config), cache=cache)
+    # Builds the lazy attributes before the first request comes in.
+    app.handler
+    app.url_map
+    return app
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def get_app():
+    """Return the application of the current process.
+
+    It is built on first use, so each forked worker owns its instance.
+    """
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+    return _app
+
+
+def reload_app(filename=DEFAULT_CONFIG_FILE):
+    """Reload the configuration of the current process application.
+
+    Call it (e.g. from a signal or a management hook) after editing the
+    configuration file to pick up the changes without restarting.
+
+    :param filename: (Optional) INI file to read the configuration from.
+    """
+    global _app
+    # Built apart from the current application, which serves requests
+    # until it is replaced.
+    app = create_app(filename)
+    with _app_lock:
+        replaced, _app = _app, app
+    if replaced is not None:
+        replaced.close()
 
 
 @local_manager.middleware
@@ -283,11 +686,60 @@ def application(environ, start_response):
     and headers to the server.
     :return: The response body, in a list of one str element.
     """
-    app = TimeGate()
-    app.config.from_inifile(
-        os.path.join(os.path.dirname(__file__), 'conf', 'config.ini')
-    )
-    return app(environ, start_response)
+    return get_app()(environ, start_response)
+
+
+def close_connection(response, environ):
+    """Ask the client to close its connection after a response.
+
+    :param response: The ``Response`` object or the ``HTTPException``.
+    :param environ: The WSGI environment of the request.
+    :return: The ``Response`` object.
+    """
+    if isinstance(response, HTTPException):
+        response = response.get_response(environ)
+    response.headers['Connection'] = 'close'
+    return response
+
+
+def uses_cache(request):
+    """Return whether a request may be answered from cache.
+
+    It may not with the ``no-cache`` directive of its ``Cache-Control``
+    header, or of its ``Pragma`` header for HTTP/1.0 clients.
+    """
+    return not (request.cache_control.no_cache or 'no-cache' in request.pragma)
+
+
+def only_if_cached(request):
+    """Return whether a request must be answered from cache only."""
+    return bool(request.cache_control.only_if_cached)
+
+
+def raise_cached_error(cache, uri_r):
+    """Raise the handler error cached for a URI-R, if any.
+
+    :param cache: The ``Cache``.
+    :param uri_r: The URI-R of the resource.
+    :raise HandlerError: The cached error.
+    """
+    error = cache.get_error(uri_r)
+    if error is not None:
+        status, message = error
+        raise HandlerError(message, status)
+
+
+def parse_accept_datetime(request):
+    """Return the datetime requested in the ``Accept-Datetime`` header.
+
+    :param request: The ``Request`` object.
+    :return: The UTC datetime, now if there is no such header.
+    """
+    if 'Accept-Datetime' in request.headers:
+        return parse_date(
+            request.headers['Accept-Datetime']
+        ).replace(tzinfo=tzutc())
+    return datetime.utcnow().replace(tzinfo=tzutc())
 
 
 def memento_response(
@@ -350,21 +802,42 @@ def memento_response(
         ('Vary', 'accept-datetime'),
         ('Content-Length', '0'),
         ('Content-Type', 'text/plain; charset=UTF-8'),
-        ('Connection', 'close'),
         ('Location', uri_m),
         ('Link', str(LinkHeader(links))),
     ]
     return Response(None, headers=headers, status=302)
 
 
-def timemap_link_response(app, mementos, uri_r):
+def timemap_url(uri_r, response_type, start=None, until=None):
+    """Return the URL of a TimeMap, or of one of its pages.
+
+    :param uri_r: The URI-R of the original resource.
+    :param response_type: ``link`` or ``json``.
+    :param start: (Optional) The datetime of the first memento.
+    :param until: (Optional) The latest datetime of the mementos, along
+        with *start*.
+    """
+    values = dict(response_type=response_type, uri_r=uri_r)
+    if start is not None:
+        values['start'] = start
+        if until is not None:
+            values['until'] = until
+    return url_for('timemap', values, force_external=True)
+
+
+def timemap_link_response(app, mementos, uri_r, page=None):
     """Return a 200 TimeMap response.
 
-    :param mementos: A sorted (ascending by date) list of (uri_str,
-    datetime_obj) tuples representing a TimeMap.
+    The body is streamed from the TimeMap, its length being computed from
+    the size of the URIs.
+
+    :param mementos: A sorted ``TimeMap``.
     :param uri_r: The URI-R of the original resource.
+    :param page: (Optional) The ``Page`` of the TimeMap to send.
     :return: The ``Response`` object.
     """
+    page = page or Page(mementos)
+    mementos = page.mementos
     assert len(mementos) >= 1
 
     # Adds Original, TimeGate and TimeMap links
@@ -374,102 +847,173 @@ def timemap_link_response(app, mementos, uri_r):
         rel='timegate',
     )
     link_self = Link(
-        url_for('timemap', dict(
-            response_type='link', uri_r=uri_r
-        ), force_external=True),
+        timemap_url(uri_r, 'link', page.start, page.until),
         rel='self', type='application/link-format',
     )
+    if not page.complete:
+        link_self.attr_pairs.extend([['from', http_date(mementos.first[1])],
+                                     ['until', http_date(mementos.last[1])]])
     json_self = Link(
-        url_for('timemap', dict(
-            response_type='json', uri_r=uri_r
-        ), force_external=True),
+        timemap_url(uri_r, 'json', page.start, page.until),
         rel='timemap', type='application/json',
     )
+    links = [original_link, timegate_link, link_self, json_self]
+    # Neighbouring pages
+    for rel, start in (('prev', page.prev), ('next', page.next)):
+        if start is not None:
+            links.append(Link(
+                timemap_url(uri_r, 'link', start, page.until),
+                [['rel', rel], ['type', 'application/link-format'],
+                 ['from', http_date(start)]]))
+    head = ',\n'.join(str(l) for l in links)
 
     # Sets up first and last relations
-    if len(mementos) == 1:
-        mementos_links = [Link(mementos[0][0], rel='first last memento',
-                               datetime=http_date(mementos[0][1]))]
-    else:
-        # Browse through Mementos to generate the TimeMap links list
-        mementos_links = [
-            Link(mementos[0][0], rel='first memento',
-                 datetime=http_date(mementos[0][1]))
-        ] + [
-            Link(uri, rel='memento', datetime=http_date(date))
-            for (uri, date) in mementos[1:-1]
-        ] + [
-            Link(mementos[-1][0], rel='last memento',
-                 datetime=http_date(mementos[-1][1]))
-        ]
-
-    # Aggregates all link strings and constructs the TimeMap body
-    links = [original_link, timegate_link, link_self, json_self]
-    links.extend(mementos_links)
-    body = ',\n'.join([str(l) for l in links]) + '\n'
+    count = len(mementos)
+    rels = {}
+    if page.has_first:
+        rels[0] = '"first memento"'
+    if page.has_last:
+        rels[count - 1] = ('"first last memento"' if count - 1 in rels
+                           else '"last memento"')
+
+    # Browse through Mementos to generate the TimeMap links list
+    def lines():
+        for index, (uri, date) in enumerate(zip(mementos.iter_uris(),
+                                                mementos.http_dates())):
+            yield MEMENTO_LINK % (uri, rels.get(index, 'memento'), date)
+
+    length = (len(head.encode('utf-8')) + len('\n') + mementos.uris_nbytes +
+              count * len(MEMENTO_LINK % ('', 'memento', HTTP_DATE)) +
+              sum(len(rel) - len('memento') for rel in rels.values()))
 
     # Builds HTTP Response and WSGI return
     headers = [
         ('Date', http_date(datetime.utcnow())),
-        ('Content-Length', str(len(body))),
+        ('Content-Length', str(length)),
         ('Content-Type', 'application/link-format'),
-        ('Connection', 'close'),
     ]
-    return Response(body, headers=headers)
+    return Response(stream_body(head, lines(), '\n'), headers=headers,
+                    direct_passthrough=True)
 
 
-def timemap_json_response(app, mementos, uri_r):
+def timemap_json_response(app, mementos, uri_r, page=None):
     """Creates and sends a timemap response.
 
-    :param mementos: A sorted list of (uri_str, datetime_obj) tuples
-    representing a timemap.
+    The body is streamed from the TimeMap. Its length is sent when no URI
+    needs escaping, the response being chunked otherwise.
+
+    :param mementos: A sorted ``TimeMap``.
     :param uri_r: The URI-R of the original resource.
-    :param start_response: WSGI callback function.
+    :param page: (Optional) The ``Page`` of the TimeMap to send.
     :return: The ``Response`` object.
     """
+    page = page or Page(mementos)
+    mementos = page.mementos
     assert len(mementos) >= 1
-
-    # Prepares the JSON response by building a dict
-    response_dict = {}
-
-    response_dict['original_uri'] = uri_r
-    response_dict['timegate_uri'] = url_for(
-        'timegate', dict(uri_r=uri_r), force_external=True
+    first = mementos.first
+    last = mementos.last
+
+    # The JSON object, up to the list of mementos
+    head = (
+        '{"original_uri": %s, "timegate_uri": %s, '
+        '"mementos": {"last": %s, "first": %s, "list": ['
+    ) % (
+        json.dumps(uri_r),
+        json.dumps(url_for(
+            'timegate', dict(uri_r=uri_r), force_external=True
+        )),
+        json.dumps({'uri': last[0], 'datetime': http_date(last[1])}),
+        json.dumps({'uri': first[0], 'datetime': http_date(first[1])}),
     )
 
+    # Builds self (TimeMap)links dict
+    tail = ']}, "timemap_uri": %s' % json.dumps({
+        'json_format': timemap_url(uri_r, 'json', page.start, page.until),
+        'link_format': timemap_url(uri_r, 'link', page.start, page.until),
+    })
+    # Neighbouring pages
+    pages = {}
+    for rel, start in (('prev', page.prev), ('next', page.next)):
+        if start is not None:
+            pages[rel] = timemap_url(uri_r, 'json', start, page.until)
+    if pages:
+        tail += ', "pages": %s' % json.dumps(pages)
+    tail += '}'
+
     # Browse through Mementos to generate TimeMap links dict list
-    mementos_links = [
-        {'uri': urlstr, 'datetime': http_date(date)}
-        for (urlstr, date) in mementos
+    def items():
+        separator = ''
+        for uri, date in zip(mementos.iter_uris(), mementos.http_dates()):
+            yield MEMENTO_JSON % (separator, json.dumps(uri), date)
+            separator = ', '
+
+    # Builds HTTP Response and WSGI return
+    headers = [
+        ('Date', http_date(datetime.utcnow())),
+        ('Content-Type', 'application/json'),
     ]
+    if mementos.plain_uris:
+        count = len(mementos)
+        headers.append(('Content-Length', str(
+            len(head.encode('utf-8')) + len(tail.encode('utf-8')) +
+            mementos.uris_nbytes + count * len(
+                MEMENTO_JSON % (', ', '""', HTTP_DATE)) - len(', '))))
+    return Response(stream_body(head, items(), tail), headers=headers,
+                    direct_passthrough=True)
 
-    # Builds up first and last links dict
-    firstlink = {'uri': mementos[0][0], 'datetime': http_date(mementos[0][1])}
-    lastlink = {'uri': mementos[-1][0], 'datetime': http_date(mementos[-1][1])}
 
-    response_dict['mementos'] = {
-        'last': lastlink,
-        'first': firstlink,
-        'list': mementos_links,
-    }
+def timemap_body_name(request, response_type, page_size=0):
+    """Return the name of a rendered TimeMap in the cache.
 
-    # Builds self (TimeMap)links dict
-    response_dict['timemap_uri'] = {
-        'json_format': url_for('timemap', dict(
-            response_type='json', uri_r=uri_r
-        ), force_external=True),
-        'link_format': url_for('timemap', dict(
-            response_type='link', uri_r=uri_r
-        ), force_external=True),
-    }
-
-    # Creates the JSON str from the dict
-    response_json = json.dumps(response_dict)
+    Bodies differ by format, by the base URI of their links and by the
+    size of their page.
 
-    # Builds HTTP Response and WSGI return
+    :param request: The ``Request`` object.
+    :param response_type: ``link`` or ``json``.
+    :param page_size: (Optional) The number of mementos per page.
+    """
+    name = '%s %s' % (response_type, request.url_root)
+    if page_size:
+        name += ' %d' % page_size
+    return name
+
+
+def timemap_body_response(body, response_type):
+    """Return a TimeMap response with an already rendered body.
+
+    :param body: The bytes of the TimeMap.
+    :param response_type: ``link`` or ``json``.
+    :return: The ``Response`` object.
+    """
     headers = [
         ('Date', http_date(datetime.utcnow())),
-        ('Content-Length', str(len(response_json))),
-        ('Content-Type', 'application/json'),
+        ('Content-Length', str(len(body))),
+        ('Content-Type', TIMEMAP_CONTENT_TYPES[response_type]),
     ]
-    return Response(response_json, headers=headers)
+    return Response([body], headers=headers, direct_passthrough=True)
+
+
+def timestamp_etag(timestamp):
+    """Return the ETag of the responses built from a cached TimeMap.
+
+    :param timestamp: The datetime at which the TimeMap was retrieved.
+    """
+    return '%x' % int(round(to_timestamp(timestamp) * 1000))
+
+
+def stream_body(head, items, tail, size=STREAM_CHUNK_SIZE):
+    """Yield a response body in UTF-8 chunks.
+
+    :param head: The string starting the body.
+    :param items: Iterable of the strings following it.
+    :param tail: The string ending the body.
+    :param size: (Optional) Number of items per chunk.
+    """
+    chunk = [head]
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+    chunk.append(tail)
+    yield ''.join(chunk).encode('utf-8')
@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""ASGI application and asynchronous handlers.
+
+This module requires Python 3.5 or later. Run the TimeGate with any ASGI
+server, e.g. ``uvicorn timegate.asgi:application``.
+"""
+
+from __future__ import absolute_import, print_function
+
+import asyncio
+import logging
+import sys
+from concurrent import futures
+from datetime import datetime
+from functools import partial
+from io import BytesIO
+
+from dateutil.tz import tzutc
+from werkzeug.exceptions import HTTPException, abort
+from werkzeug.utils import cached_property
+from werkzeug.wrappers import Request
+
+from .application import (close_connection, get_app, local, only_if_cached,
+                          parse_accept_datetime, raise_cached_error,
+                          uses_cache)
+from .errors import HandlerError
+from .handler import Handler, _parse_response, handler_of
+
+
+class AsyncHandler(Handler):
+    """Base class of the handlers implemented with coroutines.
+
+    Their ``get_all_mementos``, ``get_mementos_since`` and ``get_memento``
+    methods are ``async def`` coroutines with the same parameters and
+    return values as the ones of :class:`timegate.handler.Handler`. They
+    are served by the ASGI application only. They request APIs with the
+    :meth:`request` and :meth:`fetch_many` coroutines, which require the
+    ``httpx`` package.
+    """
+
+    @cached_property
+    def client(self):
+        """Asynchronous HTTP client keeping the connections alive."""
+        try:
+            import httpx
+        except ImportError:
+            raise HandlerError('Asynchronous handlers require the "httpx" '
+                               'package.', 503)
+        headers = dict(self.headers)
+        if self.user_agent:
+            headers['User-Agent'] = self.user_agent
+        return httpx.AsyncClient(
+            headers=headers,
+            timeout=self.timeout,
+            # The number of requests in flight is not bounded.
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=(self.pool_connections *
+                                           self.pool_maxsize),
+            ),
+            # Only failed connections are retried.
+            transport=httpx.AsyncHTTPTransport(retries=self.max_retries),
+        )
+
+    async def request(self, resource, timeout=None, **kwargs):
+        """Request a resource over HTTP.
+
+        See :meth:`timegate.handler.Handler.request`. The response is an
+        ``httpx.Response``: test ``response.is_success`` rather than the
+        response itself.
+        """
+        uri = resource
+        if timeout is None:
+            timeout = self.timeout
+        logging.info('Sending request for %s params=%s', uri,
+                     kwargs.get('params'),
+                     extra={'uri': uri, 'params': kwargs.get('params')})
+
+        try:
+            req = await self.client.get(uri, timeout=timeout, **kwargs)
+        except Exception as e:
+            logging.error('Cannot request server (%s): %s', uri, e)
+            raise HandlerError('Cannot request version server.', 502)
+
+        if not req.is_success:
+            logging.info('Response other than 2XX: %s', req,
+                         extra={'uri': uri, 'status': req.status_code})
+        return req
+
+    async def fetch_many(self, uris, parse=None, deadline=None, **kwargs):
+        """Request several resources concurrently.
+
+        See :meth:`timegate.handler.Handler.fetch_many`. All the requests
+        are in flight at once.
+        """
+        if deadline is None:
+            deadline = self.fetch_deadline
+        fetches = [(uri, asyncio.ensure_future(
+            self._fetch_async(uri, parse, kwargs))) for uri in uris]
+        if fetches:
+            await asyncio.wait([task for (_, task) in fetches],
+                               timeout=deadline)
+
+        results = []
+        for uri, task in fetches:
+            if not task.done():
+                task.cancel()
+                logging.warning('Request for %s given up after %ss',
+                                uri, deadline)
+            elif task.exception() is not None:
+                logging.warning('Request for %s failed: %s',
+                                uri, task.exception())
+            else:
+                results.append((uri, task.result()))
+        return results
+
+    async def _fetch_async(self, uri, parse, kwargs):
+        response = await self.request(uri, **kwargs)
+        return parse(response) if parse else response
+
+    async def aclose(self):
+        """Close the connections of the HTTP client."""
+        client = self.__dict__.pop('client', None)
+        if client is not None:
+            await client.aclose()
+
+
+def is_async(handler):
+    """Return whether a handler implements its methods with coroutines."""
+    return isinstance(handler, AsyncHandler) or any(
+        asyncio.iscoroutinefunction(getattr(handler, name, None))
+        for name in ('get_all_mementos', 'get_memento'))
+
+
+async def parsed_request_async(handler_function, *args, **kwargs):
+    """Await and parse the response of an asynchronous handler.
+
+    See :func:`timegate.handler.parsed_request`.
+
+    :param allow_empty: (Optional) When true, an empty response is an
+        empty ``TimeMap`` instead of a 404 error.
+    :param run: (Optional) Coroutine function running a blocking function
+        with its arguments, e.g. in a thread pool. The response, up to
+        ``TM_MAX_SIZE`` mementos, is validated and parsed with it rather
+        than on the event loop.
+    """
+    allow_empty = kwargs.pop('allow_empty', False)
+    run = kwargs.pop('run', None)
+    try:
+        handler_response = await handler_function(*args, **kwargs)
+    except HandlerError as he:
+        logging.info('Handler raised HandlerError %s', he)
+        raise he  # HandlerErrors have return data.
+    except Exception as e:
+        logging.error('Handler raised exception %s', e)
+        raise HandlerError('Error in Handler', 503)
+
+    parse_args = (handler_response, handler_of(handler_function))
+    if run is None:
+        mementos = _parse_response(*parse_args)
+    else:
+        mementos = await run(_parse_response, *parse_args)
+    if not mementos and not allow_empty:
+        raise HandlerError('Not Found: Handler response Empty.', 404)
+    return mementos
+
+
+def build_environ(scope, body=b''):
+    """Build the WSGI environment of an ASGI HTTP request.
+
+    :param scope: The ASGI connection scope.
+    :param body: (Optional) The request body.
+    :return: The environment dictionary.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode(
+            'utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        if name in environ:
+            value = environ[name] + ',' + value
+        environ[name] = value
+    return environ
+
+
+class ASGITimeGate(object):
+    """ASGI application serving a :class:`timegate.application.TimeGate`.
+
+    Requests to asynchronous handlers (see :class:`AsyncHandler`) are
+    served on the event loop, so that a process holds as many upstream
+    requests in flight as needed. Requests to other handlers run on a pool
+    of ``sync_handler_threads`` threads, as in a WSGI server.
+    """
+
+    def __init__(self, app=None):
+        """Constructor method.
+
+        :param app: (Optional) The ``TimeGate`` to serve. Defaults to the
+            application of the process, see
+            :func:`timegate.application.get_app`.
+        """
+        self._app = app
+        self._inflight = {}
+
+    @property
+    def app(self):
+        """The served ``TimeGate``."""
+        return self._app or get_app()
+
+    @cached_property
+    def executor(self):
+        """Threads running the synchronous parts of the requests."""
+        return futures.ThreadPoolExecutor(
+            self.app.config['SYNC_HANDLER_THREADS'])
+
+    async def __call__(self, scope, receive, send):
+        """Handle an ASGI connection."""
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope "%s".' % scope['type'])
+
+        body = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            body.append(message.get('body', b''))
+            more_body = message.get('more_body', False)
+        environ = build_environ(scope, b''.join(body))
+
+        if is_async(self.app.handler):
+            response = await self.dispatch_request(Request(environ))
+        else:
+            response = await self._run(self._dispatch_sync, environ)
+        await self.send_response(send, response, environ)
+
+    async def lifespan(self, receive, send):
+        """Build the application on startup and release it on shutdown."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.app.handler
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def aclose(self):
+        """Release the HTTP client and the threads."""
+        handler = self.app.handler
+        if isinstance(handler, AsyncHandler):
+            await handler.aclose()
+        executor = self.__dict__.pop('executor', None)
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _run(self, function, *args):
+        """Run a blocking function in the thread pool."""
+        return asyncio.get_event_loop().run_in_executor(
+            self.executor, partial(function, *args))
+
+    def _dispatch_sync(self, environ):
+        """Serve a request with a synchronous handler."""
+        local.request = request = Request(environ)
+        try:
+            return self.app.dispatch_request(request)
+        finally:
+            local.__release_local__()
+
+    def _render(self, request, function, *args):
+        """Build a response needing the request for its URLs.
+
+        The request is bound to the current thread. On the thread of the
+        event loop, no other coroutine runs until the response is built.
+        """
+        local.request = request
+        try:
+            return function(*args)
+        finally:
+            local.__release_local__()
+
+    async def send_response(self, send, response, environ):
+        """Send a werkzeug ``Response`` (or ``HTTPException``)."""
+        if not self.app.config['KEEP_ALIVE']:
+            response = close_connection(response, environ)
+        elif isinstance(response, HTTPException):
+            response = response.get_response(environ)
+        app_iter, status, headers = response.get_wsgi_response(environ)
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(None, 1)[0]),
+            'headers': [(name.lower().encode('latin-1'),
+                         value.encode('latin-1'))
+                        for (name, value) in headers],
+        })
+        try:
+            for chunk in app_iter:
+                if chunk:
+                    await send({'type': 'http.response.body',
+                                'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def dispatch_request(self, request):
+        """Choose the endpoint coroutine of a request."""
+        request.adapter = adapter = self.app.url_map.bind_to_environ(
+            request.environ
+        )
+        try:
+            endpoint, values = adapter.match()
+            return await getattr(self, endpoint)(request, **values)
+        except HTTPException as e:
+            return e
+
+    async def timegate(self, request, uri_r):
+        """Asynchronous :meth:`timegate.application.TimeGate.timegate`."""
+        app = self.app
+        accept_datetime = parse_accept_datetime(request)
+
+        mementos = memento = timestamp = None
+        if app.use_timemaps:
+            timestamp, mementos = await self.get_timemap_entry(
+                request, uri_r, app.timemap_until(accept_datetime))
+        if not mementos:
+            if only_if_cached(request):
+                abort(504)
+            memento = await parsed_request_async(
+                app.handler.get_memento, uri_r, accept_datetime,
+                run=self._run)
+
+        return self._render(request, app.timegate_response, uri_r,
+                            accept_datetime, mementos, memento, timestamp)
+
+    async def timemap(self, request, uri_r, response_type='link',
+                      start=None, until=None):
+        """Asynchronous :meth:`timegate.application.TimeGate.timemap`."""
+        app = self.app
+        if not app.config['USE_TIMEMAPS']:
+            abort(403)
+
+        entry = await self.get_timemap_entry(request, uri_r)
+        # Rendered bodies are read from and written to the cache.
+        return await self._run(self._render, request,
+                               app.timemap_entry_response, uri_r,
+                               response_type, entry, start, until)
+
+    async def get_all_mementos(self, request, uri_r, until=None):
+        """Return the TimeMap of a resource, from cache if possible.
+
+        See :meth:`timegate.application.TimeGate.get_all_mementos`.
+        Concurrent retrievals of a TimeMap are coalesced in the process.
+        """
+        return (await self.get_timemap_entry(request, uri_r, until))[1]
+
+    async def get_timemap_entry(self, request, uri_r, until=None):
+        """Return the TimeMap of a resource and its timestamp.
+
+        See :meth:`timegate.application.TimeGate.get_timemap_entry`.
+        """
+        app = self.app
+        use_cache = uses_cache(request)
+        if app.cache and use_cache:
+            if until is None:
+                until = datetime.utcnow().replace(tzinfo=tzutc())
+            # Background refreshes run on the loop from the refresher.
+            refresh = partial(self._refresh, uri_r, asyncio.get_event_loop())
+            entry = await self._run(app.cache.get_entry_until, uri_r, until,
+                                    refresh, request.cache_control.max_age)
+            if entry is not None:
+                return entry
+            await self._run(raise_cached_error, app.cache, uri_r)
+        if only_if_cached(request):
+            abort(504)
+        return await self._retrieve_once(uri_r, use_cache)
+
+    def _retrieve_once(self, uri_r, incremental=True):
+        """Retrieve a TimeMap, sharing the retrieval already in flight."""
+        task = self._inflight.get(uri_r)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._retrieve_all_mementos(uri_r, incremental))
+            self._inflight[uri_r] = task
+            task.add_done_callback(
+                lambda _: self._inflight.pop(uri_r, None))
+        return asyncio.shield(task)
+
+    def _refresh(self, uri_r, loop):
+        """Refresh a TimeMap from a thread, on the loop of the requests."""
+        return asyncio.run_coroutine_threadsafe(
+            self._refresh_async(uri_r), loop).result()
+
+    async def _refresh_async(self, uri_r):
+        return await self._retrieve_once(uri_r)
+
+    async def _retrieve_all_mementos(self, uri_r, incremental=True):
+        """Retrieve a TimeMap from the handler and cache it.
+
+        See :meth:`timegate.application.TimeGate._retrieve_all_mementos`.
+
+        :return: The ``(timestamp, timemap)`` tuple.
+        """
+        app = self.app
+        handler = app.handler
+        cached = None
+        if (incremental and app.cache and
+                hasattr(handler, 'get_mementos_since')):
+            cached = await self._run(app.cache.peek_updatable, uri_r)
+        try:
+            if cached:
+                since = cached.last[1]
+                logging.info('Retrieving mementos of %s since %s',
+                             uri_r, since)
+                mementos = await self._run(
+                    cached.merge, await parsed_request_async(
+                        handler.get_mementos_since, uri_r, since,
+                        allow_empty=True, run=self._run))
+            else:
+                mementos = await parsed_request_async(
+                    handler.get_all_mementos, uri_r, run=self._run)
+        except HandlerError as he:
+            if app.cache:
+                await self._run(app.cache.set_error, uri_r, he.code,
+                                he.description)
+            raise he
+        if app.cache:
+            return await self._run(app.cache.set, uri_r, mementos,
+                                   not cached)
+        return (datetime.utcnow().replace(tzinfo=tzutc()), mementos)
+
+
+application = ASGITimeGate()
+"""ASGI application object serving the application of the process."""
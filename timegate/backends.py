@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Storage backends of the TimeGate cache."""
+
+from __future__ import absolute_import, print_function
+
+import logging
+import os
+import pickle
+import sqlite3
+import struct
+import tempfile
+import threading
+from time import time
+
+from werkzeug.contrib.cache import FileSystemCache
+from werkzeug.posixemulation import rename
+
+from . import timemap as timegate_timemap
+from .errors import CacheError
+from .timemap import TimeMap, from_timestamp, to_timestamp
+
+ENTRY_MAGIC = b'TGCE'
+"""First bytes of a binary cache entry."""
+
+_ENTRY_HEADER = struct.Struct('<4sd')
+
+
+def dumps_entry(timestamp, timemap, compress=False):
+    """Serialize a ``(timestamp, timemap)`` cache value.
+
+    :param timestamp: The datetime at which the TimeMap was retrieved.
+    :param timemap: The ``TimeMap``.
+    :param compress: (Optional) Prefix compress the URIs.
+    :return: The bytes.
+    """
+    return _ENTRY_HEADER.pack(ENTRY_MAGIC, to_timestamp(timestamp)) + \
+        timegate_timemap.dumps(timemap, compress=compress)
+
+
+def loads_entry(data):
+    """Deserialize a cache value written by :func:`dumps_entry`.
+
+    :param data: A bytes-like object.
+    :return: The ``(timestamp, timemap)`` tuple.
+    :raises ValueError: If the data is not a binary cache entry.
+    """
+    data = memoryview(data)
+    magic, timestamp = _ENTRY_HEADER.unpack_from(data)
+    if magic != ENTRY_MAGIC:
+        raise ValueError('Not a binary cache entry.')
+    return (from_timestamp(timestamp),
+            timegate_timemap.loads(data[_ENTRY_HEADER.size:]))
+
+
+def dumps_value(value, compress=False):
+    """Serialize any cache value.
+
+    ``(timestamp, TimeMap)`` values use :func:`dumps_entry`, other values
+    are pickled.
+    """
+    if (isinstance(value, tuple) and len(value) == 2 and
+            isinstance(value[1], TimeMap)):
+        return dumps_entry(value[0], value[1], compress)
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def loads_value(data):
+    """Deserialize a value written by :func:`dumps_value`."""
+    if data[:len(ENTRY_MAGIC)] == ENTRY_MAGIC:
+        return loads_entry(data)
+    return pickle.loads(data)
+
+
+class CacheBackend(object):
+    """Interface of the storage backends of :class:`timegate.cache.Cache`.
+
+    Keys are URI-R strings. Timeouts are in seconds, ``None`` meaning the
+    backend default and ``0`` no expiration.
+    """
+
+    def get(self, key):
+        """Return the value of a key, None if it is missing or expired."""
+        raise NotImplementedError()
+
+    def get_many(self, *keys):
+        """Return the values of several keys, in the same order."""
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        """Store a value. Return whether it was stored."""
+        raise NotImplementedError()
+
+    def delete(self, key):
+        """Remove a key. Return whether it existed."""
+        raise NotImplementedError()
+
+    def touch(self, key, timeout=None):
+        """Reset the expiration of a key. Return whether it exists."""
+        value = self.get(key)
+        return value is not None and self.set(key, value, timeout)
+
+
+class FileSystemBackend(FileSystemCache, CacheBackend):
+    """One file per value in a directory.
+
+    Files keep the pickled expiration time written by ``FileSystemCache``
+    so that pruning works unchanged, but ``(timestamp, TimeMap)`` values
+    are stored with :func:`dumps_entry` instead of being pickled. The
+    pickled entries of former versions are still read.
+    """
+
+    def __init__(self, cache_dir, compress=False, **kwargs):
+        self.compress = compress
+        super(FileSystemBackend, self).__init__(cache_dir, **kwargs)
+
+    def get(self, key):
+        filename = self._get_filename(key)
+        try:
+            with open(filename, 'rb') as f:
+                expires = pickle.load(f)
+                if expires != 0 and expires < time():
+                    os.remove(filename)
+                    return None
+                return loads_value(f.read())
+        except (IOError, OSError, ValueError, pickle.PickleError):
+            return None
+
+    def set(self, key, value, timeout=None, mgmt_element=False):
+        # Management elements have no timeout and do not trigger pruning.
+        if mgmt_element:
+            timeout = 0
+        else:
+            self._prune()
+
+        timeout = self._normalize_timeout(timeout)
+        filename = self._get_filename(key)
+        try:
+            fd, tmp = tempfile.mkstemp(
+                suffix=self._fs_transaction_suffix, dir=self._path)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(timeout, f, 1)
+                f.write(dumps_value(value, self.compress))
+            rename(tmp, filename)
+            os.chmod(filename, self._mode)
+        except (IOError, OSError):
+            return False
+        if not mgmt_element:
+            self._update_count(delta=1)
+        return True
+
+
+class SQLiteBackend(CacheBackend):
+    """All values in one SQLite database file, in WAL mode.
+
+    Several processes on a node can share the file. Values are indexed by
+    URI-R and the oldest ones are deleted past ``threshold`` values.
+    """
+
+    def __init__(self, filename, threshold=500, default_timeout=300,
+                 compress=False, table='timegate_cache'):
+        """Constructor method.
+
+        :param filename: The path of the database file.
+        :param threshold: (Optional) The maximum number of values stored.
+        :param default_timeout: (Optional) The default timeout in seconds.
+        :param compress: (Optional) Prefix compress the URIs of TimeMaps.
+        :param table: (Optional) The table of the values. Backends with
+        different tables share the file but not their ``threshold``.
+        """
+        self.filename = filename
+        self.table = table
+        self.threshold = threshold
+        self.default_timeout = default_timeout
+        self.compress = compress
+        # sqlite3 connections cannot be shared between threads.
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(filename))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with self._connection as db:
+            db.execute(self._sql('CREATE TABLE IF NOT EXISTS {table} ('
+                                 'key TEXT PRIMARY KEY, '
+                                 'expires REAL NOT NULL, '
+                                 'value BLOB NOT NULL)'))
+            db.execute(self._sql('CREATE INDEX IF NOT EXISTS '
+                                 '{table}_expires ON {table} (expires)'))
+
+    def _sql(self, statement):
+        """Return a SQL statement on the table of the backend."""
+        return statement.format(table=self.table)
+
+    @property
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.filename, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def _expires(self, timeout):
+        if timeout is None:
+            timeout = self.default_timeout
+        return time() + timeout if timeout else 0
+
+    def get(self, key):
+        return self.get_many(key)[0]
+
+    def get_many(self, *keys):
+        if not keys:
+            return []
+        rows = self._connection.execute(
+            self._sql('SELECT key, value FROM {table} WHERE key IN (%s) '
+                      'AND (expires = 0 OR expires >= ?)') %
+            ','.join('?' * len(keys)),
+            keys + (time(),)
+        ).fetchall()
+        values = {}
+        for key, value in rows:
+            try:
+                values[key] = loads_value(bytes(value))
+            except (ValueError, pickle.PickleError) as e:
+                logging.error('Cannot load cached value of %s: %s' % (key, e))
+        return [values.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        data = sqlite3.Binary(dumps_value(value, self.compress))
+        with self._connection as db:
+            db.execute(self._sql('INSERT OR REPLACE INTO {table} '
+                                 '(key, expires, value) VALUES (?, ?, ?)'),
+                       (key, self._expires(timeout), data))
+            self._prune(db)
+        return True
+
+    def delete(self, key):
+        with self._connection as db:
+            return db.execute(self._sql('DELETE FROM {table} WHERE key = ?'),
+                              (key,)).rowcount > 0
+
+    def touch(self, key, timeout=None):
+        with self._connection as db:
+            return db.execute(
+                self._sql('UPDATE {table} SET expires = ? WHERE key = ?'),
+                (self._expires(timeout), key)).rowcount > 0
+
+    def _prune(self, db):
+        db.execute(self._sql('DELETE FROM {table} '
+                             'WHERE expires != 0 AND expires < ?'), (time(),))
+        if self.threshold:
+            # Values never expiring (0) are deleted first, then the ones
+            # expiring soonest, which are the oldest.
+            db.execute(self._sql(
+                'DELETE FROM {table} WHERE key IN ('
+                'SELECT key FROM {table} ORDER BY expires '
+                'LIMIT max((SELECT count(*) FROM {table}) - ?, 0))'),
+                (self.threshold,))
+
+
+class RedisBackend(CacheBackend):
+    """Values stored in a Redis server shared by all nodes.
+
+    It requires the ``redis`` package. Redis expires values itself;
+    bound its memory with its ``maxmemory`` settings.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', default_timeout=300,
+                 key_prefix='timegate:', compress=False, client=None):
+        """Constructor method.
+
+        :param url: (Optional) The URL of the Redis server.
+        :param default_timeout: (Optional) The default timeout in seconds.
+        :param key_prefix: (Optional) Prefix of the keys in Redis.
+        :param compress: (Optional) Prefix compress the URIs of TimeMaps.
+        :param client: (Optional) Redis client to use instead of
+        connecting to ``url``.
+        """
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise CacheError('The redis cache backend requires the '
+                                 '"redis" package.')
+            client = redis.StrictRedis.from_url(url)
+        self.client = client
+        self.default_timeout = default_timeout
+        self.key_prefix = key_prefix
+        self.compress = compress
+
+    def _key(self, key):
+        return self.key_prefix + key
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            return self.default_timeout
+        return timeout
+
+    def _loads(self, data):
+        if data is None:
+            return None
+        try:
+            return loads_value(data)
+        except (ValueError, pickle.PickleError) as e:
+            logging.error('Cannot load cached value: %s' % e)
+            return None
+
+    def get(self, key):
+        return self._loads(self.client.get(self._key(key)))
+
+    def get_many(self, *keys):
+        if not keys:
+            return []
+        return [self._loads(data) for data in
+                self.client.mget([self._key(key) for key in keys])]
+
+    def set(self, key, value, timeout=None):
+        timeout = self._timeout(timeout)
+        data = dumps_value(value, self.compress)
+        return bool(self.client.set(self._key(key), data,
+                                    ex=int(timeout) if timeout else None))
+
+    def delete(self, key):
+        return self.client.delete(self._key(key)) > 0
+
+    def touch(self, key, timeout=None):
+        timeout = self._timeout(timeout)
+        if timeout:
+            return bool(self.client.expire(self._key(key), int(timeout)))
+        return bool(self.client.persist(self._key(key))) or \
+            bool(self.client.exists(self._key(key)))
@@ -14,21 +14,208 @@ from __future__ import absolute_import, print_function
 
 import logging
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from time import time
 
 from dateutil.relativedelta import relativedelta
 from dateutil.tz import tzutc
-from werkzeug.contrib.cache import FileSystemCache, md5
 
 from . import utils as timegate_utils
+from .backends import FileSystemBackend
 from .errors import CacheError
+from .timemap import TimeMap, to_timestamp
+
+
+def _sizeof(val):
+    """Return the estimated size of a cached TimeMap, None for other values.
+
+    The URIs of a TimeMap read from the backend are decoded lazily, so its
+    size grows after it is kept in memory.
+    """
+    if isinstance(val, tuple) and len(val) == 2 and \
+            isinstance(val[1], TimeMap):
+        return val[1].nbytes
+    return None
+
+
+class LRUCache(object):
+    """In-memory cache dropping the least recently used values.
+
+    It is bounded by a number of values and by their estimated size.
+    """
+
+    def __init__(self, max_values, max_bytes=0, default_timeout=0,
+                 sizeof=None):
+        """Constructor method.
+
+        :param max_values: The maximum number of values stored.
+        :param max_bytes: (Optional) The maximum estimated size of the
+        stored values, in bytes. When 0, there is no size limit.
+        :param default_timeout: (Optional) How long, in seconds, the values
+        are stored. When 0, they never expire.
+        :param sizeof: (Optional) Callable returning the current estimated
+        size of a value, or None to keep the size it was stored with.
+        Values are measured again when they are read, as they can grow
+        after being stored.
+        """
+        self.max_values = max_values
+        self.max_bytes = max_bytes
+        self.default_timeout = default_timeout
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key):
+        """Return the value of a key, None if it is missing or expired."""
+        with self._lock:
+            item = self._values.pop(key, None)
+            if item is None:
+                return None
+            expires, size, value = item
+            if expires and expires < time():
+                self.nbytes -= size
+                return None
+            if self.sizeof is not None:
+                new_size = self.sizeof(value)
+                if new_size is not None and new_size != size:
+                    self.nbytes += new_size - size
+                    item = (expires, new_size, value)
+            # Re-inserting marks the value as the most recently used.
+            self._values[key] = item
+            self._evict(keep=key)
+            return value
+
+    def set(self, key, value, size=0, timeout=None):
+        """Store a value.
+
+        :param key: The key.
+        :param value: The value.
+        :param size: (Optional) The estimated size of the value in bytes.
+        Values bigger than ``max_bytes`` are not stored.
+        :param timeout: (Optional) Overrides ``default_timeout``.
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        expires = time() + timeout if timeout else 0
+        with self._lock:
+            self._delete(key)
+            if self.max_bytes and size > self.max_bytes:
+                return
+            self._values[key] = (expires, size, value)
+            self.nbytes += size
+            self._evict()
+
+    def _evict(self, keep=None):
+        """Drop the least recently used values beyond the bounds.
+
+        :param keep: (Optional) A key not to drop, e.g. the one just read.
+        """
+        while (len(self._values) > self.max_values or
+               (self.max_bytes and self.nbytes > self.max_bytes)):
+            key = next(iter(self._values))
+            if key == keep:
+                break
+            self._delete(key)
+
+    def delete(self, key):
+        """Remove a key."""
+        with self._lock:
+            self._delete(key)
+
+    def _delete(self, key):
+        item = self._values.pop(key, None)
+        if item is not None:
+            self.nbytes -= item[1]
+
+
+class Refresher(object):
+    """Pool of background workers refreshing stale cache values.
+
+    A key is refreshed by at most one worker at a time. Refreshes are
+    dropped rather than queued when ``max_pending`` keys are already
+    waiting or being refreshed.
+    """
+
+    def __init__(self, max_workers, max_pending=100):
+        """Constructor method.
+
+        :param max_workers: The number of concurrent refreshes.
+        :param max_pending: (Optional) The maximum number of refreshes
+        queued or running.
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.stats = dict(refreshes=0, refreshes_failed=0,
+                          refreshes_dropped=0)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, key, function):
+        """Queue the refresh of a key.
+
+        :param key: The key to refresh.
+        :param function: Callable refreshing the key.
+        :return: Whether the refresh is queued or already pending.
+        """
+        with self._lock:
+            if key in self._pending:
+                return True
+            if len(self._pending) >= self.max_pending:
+                self.stats['refreshes_dropped'] += 1
+                logging.warning('Refresh of %s dropped: %d pending' % (
+                    key, len(self._pending)))
+                return False
+            # Created on first use so that no thread is started before
+            # the server forks its workers.
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers)
+            self._pending.add(key)
+            # Submitted under the lock, so that a concurrent shutdown does
+            # not release the executor in between.
+            self._executor.submit(self._refresh, key, function)
+        return True
+
+    def _refresh(self, key, function):
+        try:
+            function()
+            self.stats['refreshes'] += 1
+        except Exception as e:
+            self.stats['refreshes_failed'] += 1
+            logging.error('Error refreshing %s: %s' % (key, e))
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def shutdown(self, wait=True):
+        """Stop the workers once the pending refreshes are done."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        # Outside of the lock, which the refreshes take when they finish.
+        if executor is not None:
+            executor.shutdown(wait)
+
+
+DERIVED_VALUES_PER_TIMEMAP = 3
+"""Derived values (rendered bodies and errors) stored per TimeMap slot."""
 
 
 class Cache(object):
     """Base class for TimeGate caches."""
 
     def __init__(self, path, tolerance, expiration, max_values,
-                 run_tests=True, max_file_size=0):
+                 run_tests=True, max_file_size=0, compress=False,
+                 memory_max_values=0, memory_max_bytes=0, backend=None,
+                 stale=0, refresh_workers=2, negative_ttl=0,
+                 negative_max_ttl=3600, negative_5xx=False,
+                 derived_backend=None, incremental_max_age=0):
         """Constructor method.
 
         :param path: The path of the cache database file.
@@ -43,29 +230,93 @@ class Cache(object):
         TimeMap cache value. When max_file_size=0, there is no limit to
         a cache value. When max_file_size=X > 0, the cache will not
         store TimeMap that require more than X Bytes on disk.
+        :param compress: (Optional) When true, the URIs of the stored
+        TimeMaps are prefix compressed.
+        :param memory_max_values: (Optional) The maximum number of TimeMaps
+        also kept in memory, in front of the files. When 0, there is no
+        in-memory tier.
+        :param memory_max_bytes: (Optional) The maximum estimated size (in
+        Bytes) of the TimeMaps kept in memory. When 0, there is no limit.
+        :param backend: (Optional) The ``CacheBackend`` storing the values.
+        Defaults to a ``FileSystemBackend`` in *path*.
+        :param stale: (Optional) How long, in seconds, past the tolerance a
+        TimeMap is still returned while it is refreshed in the background.
+        When 0, outdated TimeMaps are cache misses.
+        :param refresh_workers: (Optional) The number of concurrent
+        background refreshes.
+        :param negative_ttl: (Optional) How long, in seconds, a URI-R the
+        handler did not find (404) is answered from cache. When 0, handler
+        errors are not cached.
+        :param negative_max_ttl: (Optional) The longest time, in seconds,
+        an upstream error is answered from cache: it is ``negative_ttl``
+        for the first error, then doubles with each consecutive one.
+        :param negative_5xx: (Optional) When true, upstream errors (5xx)
+        are cached as well.
+        :param derived_backend: (Optional) The ``CacheBackend`` storing the
+        values derived from the TimeMaps: their rendered bodies and the
+        handler errors, apart from the TimeMaps so that they do not evict
+        them. Defaults to a ``FileSystemBackend`` in the *path* directory
+        suffixed with ``.derived``, or to *backend* when it is given.
+        :param incremental_max_age: (Optional) How long, in seconds, a
+        TimeMap is updated with the mementos since its last one before it
+        is retrieved whole again, see :meth:`peek_updatable`. When 0, it is
+        never retrieved whole again.
         """
         # Parameters Check
         if tolerance <= 0 or expiration <= 0 or max_values <= 0:
             raise CacheError('Cannot create cache: all parameters must be > 0')
 
         self.tolerance = relativedelta(seconds=tolerance)
+        self.stale = relativedelta(seconds=max(stale, 0))
         self.path = path.rstrip('/')
         self.max_file_size = max(max_file_size, 0)
-        self.CHECK_SIZE = self.max_file_size > 0
         self.max_values = max_values
-        self.backend = FileSystemCache(path,
-                                       threshold=self.max_values,
-                                       default_timeout=expiration)
+        self.expiration = expiration
+        self.backend = backend or FileSystemBackend(
+            path,
+            threshold=self.max_values,
+            default_timeout=expiration,
+            compress=compress,
+        )
+        if derived_backend is None:
+            derived_backend = backend or FileSystemBackend(
+                self.path + '.derived',
+                threshold=self.max_values * DERIVED_VALUES_PER_TIMEMAP,
+                default_timeout=expiration,
+            )
+        self.derived_backend = derived_backend
+        # Value sizes can only be checked on files.
+        self.CHECK_SIZE = (self.max_file_size > 0 and
+                           isinstance(self.backend, FileSystemBackend))
+        self.memory = self.derived_memory = None
+        if memory_max_values > 0:
+            self.memory = LRUCache(memory_max_values,
+                                   max_bytes=max(memory_max_bytes, 0),
+                                   default_timeout=expiration,
+                                   sizeof=_sizeof)
+            self.derived_memory = LRUCache(
+                memory_max_values * DERIVED_VALUES_PER_TIMEMAP,
+                max_bytes=max(memory_max_bytes, 0),
+                default_timeout=expiration)
+        self.stats = dict(memory_hits=0, memory_misses=0,
+                          backend_hits=0, backend_misses=0, stale_hits=0)
+        self.negative_ttl = max(negative_ttl, 0)
+        self.negative_max_ttl = max(negative_max_ttl, self.negative_ttl)
+        self.negative_5xx = negative_5xx
+        self.incremental_max_age = max(incremental_max_age, 0)
+        self.refresher = None
+        if stale > 0 and refresh_workers > 0:
+            self.refresher = Refresher(refresh_workers)
 
         # Testing cache
         if run_tests:
             try:
-                key = b'1'
+                key = '1'
                 val = 1
                 self.backend.set(key, val)
                 assert (not self.CHECK_SIZE) or self._check_size(key) > 0
                 assert self.backend.get(key) == val
-                os.remove(os.path.join(self.path, md5(key).hexdigest()))
+                self.backend.delete(key)
             except Exception as e:
                 raise CacheError('Error testing cache: %s' % e)
 
@@ -74,7 +325,7 @@ class Cache(object):
             'max_file_size = %d' % (
                 self.max_values, expiration, self.max_file_size))
 
-    def get_until(self, uri_r, date):
+    def get_until(self, uri_r, date, refresh=None, max_age=None):
         """Returns the TimeMap (memento,datetime)-list for the requested
         Memento. The TimeMap is guaranteed to span at least until the 'date'
         parameter, within the tolerance.
@@ -83,63 +334,330 @@ class Cache(object):
         :param date: The target date. It is the accept-datetime for TimeGate
         requests, and the current date. The cache will return all
         Mementos prior to this date (within cache.tolerance parameter)
-        :return: [(memento_uri_string, datetime_obj),...] list if it is
-        in cache and if it is within the cache tolerance for *date*,
-        None otherwise.
+        :param refresh: (Optional) Callable retrieving and caching a fresh
+        TimeMap. When given, an outdated TimeMap within the stale window is
+        returned and refreshed in the background.
+        :param max_age: (Optional) The maximum age in seconds of the TimeMap,
+        e.g. the ``max-age`` requested by the client. An older TimeMap is
+        neither returned nor refreshed.
+        :return: The ``TimeMap`` if it is in cache and if it is within the
+        cache tolerance for *date*, None otherwise.
         """
-        # Query the backend for stored cache values to that memento
-        key = uri_r
-        try:
-            val = self.backend.get(key)
-        except Exception as e:
-            logging.error('Exception loading cache content: %s' % e)
-            return None
+        val = self.get_entry_until(uri_r, date, refresh, max_age)
+        return val[1] if val else None
+
+    def get_entry_until(self, uri_r, date, refresh=None, max_age=None):
+        """Return the cached TimeMap of a URI-R with its timestamp.
+
+        See :meth:`get_until`.
 
+        :return: The ``(timestamp, timemap)`` tuple, the timestamp being
+        when the TimeMap was retrieved, or None.
+        """
+        val = self._get(uri_r,
+                        lambda val: self._is_fresh(val, date, max_age))
         if val:
             # There is a value in the cache
-            timestamp, timemap = val
-            logging.info('Cached value exists for %s' % uri_r)
-            if date > timestamp + self.tolerance:
-                logging.info('Cache MISS: value outdated for %s' % uri_r)
-                timemap = None
+            timestamp = val[0]
+            logging.info('Cached value exists for %s', uri_r)
+            if max_age is not None and time() - to_timestamp(timestamp) > \
+                    max_age:
+                logging.info('Cache MISS: value older than %ds for %s',
+                             max_age, uri_r)
+                val = None
+            elif date <= timestamp + self.tolerance:
+                logging.info('Cache HIT: found value for %s', uri_r)
+            elif (refresh is not None and self.refresher is not None and
+                    date <= timestamp + self.tolerance + self.stale):
+                logging.info('Cache STALE HIT: refreshing value for %s',
+                             uri_r)
+                self.stats['stale_hits'] += 1
+                self.refresher.submit(uri_r, refresh)
             else:
-                logging.info('Cache HIT: found value for %s' % uri_r)
+                logging.info('Cache MISS: value outdated for %s', uri_r)
+                val = None
         else:
             # Cache MISS: No value
-            logging.info('Cache MISS: No cached value for %s' % uri_r)
-            timemap = None
+            logging.info('Cache MISS: No cached value for %s', uri_r)
+
+        return val or None
+
+    def peek(self, uri_r):
+        """Return the cached TimeMap of a URI-R, however outdated.
 
-        return timemap
+        :param uri_r: The URI-R of the resource.
+        :return: The ``TimeMap``, None if it is not cached.
+        """
+        val = self._get(uri_r)
+        return val[1] if val else None
+
+    def _is_fresh(self, val, date, max_age=None):
+        """Whether a cached value is a hit for *date*, within *max_age*."""
+        timestamp = val[0]
+        if max_age is not None and time() - to_timestamp(timestamp) > \
+                max_age:
+            return False
+        return date <= timestamp + self.tolerance
+
+    def _get(self, uri_r, fresh=None):
+        """Return the cached ``(timestamp, timemap)`` value of a URI-R.
+
+        The in-memory tier is looked up first. Values found in the backend
+        are then kept in memory.
 
-    def get_all(self, uri_r):
+        :param uri_r: The URI-R of the resource.
+        :param fresh: (Optional) Predicate of the values that are fresh
+        enough. A value in memory that is not is looked up in the backend
+        too, where another process may have cached a fresher one.
+        :return: The value, None if it is not cached.
+        """
+        key = uri_r
+        remembered = None
+        if self.memory is not None:
+            remembered = self.memory.get(key)
+            if remembered is not None:
+                self.stats['memory_hits'] += 1
+                if fresh is None or fresh(remembered):
+                    return remembered
+            else:
+                self.stats['memory_misses'] += 1
+
+        # Query the backend for stored cache values to that memento
+        try:
+            val = self.backend.get(key)
+        except Exception as e:
+            logging.error('Exception loading cache content: %s' % e)
+            return remembered
+
+        if not val or (remembered is not None and
+                       val[0] <= remembered[0]):
+            self.stats['backend_misses'] += 1
+            return remembered
+        self.stats['backend_hits'] += 1
+        timestamp, timemap = val
+        # Values cached as lists of tuples by former versions.
+        val = (timestamp, TimeMap.from_mementos(timemap))
+        self._remember(key, val)
+        return val
+
+    def _remember(self, key, val, size=None):
+        """Keep a value in the in-memory tier, if there is one.
+
+        It expires from memory when it would expire from the backend.
+        """
+        if self.memory is None:
+            return
+        timeout = self.expiration - (time() - to_timestamp(val[0]))
+        if timeout > 0:
+            if size is None:
+                size = val[1].nbytes
+            self.memory.set(key, val, size=size, timeout=timeout)
+
+    def get_all(self, uri_r, refresh=None):
         """Request the whole TimeMap for that uri.
 
         :param uri_r: the URI-R of the resource.
-        :return: [(memento_uri_string, datetime_obj),...] list if it is in
-        cache and if it is within the cache tolerance, None otherwise.
+        :param refresh: (Optional) See :meth:`get_until`.
+        :return: The ``TimeMap`` if it is in cache and if it is within the
+        cache tolerance, None otherwise.
         """
         until = datetime.utcnow().replace(tzinfo=tzutc())
-        return self.get_until(uri_r, until)
+        return self.get_until(uri_r, until, refresh)
 
-    def set(self, uri_r, timemap):
+    def set(self, uri_r, timemap, complete=True):
         """Set the cached TimeMap for that URI-R.
 
         It appends it with a timestamp of when it is stored.
 
         :param uri_r: The URI-R of the original resource.
         :param timemap: The value to cache.
-        :return: The backend setter method return value.
+        :param complete: (Optional) Whether the TimeMap was retrieved
+        whole, rather than updated with the mementos since the last one.
+        :return: The cached ``(timestamp, timemap)`` tuple.
         """
-        logging.info('Updating cache for %s' % uri_r)
+        logging.info('Updating cache for %s', uri_r)
         timestamp = datetime.utcnow().replace(tzinfo=tzutc())
-        val = (timestamp, timemap)
+        # Milliseconds are stored exactly, so that the timestamp identifies
+        # the value (see get_body).
+        timestamp = timestamp.replace(
+            microsecond=timestamp.microsecond // 1000 * 1000)
+        val = (timestamp, TimeMap.from_mementos(timemap))
         key = uri_r
+        self._remember(key, val)
         try:
             self.backend.set(key, val)
             if self.CHECK_SIZE:
                 self._check_size(uri_r)
         except Exception as e:
             logging.error('Error setting cache value: %s' % e)
+        self.delete_error(uri_r)
+        if complete and self.incremental_max_age:
+            self._set_derived(self._complete_key(uri_r), time(), 0,
+                              timeout=self.incremental_max_age)
+        return val
+
+    def peek_updatable(self, uri_r):
+        """Return the cached TimeMap of a URI-R to update incrementally.
+
+        Updating it with the mementos since its last one misses the changes
+        to the past ones, e.g. deleted mementos, so it is retrieved whole
+        again once its last complete retrieval is older than
+        ``incremental_max_age``.
+
+        :param uri_r: The URI-R of the resource.
+        :return: The ``TimeMap``, however outdated, None if it is not cached
+        or must be retrieved whole.
+        """
+        if self.incremental_max_age:
+            retrieved = self._get_derived(self._complete_key(uri_r),
+                                          lambda val: 0,
+                                          timeout=self.incremental_max_age)
+            if retrieved is None or \
+                    time() - retrieved > self.incremental_max_age:
+                logging.info('Retrieving the whole TimeMap of %s', uri_r)
+                return None
+        return self.peek(uri_r)
+
+    def get_error(self, uri_r):
+        """Return the cached handler error of a URI-R.
+
+        :param uri_r: The URI-R of the original resource.
+        :return: The ``(status, message)`` tuple of the last error of the
+        handler for that URI-R if it is still cached, None otherwise.
+        """
+        if not self.negative_ttl:
+            return None
+        val = self._get_error(uri_r)
+        if val is None or val[0] < time():
+            return None
+        logging.info('Cache HIT: error %d cached for %s', val[1], uri_r)
+        return val[1], val[2]
+
+    def set_error(self, uri_r, status, message):
+        """Cache a handler error for a URI-R.
+
+        Only 404 errors are cached, and 5xx ones if ``negative_5xx`` is
+        true. Consecutive 5xx errors are cached twice as long each time,
+        up to ``negative_max_ttl``.
+
+        :param uri_r: The URI-R of the original resource.
+        :param status: The HTTP status of the error.
+        :param message: The message of the error.
+        """
+        if not self.negative_ttl or not (
+                status == 404 or (self.negative_5xx and status >= 500)):
+            return
+        failures = 1
+        if status >= 500:
+            previous = self._get_error(uri_r)
+            if previous is not None and previous[1] >= 500:
+                failures = previous[3] + 1
+        ttl = min(self.negative_ttl * 2 ** (failures - 1),
+                  self.negative_max_ttl)
+        logging.info('Caching error %d for %s for %ds', status, uri_r, ttl)
+        val = (time() + ttl, status, message, failures)
+        # Errors are kept past their TTL so that consecutive ones back off.
+        self._set_derived(self._error_key(uri_r), val, len(message),
+                          timeout=self.negative_max_ttl)
+
+    def delete_error(self, uri_r):
+        """Forget the cached handler error of a URI-R, if any."""
+        if not self.negative_ttl:
+            return
+        key = self._error_key(uri_r)
+        if self.derived_memory is not None:
+            self.derived_memory.delete(key)
+        try:
+            self.derived_backend.delete(key)
+        except Exception as e:
+            logging.error('Error deleting cache value: %s' % e)
+
+    def _get_error(self, uri_r):
+        """Return the ``(expires, status, message, failures)`` of a URI-R."""
+        return self._get_derived(self._error_key(uri_r),
+                                 lambda val: len(val[2]),
+                                 timeout=self.negative_max_ttl)
+
+    def get_body(self, uri_r, name, timestamp):
+        """Return a response body rendered from a cached TimeMap.
+
+        :param uri_r: The URI-R of the original resource.
+        :param name: The name of the rendering, e.g. the format and the
+        base URI of the response.
+        :param timestamp: The timestamp of the cached TimeMap.
+        :return: The bytes rendered from that TimeMap, None if there are
+        none, e.g. because the TimeMap changed since.
+        """
+        val = self._get_derived(self._body_key(uri_r, name),
+                                lambda val: len(val[1]))
+        if val is None or val[0] != timestamp:
+            return None
+        return val[1]
+
+    def set_body(self, uri_r, name, timestamp, body):
+        """Cache a response body rendered from a cached TimeMap.
+
+        Bodies bigger than ``max_file_size`` are not cached.
+
+        :param uri_r: The URI-R of the original resource.
+        :param name: The name of the rendering, see :meth:`get_body`.
+        :param timestamp: The timestamp of the cached TimeMap.
+        :param body: The rendered bytes.
+        """
+        if self.max_file_size and len(body) > self.max_file_size:
+            return
+        self._set_derived(self._body_key(uri_r, name), (timestamp, body),
+                          len(body))
+
+    def _get_derived(self, key, sizeof, timeout=None):
+        """Return a value derived from a TimeMap, e.g. a rendered body.
+
+        Values found in the derived backend are then kept in memory.
+
+        :param key: The key of the value.
+        :param sizeof: Callable returning the size of the value in memory.
+        :param timeout: (Optional) How long the value is kept in memory.
+        :return: The value, None if it is not cached.
+        """
+        memory = self.derived_memory
+        val = memory.get(key) if memory is not None else None
+        if val is None:
+            try:
+                val = self.derived_backend.get(key)
+            except Exception as e:
+                logging.error('Exception loading cache content: %s' % e)
+                return None
+            if val is not None and memory is not None:
+                memory.set(key, val, size=sizeof(val), timeout=timeout)
+        return val
+
+    def _set_derived(self, key, val, size, timeout=None):
+        """Store a value derived from a TimeMap, in memory too.
+
+        :param key: The key of the value.
+        :param val: The value.
+        :param size: The size of the value in memory.
+        :param timeout: (Optional) How long the value is stored.
+        """
+        if self.derived_memory is not None:
+            self.derived_memory.set(key, val, size=size, timeout=timeout)
+        try:
+            self.derived_backend.set(key, val, timeout=timeout)
+        except Exception as e:
+            logging.error('Error setting cache value: %s' % e)
+
+    @staticmethod
+    def _body_key(uri_r, name):
+        # URIs have no spaces: the keys cannot be URI-Rs.
+        return '%s %s' % (name, uri_r)
+
+    @staticmethod
+    def _error_key(uri_r):
+        return 'error %s' % uri_r
+
+    @staticmethod
+    def _complete_key(uri_r):
+        return 'complete %s' % uri_r
 
     def _check_size(self, key, delete=True):
         """Check the size that a specific TimeMap value is using on disk.
@@ -152,15 +670,16 @@ class Cache(object):
         :return: The size of the value on disk (0 if it was deleted).
         """
         try:
-            fname = md5(key).hexdigest()  # werkzeug key
-            fpath = self.path + '/' + fname
+            fpath = self.backend._get_filename(key)
             size = os.path.getsize(fpath)
             if size > self.max_file_size and delete:
                 message = ('Cache value too big (%dB, max %dB) '
                            'for the TimeMap of %s')
                 if delete:
                     message += '. Deleting cached value.'
-                    os.remove(fpath)
+                    self.backend.delete(key)
+                    if self.memory is not None:
+                        self.memory.delete(key)
                     size = 0
                 logging.warning(message % (size, self.max_file_size, key))
             return size
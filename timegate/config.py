@@ -42,6 +42,18 @@ class Config(dict):
         dict.__init__(self, defaults or {})
         self.root_path = root_path
 
+    @classmethod
+    def fresh(cls, root_path, defaults=None):
+        """Build a config apart from the shared instance.
+
+        :param root_path: Path to which files are read relative from.
+        :param defaults: An optional dictionary of default values.
+        :return: The new ``Config`` object.
+        """
+        config = dict.__new__(cls)
+        config.__init__(root_path, defaults)
+        return config
+
     def from_inifile(self, filename, silent=True):
         """Update the values in the config from an INI file."""
         conf = ConfigParser()
@@ -54,6 +66,33 @@ class Config(dict):
         self['STRICT_TIME'] = conf.getboolean('server', 'strict_datetime')
         if conf.has_option('server', 'api_time_out'):
             self['API_TIME_OUT'] = conf.getfloat('server', 'api_time_out')
+        # HTTP sessions of the handler
+        if conf.has_option('server', 'http_pool_connections'):
+            self['HTTP_POOL_CONNECTIONS'] = conf.getint(
+                'server', 'http_pool_connections')
+        if conf.has_option('server', 'http_pool_maxsize'):
+            self['HTTP_POOL_MAXSIZE'] = conf.getint(
+                'server', 'http_pool_maxsize')
+        if conf.has_option('server', 'http_max_retries'):
+            self['HTTP_MAX_RETRIES'] = conf.getint(
+                'server', 'http_max_retries')
+        if conf.has_option('server', 'http_backoff_factor'):
+            self['HTTP_BACKOFF_FACTOR'] = conf.getfloat(
+                'server', 'http_backoff_factor')
+        # Concurrent requests of the handler
+        if conf.has_option('server', 'fetch_max_workers'):
+            self['FETCH_MAX_WORKERS'] = conf.getint(
+                'server', 'fetch_max_workers')
+        if conf.has_option('server', 'fetch_deadline'):
+            self['FETCH_DEADLINE'] = conf.getfloat(
+                'server', 'fetch_deadline')
+        # ASGI application
+        if conf.has_option('server', 'sync_handler_threads'):
+            self['SYNC_HANDLER_THREADS'] = conf.getint(
+                'server', 'sync_handler_threads')
+        # Client connections
+        if conf.has_option('server', 'keep_alive'):
+            self['KEEP_ALIVE'] = conf.getboolean('server', 'keep_alive')
 
         # Handler configuration
         if conf.has_option('handler', 'handler_class'):
@@ -65,10 +104,16 @@ class Config(dict):
         else:
             self['RESOURCE_TYPE'] = 'snapshot'
 
+        if conf.has_option('handler', 'append_only'):
+            self['APPEND_ONLY'] = conf.getboolean('handler', 'append_only')
+
         if conf.has_option('handler', 'use_timemap'):
             self['USE_TIMEMAPS'] = conf.getboolean('handler', 'use_timemap')
         else:
             self['USE_TIMEMAPS'] = False
+        if conf.has_option('handler', 'timemap_page_size'):
+            self['TIMEMAP_PAGE_SIZE'] = conf.getint(
+                'handler', 'timemap_page_size')
 
         # Cache
         # When False, all cache requests will be cache MISS
@@ -83,6 +128,47 @@ class Config(dict):
         self['CACHE_MAX_VALUES'] = conf.getint('cache', 'cache_max_values')
         # Cache files paths
         self['CACHE_FILE'] = self['CACHE_DIRECTORY']  # + '/cache_data'
+        # Prefix compress the URIs of the cached TimeMaps
+        if conf.has_option('cache', 'cache_prefix_compression'):
+            self['CACHE_COMPRESS'] = conf.getboolean(
+                'cache', 'cache_prefix_compression')
+        # Storage backend
+        if conf.has_option('cache', 'backend'):
+            self['CACHE_BACKEND'] = conf.get('cache', 'backend').lower()
+        if conf.has_option('cache', 'sqlite_file'):
+            self['CACHE_SQLITE_FILE'] = conf.get('cache', 'sqlite_file')
+        if conf.has_option('cache', 'redis_url'):
+            self['CACHE_REDIS_URL'] = conf.get('cache', 'redis_url')
+        # Coalescing of concurrent retrievals of the same TimeMap
+        if conf.has_option('cache', 'cache_lock_timeout'):
+            self['CACHE_LOCK_TIMEOUT'] = conf.getint(
+                'cache', 'cache_lock_timeout')
+        # Serving outdated TimeMaps while they are refreshed
+        if conf.has_option('cache', 'cache_stale_time'):
+            self['CACHE_STALE'] = conf.getint('cache', 'cache_stale_time')
+        if conf.has_option('cache', 'cache_refresh_workers'):
+            self['CACHE_REFRESH_WORKERS'] = conf.getint(
+                'cache', 'cache_refresh_workers')
+        if conf.has_option('cache', 'cache_incremental_max_time'):
+            self['CACHE_INCREMENTAL_MAX_AGE'] = conf.getint(
+                'cache', 'cache_incremental_max_time')
+        # Handler errors
+        if conf.has_option('cache', 'cache_negative_time'):
+            self['CACHE_NEGATIVE_TTL'] = conf.getint(
+                'cache', 'cache_negative_time')
+        if conf.has_option('cache', 'cache_negative_5xx'):
+            self['CACHE_NEGATIVE_5XX'] = conf.getboolean(
+                'cache', 'cache_negative_5xx')
+        if conf.has_option('cache', 'cache_negative_max_time'):
+            self['CACHE_NEGATIVE_MAX_TTL'] = conf.getint(
+                'cache', 'cache_negative_max_time')
+        # In-memory tier in front of the cache files
+        if conf.has_option('cache', 'cache_memory_max_values'):
+            self['CACHE_MEMORY_MAX_VALUES'] = conf.getint(
+                'cache', 'cache_memory_max_values')
+        if conf.has_option('cache', 'cache_memory_max_size'):
+            self['CACHE_MEMORY_MAX_SIZE'] = conf.getint(
+                'cache', 'cache_memory_max_size')
 
     def from_object(self, obj):
         """Update config with values from given object.
@@ -35,12 +35,30 @@ TM_MAX_SIZE = 100000
 HOST = None
 STRICT_TIME = True
 API_TIME_OUT = 6
+# Connections kept alive per host by the handlers HTTP sessions
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 10
+# Retries of failed API requests, waiting backoff * 2 ** retry seconds
+HTTP_MAX_RETRIES = 2
+HTTP_BACKOFF_FACTOR = 0.5
+# Concurrent requests of Handler.fetch_many and its deadline in seconds
+FETCH_MAX_WORKERS = 8
+FETCH_DEADLINE = 30
+# Threads of the ASGI application running the requests of synchronous handlers
+SYNC_HANDLER_THREADS = 16
+# Let clients keep their connection for other requests (else Connection: close)
+KEEP_ALIVE = True
 
 # Handler configuration
 HANDLER_MODULE = 'simple'
 BASE_URI = ''
 RESOURCE_TYPE = 'vcs'
 USE_TIMEMAPS = True
+# Number of mementos per TimeMap page (0: TimeMaps are not paged)
+TIMEMAP_PAGE_SIZE = 0
+# Whether mementos are never added before the end of a history, so that cached
+# TimeMaps answer requests for past dates (None: only for 'vcs' resources)
+APPEND_ONLY = None
 
 # Cache
 # When False, all cache requests will be cache MISS
@@ -55,3 +73,32 @@ CACHE_MAX_VALUES = 250
 CACHE_FILE = CACHE_DIRECTORY  # + '/cache_data'
 # Cache expiration (space bound) in seconds
 CACHE_EXP = 259200  # Three days
+# Prefix compress the URIs of the cached TimeMaps
+CACHE_COMPRESS = False
+# Maximum number of TimeMaps also kept in memory by each process (0: none)
+CACHE_MEMORY_MAX_VALUES = 50
+# Maximum size in bytes of the TimeMaps kept in memory (0: no limit)
+CACHE_MEMORY_MAX_SIZE = 16777216  # 16 MiB
+# Cache storage backend: filesystem, sqlite or redis
+CACHE_BACKEND = 'filesystem'
+# SQLite backend database file (defaults to a file in CACHE_DIRECTORY)
+CACHE_SQLITE_FILE = None
+# Redis backend server
+CACHE_REDIS_URL = 'redis://localhost:6379/0'
+# Maximum time in seconds a retrieval waits for the same one in progress
+CACHE_LOCK_TIMEOUT = 120
+# Time in seconds past CACHE_TOLERANCE during which an outdated TimeMap is
+# still served while it is refreshed in the background (0 to disable)
+CACHE_STALE = 86400
+# Number of concurrent background refreshes per process
+CACHE_REFRESH_WORKERS = 2
+# Time in seconds after which a TimeMap refreshed with the mementos since
+# its last one is retrieved whole again (0 for never)
+CACHE_INCREMENTAL_MAX_AGE = 604800
+# Time in seconds during which a URI-R not found by the handler (404) is
+# answered from cache (0 to disable)
+CACHE_NEGATIVE_TTL = 60
+# Also cache upstream errors (5xx), doubling their time in cache with each
+# consecutive error, up to CACHE_NEGATIVE_MAX_TTL seconds
+CACHE_NEGATIVE_5XX = False
+CACHE_NEGATIVE_MAX_TTL = 3600
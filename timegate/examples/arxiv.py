@@ -14,12 +14,11 @@ from __future__ import absolute_import, print_function
 
 import logging
 import re
-from StringIO import StringIO
-
-from lxml import etree
 
 from timegate.errors import HandlerError
-from timegate.handler import Handler
+from timegate.handler import Handler, iterparse
+
+ARXIV_RAW = '{http://arxiv.org/OAI/arXivRaw/}'
 
 
 class ArxivHandler(Handler):
@@ -53,22 +52,16 @@ class ArxivHandler(Handler):
             }
 
             # Queries the API and extract the values
-            response = self.request(self.api_base, params=params)
+            response = self.request(self.api_base, params=params, stream=True)
             if not response:
+                # Returns the unread connection to the pool.
+                response.close()
                 raise HandlerError("API response not 2XX", 404)
-            root = etree.parse(StringIO(response.content),
-                               etree.XMLParser(recover=True))
-            versions = root.findall(
-                './/{http://arxiv.org/OAI/arXivRaw/}version')
-
-            # Processes the return
-            def mapper(version):
-                v = version.xpath('@*')[0]
-                date = version.find(
-                    './{http://arxiv.org/OAI/arXivRaw/}date').text
-                return (normalized_uri + v, date)
 
-            return map(mapper, versions)
+            # Processes the versions as they stream in
+            return [(normalized_uri + version.xpath('@*')[0],
+                     version.findtext(ARXIV_RAW + 'date'))
+                    for version in iterparse(response, ARXIV_RAW + 'version')]
 
         except HandlerError as he:
             raise he
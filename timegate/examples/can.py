@@ -12,18 +12,15 @@
 
 from __future__ import absolute_import, print_function
 
-import logging
 import re
-import StringIO
 
-from lxml import etree
-
-from timegate.errors import HandlerError
 from timegate.handler import Handler
 
 
 class CanHandler(Handler):
 
+    date_format = 'wayback'
+
     def __init__(self):
         Handler.__init__(self)
         self.baseuri = "http://www.collectionscanada.gc.ca/webarchives/*/"
@@ -32,31 +29,16 @@ class CanHandler(Handler):
 
     def get_all_mementos(self, req_url):
         iauri = self.baseuri + req_url
-        dom = self.get_xml(iauri, html=True)
-
-        alist = dom.xpath('//div[@class="inner-content"]//a')
-        if not alist:
-            return []
 
         changes = []
-        for a in alist:
-            if not 'name' in a.attrib:
+        # The page is parsed as it streams in.
+        for a in self.iter_elements(iauri, 'a', html=True):
+            if 'name' not in a.attrib and any(
+                    div.get('class') == 'inner-content'
+                    for div in a.iterancestors('div')):
                 uri = a.attrib['href']
                 match = self.dtre.match(uri)
                 if bool(match):
                     dtstr = match.groups()[0]
                     changes.append((uri, dtstr))
         return changes
-
-    def get_xml(self, uri, html=False):
-        page = self.request(uri)
-        try:
-            page_data = page.content
-            if not html:
-                parser = etree.XMLParser(recover=True)
-            else:
-                parser = etree.HTMLParser(recover=True)
-            return etree.parse(StringIO.StringIO(page_data), parser)
-        except Exception as e:
-            logging.error("Cannot parse XML/HTML from %s" % uri)
-            raise HandlerError("Couldn't parse data from %s" % uri, 404)
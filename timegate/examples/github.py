@@ -11,9 +11,8 @@
 from __future__ import absolute_import, print_function
 
 import re
-import time
 
-import requests
+from dateutil.tz import tzutc
 
 from timegate.errors import HandlerError
 from timegate.handler import Handler
@@ -28,6 +27,8 @@ ACCEPTABLE_RESOURCE = (
 
 class GitHubHandler(Handler):
 
+    date_format = 'iso8601'
+
     def __init__(self):
         Handler.__init__(self)
         # Mandatory fields
@@ -45,11 +46,22 @@ class GitHubHandler(Handler):
                               ([^/]+)  # repo
                               (/.*)?  # optional path
                               """, re.X)  # verbosed: ignore whitespaces and \n
-        self.header_rex = re.compile(
-            '<(.+?)>; rel="next"')  # The regex for the query continuation header
         self.file_rex = re.compile('(/blob)?/master')  # The regex for files
 
     def get_all_mementos(self, uri):
+        return self._get_mementos(uri)
+
+    def get_mementos_since(self, uri, since):
+        """Returns the mementos of the commits at or after a datetime.
+
+        :param uri: The URI-R of the resource.
+        :param since: The datetime from which commits are listed.
+        :return: The list of (URI-M, datetime) pairs, empty if there is no
+        new commit.
+        """
+        return self._get_mementos(uri, since=since)
+
+    def _get_mementos(self, uri, since=None):
         MAX_TIME = 120  # seconds
 
         if uri.startswith('http://'):
@@ -130,7 +142,7 @@ class GitHubHandler(Handler):
             path = path[branch_index:]
             # must be done because API does not make any difference between
             # path or files
-            is_online = bool(requests.head(uri))
+            is_online = bool(self.session.head(uri))
             if path == '' or path.endswith('/') or not is_online:
                 raise HandlerError(
                     "'%s' not found: Raw resource must be a file." % path, 404)
@@ -154,19 +166,13 @@ class GitHubHandler(Handler):
             'path': str(path),
             'sha': str(branch)
         }
+        if since is not None:
+            # Only the commits at or after this date (ISO 8601, UTC)
+            params['since'] = since.astimezone(tzutc()).strftime(
+                '%Y-%m-%dT%H:%M:%SZ')
         aut_pair = ('MementoTimegate', 'LANLTimeGate14')
-        cont = apibase  # The first continue is the beginning
 
-        # Does sequential queries to get all commits of the particular resource
-        queries_results = []
-        tmax = int(time.time()) + MAX_TIME
-        while cont is not None:
-            if int(time.time()) > tmax:
-                raise HandlerError(
-                    "Resource too big to be served. GitHub Handler TimeOut (timeout: %d seconds)" %
-                    MAX_TIME, 502)
-            req = self.request(cont, params=params, auth=aut_pair)
-            cont = None
+        def parse(req):
             if not req:
                 # status code different than 2XX
                 raise HandlerError(
@@ -179,21 +185,19 @@ class GitHubHandler(Handler):
             if 'errors' in result:
                 # API-specific error
                 raise HandlerError(result['errors'])
-            if len(result) > 0:
-                # The request was successful
-                queries_results += result
-                # Search for possible continue
-                if 'link' in req.headers:
-                    link_header = req.headers['link']
-                    headermatch = self.header_rex.search(link_header)
-                    if bool(headermatch):
-                        # The response was truncated, the rest can be obtained using
-                        # the given "next" link
-                        cont = headermatch.groups()[0]
+            return result
+
+        # Queries all the pages of commits of the particular resource, the
+        # ones after the first concurrently
+        queries_results = self.fetch_pages(
+            apibase, parse, deadline=MAX_TIME, params=params, auth=aut_pair)
 
         if queries_results:
             # Processes results based on resource type
             return map(mapper, queries_results)
+        elif since is not None:
+            # No new commit
+            return []
         else:
             # No results found
             raise HandlerError(
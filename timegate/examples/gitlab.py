@@ -11,9 +11,6 @@
 from __future__ import absolute_import, print_function
 
 import re
-import time
-
-import requests
 
 from timegate.errors import HandlerError
 from timegate.handler import Handler
@@ -30,6 +27,8 @@ ACCEPTABLE_RESOURCE = (
 
 class GitLabHandler(Handler):
 
+    date_format = 'iso8601'
+
     def __init__(self):
         Handler.__init__(self)
         # Mandatory fields
@@ -49,8 +48,6 @@ class GitLabHandler(Handler):
                               ([^/]+)  # repo
                               (/.*)?  # optional path
                               """, re.X)  # verbosed: ignore whitespaces and \n
-        self.header_rex = re.compile(
-            '<(.+?)>; rel="next"')  # The regex for the query continuation header
         self.file_rex = re.compile('(/blob)?/master')  # The regex for files
 
     def get_all_mementos(self, uri):
@@ -112,7 +109,7 @@ class GitLabHandler(Handler):
                 branch_index = path.find('/')
                 branch = path[:branch_index]
                 path = path[branch_index:]
-                is_online = bool(requests.head(
+                is_online = bool(self.session.head(
                     uri, params={'private_token': self.apikey}))
                 if path == '' or path.endswith('/') or not is_online:
                     raise HandlerError(
@@ -176,18 +173,8 @@ class GitLabHandler(Handler):
             'private_token': self.apikey
         }
         aut_pair = ('MementoTimegate', 'LANLTimeGate14')
-        cont = apibase  # The first continue is the beginning
 
-        # Does sequential queries to get all commits of the particular resource
-        queries_results = []
-        tmax = int(time.time()) + MAX_TIME
-        while cont is not None:
-            if int(time.time()) > tmax:
-                raise HandlerError(
-                    "Resource too big to be served. GitLab Handler TimeOut (timeout: %d seconds)" %
-                    MAX_TIME, 502)
-            req = self.request(cont, params=params, auth=aut_pair)
-            cont = None
+        def parse(req):
             if not req:
                 # status code different than 2XX
                 raise HandlerError(
@@ -200,17 +187,12 @@ class GitLabHandler(Handler):
             if 'errors' in result:
                 # API-specific error
                 raise HandlerError(result['errors'])
-            if len(result) > 0:
-                # The request was successful
-                queries_results += result
-                # Search for possible continue
-                if 'link' in req.headers:
-                    link_header = req.headers['link']
-                    headermatch = self.header_rex.search(link_header)
-                    if bool(headermatch):
-                        # The response was truncated, the rest can be obtained using
-                        # the given "next" link
-                        cont = headermatch.groups()[0]
+            return result
+
+        # Queries all the pages of commits of the particular resource, the
+        # ones after the first concurrently
+        queries_results = self.fetch_pages(
+            apibase, parse, deadline=MAX_TIME, params=params, auth=aut_pair)
 
         if queries_results:
             # Processes results based on resource type
@@ -10,17 +10,15 @@
 
 from __future__ import absolute_import, print_function
 
-import logging
 import re
-import StringIO
 
-from lxml import etree
-
-from timegate.handler import Handler
+from timegate.handler import Handler, iterparse
 
 
 class LocHandler(Handler):
 
+    date_format = 'wayback'
+
     def __init__(self):
         Handler.__init__(self)
 
@@ -56,32 +54,27 @@ class LocHandler(Handler):
 
     def get_all_mementos(self, requri):
         changes = []
+        uris = ["http://webarchives.loc.gov/%s/*/%s" % (c, requri)
+                for c in self.colls]
+        colls = dict(zip(uris, self.colls))
 
-        for c in self.colls:
-            iauri = "http://webarchives.loc.gov/%s/*/%s" % (c, requri)
-
-            try:
-                req = self.request(iauri)
-                data = req.content
-            except Exception as e:
-                continue
-
-            try:
-                parser = etree.HTMLParser(recover=True)
-                dom = etree.parse(StringIO.StringIO(data), parser)
-            except Exception as e:
-                logging.error("Exception parsing data in loc handler: %s" % e)
-                continue
-
-            alist = dom.xpath('//a')
-
-            for a in alist:
-                loc = a.attrib.get('href', '')
+        # The collections are requested and parsed concurrently as they
+        # stream in, the ones failing being skipped.
+        for iauri, links in self.fetch_many(
+                uris, parse=self.parse_links, stream=True):
+            c = colls[iauri]
+            for loc, datestr in links:
                 if loc.startswith('http://webarchive.loc.gov/%s/' % c):
-
-                    # extract time from link
-                    m = self.datere.match(loc)
-                    if m and a.tail:
-                        datestr = m.groups()[0]
-                        changes.append((loc, datestr))
+                    changes.append((loc, datestr))
         return changes
+
+    def parse_links(self, req):
+        """Returns the (link, date string) pairs of the memento links."""
+        links = []
+        for a in iterparse(req, 'a', html=True):
+            loc = a.get('href', '')
+            # extract time from link
+            m = self.datere.match(loc)
+            if m and a.tail:
+                links.append((loc, m.groups()[0]))
+        return links
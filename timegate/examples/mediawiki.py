@@ -24,17 +24,42 @@ from timegate.utils import date_str
 
 class MediaWikiHandler(Handler):
 
+    date_format = 'iso8601'
+
     def __init__(self):
         Handler.__init__(self)
         self.TIMESTAMPFMT = '%Y%m%d%H%M%S'
 
-    # def getall(self, uri):
-    #     params = {
-    #         'rvlimit': 500,  # Max allowed
-    #         'continue': ''  # The initial continue value is empty
-    #     }
-    #
-    #     return self.query(uri, params)
+    def get_all_mementos(self, req_uri):
+        params = {
+            'rvlimit': 500,  # Max allowed
+            'rvdir': 'newer'  # List in increasing order
+        }
+        api = self.find_api(req_uri)
+        if api is None:
+            return None
+        return self.query(req_uri, params, *api)
+
+    def get_mementos_since(self, req_uri, since):
+        """Returns the mementos of the revisions at or after a datetime.
+
+        :param req_uri: The URI-R of the resource.
+        :param since: The datetime from which revisions are listed.
+        :return: The list of (URI-M, datetime) pairs, empty if there is no
+        new revision.
+        """
+        params = {
+            'rvlimit': 500,  # Max allowed
+            'rvstart': date_str(since, self.TIMESTAMPFMT),  # From here
+            'rvdir': 'newer'  # List in increasing order
+        }
+        api = self.find_api(req_uri)
+        if api is None:
+            # Not "no new revision": the cached TimeMap stays outdated.
+            raise HandlerError('Cannot reach the MediaWiki API.', 502)
+        # Only a page without revision since is empty: a missing page
+        # still raises a 404 HandlerError.
+        return self.query(req_uri, params, *api, allow_empty=True)
 
     def get_memento(self, req_uri, accept_datetime):
         timestamp = date_str(accept_datetime, self.TIMESTAMPFMT)
@@ -43,8 +68,18 @@ class MediaWikiHandler(Handler):
             'rvstart': timestamp,  # Start listing from here
             'rvdir': 'older'  # List in decreasing order
         }
+        api = self.find_api(req_uri)
+        if api is None:
+            return None
+        return self.query(req_uri, params, *api)
 
-        # Finds the API and title using scraping
+    def find_api(self, req_uri):
+        """Find the API and the title of a page by scraping it.
+
+        :param req_uri: The URI-R of the page.
+        :return: The ``(title, api_base_uri, base_uri)`` tuple, None if
+            the page cannot be parsed.
+        """
         api_base_uri = None
         try:
             dom = self.get_xml(req_uri, html=True)
@@ -79,10 +114,10 @@ class MediaWikiHandler(Handler):
             return None
 
         base_uri = api_base_uri.replace("api.php", "index.php")
+        return title, api_base_uri, base_uri
 
-        return self.query(req_uri, params, title, api_base_uri, base_uri)
-
-    def query(self, req_uri, req_params, title, api_base_uri, base_uri):
+    def query(self, req_uri, req_params, title, api_base_uri, base_uri,
+              allow_empty=False):
 
         params = {
             'action': 'query',
@@ -96,6 +131,7 @@ class MediaWikiHandler(Handler):
 
         # Does sequential queries to get all revisions IDs and Timestamps
         queries_results = []
+        missing = False
         condition = True
         while condition:
             # Clone original request
@@ -116,11 +152,11 @@ class MediaWikiHandler(Handler):
                 # The request was successful
                 # the JSON key of the page (only one)
                 pid = result['query']['pageids'][0]
-                queries_results += result['query']['pages'][pid]['revisions']
-                if ('missing' in result['query']['pages'][pid] or
-                        'invalid' in result['query']['pages'][pid]):
-                    raise HandlerError(
-                        "Cannot find resource on version server.", 404)
+                page = result['query']['pages'][pid]
+                if 'missing' in page or 'invalid' in page:
+                    missing = True
+                elif 'revisions' in page or not allow_empty:
+                    queries_results += page['revisions']
             except Exception as e:
                 if req_params['rvdir'] == 'older':
                     req_params['rvdir'] = 'newer'
@@ -128,13 +164,16 @@ class MediaWikiHandler(Handler):
                         req_uri, req_params, title, api_base_uri, base_uri)
                 else:
                     raise HandlerError("No revision returned from API.", 404)
+            if missing:
+                raise HandlerError(
+                    "Cannot find resource on version server.", 404)
             if 'continue' in result:
                 # The response was truncated, the rest can be obtained using
                 # &rvcontinue=ID
                 cont = result['continue']
                 # Modify it with the values returned in the 'continue' section
                 # of the last result.
-                newparams.update(cont)
+                params.update(cont)
                 condition = True
             else:
                 condition = False
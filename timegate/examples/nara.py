@@ -10,14 +10,9 @@
 
 from __future__ import absolute_import, print_function
 
-import logging
-import StringIO
 from datetime import datetime
 
-from lxml import etree
-
-from timegate.errors import HandlerError
-from timegate.handler import Handler
+from timegate.handler import Handler, iterparse
 
 
 class NaraHandler(Handler):
@@ -37,50 +32,32 @@ class NaraHandler(Handler):
     def get_all_mementos(self, requri):
         # implement the changes list for this particular proxy
         changes = []
+        uris = [self.baseuri + collection + "/*/" + requri
+                for collection in self.collections]
 
-        for collection in self.collections:
-            uri = self.baseuri + collection + "/*/" + requri
-            dom = self.get_xml(uri, html=True)
-
-            if dom:
-                rlist = dom.xpath('//*[@class="mainBody"]')
-                for td in rlist:
-                    if len(td.getchildren()) > 0:
-                        for a in td:
-                            if a.tag == 'a':
-                                loc = a.get('href')
-                                if not loc.startswith(self.baseuri):
-                                    if loc.startswith("/"):
-                                        loc = self.baseuri + loc[1:]
-                                    else:
-                                        loc = self.baseuri + loc
-                                dtstr = a.get('onclick').split("'")[1] + " GMT"
-
-                                # if a.tail:
-                                changes.append((loc, dtstr))
+        # The collections are requested and parsed concurrently as they
+        # stream in, the ones failing being skipped.
+        for uri, mementos in self.fetch_many(
+                uris, parse=self.parse_mementos, stream=True):
+            changes.extend(mementos)
 
         return changes
 
-    def get_xml(self, uri, html=False):
-        """Retrieves the resource using the url, parses it as XML or HTML and
-        returns the parsed dom object.
+    def parse_mementos(self, page):
+        """Parses the mementos of a collection page as it streams in.
 
-        :param uri: [str] The uri to retrieve
-        :param headers: [dict(header_name: value)] optional http headers to
-            send in the request.
-        :param html: [bool] optional flag to parse the response.
-        as HTML
-        :return: [lxml_obj] parsed dom.
+        :param page: The streamed response to parse.
+        :return: The list of (URI-M, date string) pairs.
         """
-
-        page = self.request(uri)
-        try:
-            page_data = page.content
-            if not html:
-                parser = etree.XMLParser(recover=True)
-            else:
-                parser = etree.HTMLParser(recover=True)
-            return etree.parse(StringIO.StringIO(page_data), parser)
-        except Exception as e:
-            logging.error("Cannot parse XML/HTML from %s" % uri)
-            raise HandlerError("Couldn't parse data from %s" % uri)
+        mementos = []
+        for a in iterparse(page, 'a', html=True):
+            if a.getparent().get('class') == 'mainBody':
+                loc = a.get('href')
+                if not loc.startswith(self.baseuri):
+                    if loc.startswith("/"):
+                        loc = self.baseuri + loc[1:]
+                    else:
+                        loc = self.baseuri + loc
+                dtstr = a.get('onclick').split("'")[1] + " GMT"
+                mementos.append((loc, dtstr))
+        return mementos
@@ -13,7 +13,6 @@
 from __future__ import absolute_import, print_function
 
 import cookielib
-import logging
 import StringIO
 import urllib2
 
@@ -79,21 +78,14 @@ class WebCiteHandler(Handler):
 
     def get_from_xml(self, requri):
         api_request = 'http://webcitation.org/query.php?returnxml=1&url=' + requri
-        xml = self.request(api_request, timeout=120)
-
-        try:
-            parser = etree.XMLParser(recover=True)  # Parses bad XML
-            dom = etree.parse(StringIO.StringIO(str(xml.text)), parser)
-        except Exception as e:
-            logging.error('Cannot parse XML: ' + str(e))
-            raise HandlerError('Cannot parse XML', 404)
 
         results = []
-        succes = dom.xpath("//result[@status='success']")
-        for s in succes:
-            url = s.find('webcite_url').text
-            date = s.find('timestamp').text
+        # Parses bad XML too, as it streams in
+        for s in self.iter_elements(api_request, 'result', timeout=120):
+            if s.get('status') == 'success':
+                url = s.findtext('webcite_url')
+                date = s.findtext('timestamp')
 
-            results.append((url, date))
+                results.append((url, date))
 
         return results
@@ -26,6 +26,8 @@ from timegate.utils import date_str
 
 class WikipediaHandler(Handler):
 
+    date_format = 'iso8601'
+
     def __init__(self):
         Handler.__init__(self)
         self.TIMESTAMPFMT = '%Y%m%d%H%M%S'
@@ -13,15 +13,30 @@
 from __future__ import absolute_import, print_function
 
 import logging
-from operator import itemgetter
+import re
+import time
+from concurrent import futures
+from datetime import datetime
 
 import requests
+from dateutil.tz import tzutc
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+from werkzeug.utils import cached_property
 
 from . import utils as timegate_utils
-from ._compat import quote
-from .config import Config
-from .constants import API_TIME_OUT, TM_MAX_SIZE
+from .constants import (API_TIME_OUT, FETCH_DEADLINE, FETCH_MAX_WORKERS,
+                        HTTP_BACKOFF_FACTOR, HTTP_MAX_RETRIES,
+                        HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, TM_MAX_SIZE)
 from .errors import HandlerError
+from .timemap import TimeMap
+
+PAGE_REX = re.compile(r'([?&]page=)(\d+)')
+"""Page number in the query of a paginated API listing."""
+
+PARSE_CHUNK_SIZE = 64 * 1024
+"""Bytes of a streamed response fed to the parser at a time."""
 
 
 class Handler(object):
@@ -29,53 +44,315 @@ class Handler(object):
     # Disables all 'requests' module event logs that are at least not WARNINGS
     logging.getLogger('requests').setLevel(logging.WARNING)
 
-    def request(self, resource, timeout=API_TIME_OUT, **kwargs):
+    # Outgoing requests settings
+    user_agent = None
+    timeout = API_TIME_OUT
+    headers = {}
+
+    # Connection pool and retries of the HTTP session
+    pool_connections = HTTP_POOL_CONNECTIONS
+    pool_maxsize = HTTP_POOL_MAXSIZE
+    max_retries = HTTP_MAX_RETRIES
+    backoff_factor = HTTP_BACKOFF_FACTOR
+
+    # Concurrent requests of fetch_many
+    fetch_max_workers = FETCH_MAX_WORKERS
+    fetch_deadline = FETCH_DEADLINE
+
+    # Format of the dates returned, a name of timegate.utils.DATE_FORMATS
+    # or a strptime format. Dates are parsed faster when it is known.
+    date_format = None
+
+    # Whether the mementos returned are (str, datetime) pairs with valid
+    # URIs, which are then not validated, naive datetimes being UTC.
+    # Returning a TimeMap is trusted.
+    trusted = False
+
+    def configure(self, config):
+        """Apply the application configuration to the handler.
+
+        It is called once, when the handler is loaded by the application,
+        so that requests do not look the configuration up.
+
+        :param config: The application ``Config``.
+        """
+        self.user_agent = config.get('USER_AGENT')
+        self.timeout = config['API_TIME_OUT']
+        self.pool_connections = config['HTTP_POOL_CONNECTIONS']
+        self.pool_maxsize = config['HTTP_POOL_MAXSIZE']
+        self.max_retries = config['HTTP_MAX_RETRIES']
+        self.backoff_factor = config['HTTP_BACKOFF_FACTOR']
+        self.fetch_max_workers = config['FETCH_MAX_WORKERS']
+        self.fetch_deadline = config['FETCH_DEADLINE']
+        # The session and the pool are built again with the new settings.
+        self.__dict__.pop('session', None)
+        self.__dict__.pop('_fetch_executor', None)
+
+    @cached_property
+    def session(self):
+        """HTTP session keeping the connections to the APIs alive.
+
+        It is shared by the threads of the process and built on first use,
+        after the server forked its workers.
+        """
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        # Sent with every request, along with the headers of the request.
+        session.headers.update(self.headers)
+        if self.user_agent:
+            session.headers['User-Agent'] = self.user_agent
+        return session
+
+    @cached_property
+    def _fetch_executor(self):
+        """Threads sending the requests of :meth:`fetch_many`."""
+        return futures.ThreadPoolExecutor(self.fetch_max_workers)
+
+    def fetch_many(self, uris, parse=None, deadline=None, **kwargs):
+        """Request several resources concurrently.
+
+        The requests run on a pool of ``fetch_max_workers`` threads shared
+        by the calls. Failed requests and the ones not answered before the
+        deadline are logged and left out: the results are partial.
+
+        :param uris: The URIs of the resources to get.
+        :param parse: (Optional) Callable applied to each response in the
+            pool, e.g. to parse it. The result is what it returns.
+        :param deadline: (Optional) Time in seconds after which pending
+            requests are given up. Defaults to ``fetch_deadline``.
+        :param kwargs: The keywords arguments to pass to :meth:`request`.
+        :return: The list of ``(uri, result)`` pairs of the successful
+            requests, in the order of *uris*. The result is the response
+            when there is no *parse* callable.
+        """
+        if deadline is None:
+            deadline = self.fetch_deadline
+        fetches = [(uri, self._fetch_executor.submit(
+            self._fetch, uri, parse, kwargs)) for uri in uris]
+        futures.wait([future for (_, future) in fetches], timeout=deadline)
+
+        results = []
+        for uri, future in fetches:
+            if not future.done():
+                future.cancel()
+                logging.warning('Request for %s given up after %ss',
+                                uri, deadline)
+            elif future.exception() is not None:
+                logging.warning('Request for %s failed: %s',
+                                uri, future.exception())
+            else:
+                results.append((uri, future.result()))
+        return results
+
+    def fetch_pages(self, uri, parse, deadline=None, **kwargs):
+        """Request all the pages of a paginated API listing.
+
+        When the ``Link`` header of the first page gives the ``last`` page,
+        the other pages are requested concurrently with :meth:`fetch_many`.
+        Otherwise the ``next`` links are followed one page at a time.
+
+        :param uri: The URI of the first page.
+        :param parse: Callable returning the list of items of a page
+            response. It raises a ``HandlerError`` for error responses.
+        :param deadline: (Optional) Time in seconds to retrieve all the
+            pages in. Defaults to ``fetch_deadline``.
+        :param kwargs: The keywords arguments to pass to :meth:`request`.
+        :return: The list of the items of all the pages, in page order.
+        :raises HandlerError: if a page cannot be retrieved, or if the pages
+            are not all retrieved in time.
+        """
+        if deadline is None:
+            deadline = self.fetch_deadline
+        end = time.time() + deadline
+        timeout_error = HandlerError(
+            'Resource too big to be served: its pages were not all '
+            'retrieved in %s seconds.' % deadline, 502)
+
+        response = self.request(uri, **kwargs)
+        items = list(parse(response))
+
+        uris = page_uris(response.links.get('last', {}).get('url'))
+        if uris:
+            errors = []
+
+            def parse_page(page):
+                try:
+                    return list(parse(page))
+                except HandlerError as e:
+                    errors.append(e)
+                    raise
+
+            pages = dict(self.fetch_many(
+                uris, parse_page, deadline=max(end - time.time(), 0),
+                **kwargs))
+            if len(pages) < len(uris):
+                if errors:
+                    raise errors[0]
+                if time.time() >= end:
+                    raise timeout_error
+                # The requests that failed are logged by fetch_many.
+                raise HandlerError('Cannot request version server.', 502)
+            for page_uri in uris:
+                items.extend(pages[page_uri])
+            return items
+
+        next_uri = response.links.get('next', {}).get('url')
+        while next_uri:
+            if time.time() > end:
+                raise timeout_error
+            response = self.request(next_uri, **kwargs)
+            items.extend(parse(response))
+            next_uri = response.links.get('next', {}).get('url')
+        return items
+
+    def iter_elements(self, uri, tags, html=False, **kwargs):
+        """Request an XML or HTML resource and parse it as it streams in.
+
+        See :func:`iterparse`. To parse several resources concurrently,
+        pass ``stream=True`` and :func:`iterparse` to :meth:`fetch_many`.
+
+        :param uri: The URI of the resource.
+        :param tags: The tag or tags of the elements to yield.
+        :param html: (Optional) Parse the resource as HTML.
+        :param kwargs: The keywords arguments to pass to :meth:`request`.
+        :return: An iterator over the elements.
+        """
+        return iterparse(self.request(uri, stream=True, **kwargs), tags,
+                         html=html)
+
+    def _fetch(self, uri, parse, kwargs):
+        response = self.request(uri, **kwargs)
+        return parse(response) if parse else response
+
+    def request(self, resource, timeout=None, **kwargs):
         """Handler helper function.
 
         Requests the resource over HTTP. Logs the request and handles
         exceptions.
 
         :param resource: The resource to get.
-        :param timeout: The HTTP Timeout for a single request.
+        :param timeout: (Optional) The HTTP Timeout for a single request.
+            Defaults to the ``api_time_out`` configuration.
         :param kwargs: The keywords arguments to pass to the request method
-            (``params``). These keywords will have their special character
-            escaped using %-encoding. Do not pass already-encoded chars.
+            (``params``, ``headers``...). The ``params`` will have their
+            special character escaped using %-encoding. Do not pass
+            already-encoded chars.
         :return: A requests response object.
         :raises HandlerError: if the requests fails to access the API.
         """
         uri = resource
-        config = Config(None)
-        user_agent = config.get("USER_AGENT")
-        headers = {}
-        if user_agent:
-            headers["User-Agent"] = user_agent
-
-        # Request logging with params
-        try:
-            logging.info('Sending request for %s?%s' % (
-                uri, '&'.join(map(lambda k_v: '%s=%s' % (
-                    quote(str(k_v[0])), quote(str(k_v[1]))
-                ), kwargs['params'].items()))))
-        except Exception:
-            # Key errors on 'params'
-            logging.info('Sending request for %s' % uri)
+        if timeout is None:
+            timeout = self.timeout
+        # Formatted only if the message is emitted.
+        logging.info('Sending request for %s params=%s', uri,
+                     kwargs.get('params'),
+                     extra={'uri': uri, 'params': kwargs.get('params')})
 
         try:
-            req = requests.get(uri, timeout=timeout, headers=headers, **kwargs)
+            req = self.session.get(uri, timeout=timeout, **kwargs)
         except Exception as e:
-            logging.error('Cannot request server (%s): %s' % (uri, e))
+            logging.error('Cannot request server (%s): %s', uri, e)
             raise HandlerError('Cannot request version server.', 502)
 
         if req is None:
-            logging.error('Error requesting server (%s): %s' % uri)
+            logging.error('Error requesting server (%s)', uri)
             raise HandlerError('Error requesting version server.', 404)
 
         if not req:
-            logging.info('Response other than 2XX: %s' % req)
+            logging.info('Response other than 2XX: %s', req,
+                         extra={'uri': uri, 'status': req.status_code})
             # raise HandlerError('API response not 2XX', 404)
         return req
 
 
+def page_uris(last_uri):
+    """Return the URIs of the pages after the first one of a listing.
+
+    :param last_uri: The URI of the last page, with a ``page`` parameter.
+    :return: The URIs of pages 2 to the last one, empty if the page number
+        is unknown.
+    """
+    match = PAGE_REX.search(last_uri or '')
+    if not match:
+        return []
+    return [PAGE_REX.sub(r'\g<1>%d' % page, last_uri, count=1)
+            for page in range(2, int(match.group(2)) + 1)]
+
+
+def iterparse(response, tags, html=False, chunk_size=PARSE_CHUNK_SIZE):
+    """Parse a response incrementally, yielding the elements of some tags.
+
+    The body is fed to the parser as it is read, so the first elements
+    are yielded before the whole body is received, e.g. when the response
+    is requested with ``stream=True``. An element is yielded once its
+    ``tail`` text is parsed; it is then cleared with the elements before
+    it, so read what is needed from it before getting the next one.
+
+    :param response: The requests response.
+    :param tags: The tag or tags of the elements to yield, with their
+        ``{namespace}`` if any. HTML tags are lowercase.
+    :param html: (Optional) Parse the response as HTML.
+    :param chunk_size: (Optional) The number of bytes fed at a time.
+    :return: An iterator over the elements, in document order.
+    :raises HandlerError: if the response cannot be parsed.
+    """
+    if not isinstance(tags, (list, tuple, set, frozenset)):
+        tags = (tags, )
+    if html:
+        parser = etree.HTMLPullParser(events=('start', 'end'))
+    else:
+        parser = etree.XMLPullParser(events=('start', 'end'), recover=True)
+
+    def events():
+        for chunk in response.iter_content(chunk_size):
+            parser.feed(chunk)
+            for event in parser.read_events():
+                yield event
+        parser.close()
+        for event in parser.read_events():
+            yield event
+
+    pending = None
+    try:
+        for event, element in events():
+            if pending is not None:
+                # The tail of the pending element ended with this event.
+                yield pending
+                _release(pending)
+                pending = None
+            if event == 'end' and element.tag in tags:
+                pending = element
+        if pending is not None:
+            yield pending
+            _release(pending)
+    except etree.LxmlError as e:
+        logging.error('Cannot parse XML/HTML from %s: %s', response.url, e)
+        raise HandlerError('Cannot parse data from %s' % response.url, 502)
+    finally:
+        response.close()
+
+
+def _release(element):
+    """Clear a parsed element and delete the elements before it."""
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
 def parsed_request(handler_function, *args, **kwargs):
     """Retrieve and parse the response from the ``Handler``.
 
@@ -84,37 +361,117 @@ def parsed_request(handler_function, *args, **kwargs):
     :param handler_function: The function to call.
     :param args: Arguments to :handler_function:
     :param kwargs: Keywords arguments to :handler_function:
-    :return: A sorted [(URI_str, date_obj),...] list of all Mementos.
+    :return: A sorted ``TimeMap`` of all Mementos.
         In the response, and all URIs/dates are valid.
     :raise HandlerError: In case of a bad response from the handler.
     """
+    handler_response = _call_handler(handler_function, *args, **kwargs)
+    mementos = _parse_response(handler_response, handler_of(handler_function))
+    if not mementos:
+        raise HandlerError('Not Found: Handler response Empty.', 404)
+    return mementos
+
+
+def parsed_since_request(handler_function, uri_r, since):
+    """Retrieve and parse the mementos of a resource since a datetime.
+
+    Unlike :func:`parsed_request`, an empty response is valid: there is
+    no new memento.
+
+    :param handler_function: The ``get_mementos_since`` function to call.
+    :param uri_r: The URI-R of the resource.
+    :param since: The datetime from which mementos are requested.
+    :return: A sorted, possibly empty, ``TimeMap`` of the new Mementos.
+    :raise HandlerError: In case of a bad response from the handler.
+    """
+    handler_response = _call_handler(handler_function, uri_r, since)
+    return _parse_response(handler_response, handler_of(handler_function))
+
+
+def _call_handler(handler_function, *args, **kwargs):
+    """Call a handler function, turning its errors into HandlerErrors."""
     try:
-        handler_response = handler_function(*args, **kwargs)
+        return handler_function(*args, **kwargs)
     except HandlerError as he:
-        logging.info('Handler raised HandlerError %s' % he)
+        logging.info('Handler raised HandlerError %s', he)
         raise he  # HandlerErrors have return data.
     except Exception as e:
-        logging.error('Handler raised exception %s' % e)
+        logging.error('Handler raised exception %s', e)
         raise HandlerError('Error in Handler', 503)
 
-    # Input check
+
+def handler_of(handler_function):
+    """Return the handler of a method, None for other functions."""
+    return getattr(handler_function, '__self__', None)
+
+
+def _parse_response(handler_response, handler=None):
+    """Validate a handler response and sort it.
+
+    :param handler_response: A ``(uri_m, date)`` pair, a ``TimeMap`` or
+        an iterable of pairs, e.g. a generator, consumed lazily.
+    :param handler: (Optional) The handler which returned the response.
+    :return: The sorted, possibly empty, ``TimeMap``.
+    :raise HandlerError: In case of a bad response from the handler.
+    """
     if not handler_response:
-        raise HandlerError('Not Found: Handler response Empty.', 404)
-    elif isinstance(handler_response, tuple):
-        handler_response = [handler_response]
-    elif not (isinstance(handler_response, list) and
-              isinstance(handler_response[0], tuple)):
-        logging.error('Bad response from Handler: Not a tuple nor tuple array')
-        raise HandlerError('Bad handler response.', 503)
-    elif len(handler_response) > TM_MAX_SIZE:
-        logging.warning(
-            'Bad response from Handler: TimeMap (%d  greater than max %d)' %
-            (len(handler_response), TM_MAX_SIZE))
-        raise HandlerError('Handler response too big and unprocessable.', 502)
-
-    valid_response = [(
-        timegate_utils.validate_uristr(url),
-        timegate_utils.validate_date(date)
-    ) for (url, date) in handler_response or []]
-    # Sort by datetime
-    return sorted(valid_response, key=itemgetter(1))
+        return TimeMap()
+    if isinstance(handler_response, TimeMap):
+        mementos = handler_response
+    else:
+        if isinstance(handler_response, tuple):
+            handler_response = [handler_response]
+        if getattr(handler, 'trusted', False):
+            handler_response = _aware(handler_response)
+        else:
+            handler_response = _validated(
+                handler_response, getattr(handler, 'date_format', None))
+        try:
+            # Sort by datetime
+            mementos = TimeMap.from_mementos(_bounded(handler_response))
+        except HandlerError as he:
+            raise he
+        except Exception as e:
+            logging.error('Bad response from Handler: %s', e)
+            raise HandlerError('Bad handler response.', 503)
+
+    if len(mementos) > TM_MAX_SIZE:
+        _too_big()
+    return mementos
+
+
+def _validated(mementos, date_format=None):
+    """Validate the URIs and parse the dates of ``(uri_m, date)`` pairs.
+
+    Dates which are already datetimes are kept, naive ones being UTC.
+    """
+    parse_date = timegate_utils.date_parser(date_format)
+    for (url, date) in mementos:
+        if not isinstance(date, datetime):
+            date = parse_date(date)
+        elif date.tzinfo is None:
+            date = date.replace(tzinfo=tzutc())
+        yield (timegate_utils.validate_uristr(url), date)
+
+
+def _aware(mementos):
+    """Make the naive datetimes of ``(uri_m, datetime)`` pairs UTC."""
+    for (url, date) in mementos:
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=tzutc())
+        yield (url, date)
+
+
+def _bounded(mementos):
+    """Iterate over mementos, failing past ``TM_MAX_SIZE`` of them."""
+    for count, memento in enumerate(mementos):
+        if count == TM_MAX_SIZE:
+            _too_big()
+        yield memento
+
+
+def _too_big():
+    """Raise the error of a handler response above ``TM_MAX_SIZE``."""
+    logging.warning('Bad response from Handler: TimeMap greater than max %d',
+                    TM_MAX_SIZE)
+    raise HandlerError('Handler response too big and unprocessable.', 502)
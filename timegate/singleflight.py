@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Coalescing of concurrent calls for the same key."""
+
+from __future__ import absolute_import, print_function
+
+import errno
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+class _Call(object):
+    """A call in flight and its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Run at most one call per key at a time and share its outcome.
+
+    Within a process, threads asking for a key that is already being
+    computed wait for that call and get its result (or its exception).
+    When a lock directory is given, the processes of a node also take
+    turns through lock files, and a process that waited checks whether
+    the result is now available (e.g. in a shared cache) before calling.
+    """
+
+    def __init__(self, lock_dir=None, timeout=120):
+        """Constructor method.
+
+        :param lock_dir: (Optional) Directory of the lock files shared by
+        the processes. When None, calls are only coalesced per process.
+        :param timeout: (Optional) How long, in seconds, to wait for
+        another call before making the call anyway.
+        """
+        self.lock_dir = lock_dir if fcntl else None
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        if self.lock_dir:
+            try:
+                os.makedirs(self.lock_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def do(self, key, function, check=None):
+        """Return the result of ``function()``, called once per key.
+
+        :param key: The key identifying the call, e.g. a URI-R.
+        :param function: Callable making the call.
+        :param check: (Optional) Callable returning the result if it is
+        already available, None otherwise. It is called after waiting for
+        another process.
+        :return: The result of the call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(self.timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            logging.warning('Gave up waiting for the call of %s' % key)
+            return function()
+
+        try:
+            call.result = self._call_locked(key, function, check)
+            return call.result
+        except Exception:
+            call.error = sys.exc_info()[1]
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _call_locked(self, key, function, check):
+        """Call the function holding the lock file of the key."""
+        if not self.lock_dir:
+            return function()
+
+        f, waited = self._acquire(key)
+        if f is None:
+            return function()
+        try:
+            if waited and check is not None:
+                result = check()
+                if result is not None:
+                    return result
+            return function()
+        finally:
+            self._release(f)
+
+    def _lock_path(self, key):
+        """Return the path of the lock file of a key."""
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        return os.path.join(self.lock_dir,
+                            hashlib.md5(key).hexdigest() + '.lock')
+
+    def _acquire(self, key):
+        """Lock the lock file of a key, waiting for other processes.
+
+        Lock files are deleted when released, so a lock taken on a file
+        that was deleted meanwhile is taken again on the new one.
+
+        :return: The ``(file, waited)`` tuple, the file being None if the
+            lock was not taken within ``timeout``.
+        """
+        path = self._lock_path(key)
+        waited = False
+        deadline = time.time() + self.timeout
+        while True:
+            f = open(path, 'a')
+            try:
+                while True:
+                    try:
+                        fcntl.flock(f.fileno(),
+                                    fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except (IOError, OSError) as e:
+                        if e.errno not in (errno.EAGAIN, errno.EACCES):
+                            raise
+                    if time.time() > deadline:
+                        logging.warning(
+                            'Gave up waiting for the lock of %s' % key)
+                        f.close()
+                        return None, waited
+                    waited = True
+                    time.sleep(0.05)
+                try:
+                    current = os.stat(path).st_ino
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+                    current = None
+            except Exception:
+                f.close()
+                raise
+            if current == os.fstat(f.fileno()).st_ino:
+                return f, waited
+            f.close()
+
+    @staticmethod
+    def _release(f):
+        """Delete a lock file and unlock it."""
+        try:
+            os.unlink(f.name)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            f.close()
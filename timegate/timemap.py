@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of TimeGate.
+# Copyright (C) 2016 CERN.
+#
+# TimeGate is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Compact representation of a sorted TimeMap."""
+
+from __future__ import absolute_import, print_function
+
+import calendar
+import math
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from operator import itemgetter
+
+from dateutil.tz import tzutc
+from werkzeug.http import http_date
+
+try:
+    array('q')
+    TIMESTAMP_TYPECODE = 'q'
+except ValueError:  # pragma: no cover
+    # Python 2 has no 'q' code, 'l' is 64 bits on LP64 platforms.
+    TIMESTAMP_TYPECODE = 'l'
+
+EPOCH = datetime(1970, 1, 1, tzinfo=tzutc())
+
+MAGIC = b'TGTM'
+"""First bytes of a serialized TimeMap."""
+
+VERSION = 1
+"""Version of the serialization format written by :func:`dumps`."""
+
+PREFIX_COMPRESSION = 0x01
+"""Flag set when the URIs are stored as suffixes of the previous URI."""
+
+_HEADER = struct.Struct('<4sBBxxI')
+
+_UNPLAIN_URI = re.compile(r'[^\x20\x21\x23-\x5b\x5d-\x7e]')
+_UNPLAIN_URI_BYTES = re.compile(br'[^\x20\x21\x23-\x5b\x5d-\x7e]')
+
+
+def to_timestamp(dt):
+    """Return the POSIX timestamp of a datetime, naive ones being UTC.
+
+    :param dt: The datetime object.
+    :return: The number of seconds since the epoch, as a float when the
+        datetime has microseconds.
+    """
+    seconds = calendar.timegm(dt.utctimetuple())
+    if dt.microsecond:
+        return seconds + dt.microsecond / 1e6
+    return seconds
+
+
+def from_timestamp(timestamp):
+    """Return the UTC datetime of a POSIX timestamp."""
+    return EPOCH + timedelta(seconds=timestamp)
+
+
+def closest_index(keys, key):
+    """Return the index of the closest key in a sorted sequence.
+
+    Of equally close keys, the latest one is chosen.
+
+    :param keys: A sorted, non empty, sequence.
+    :param key: The key to look for.
+    :return: The index of the closest key.
+    """
+    first_after = bisect_left(keys, key)
+    if first_after == len(keys):
+        return first_after - 1
+    # The latest key sharing the first value at or after the key.
+    after = bisect_right(keys, keys[first_after], first_after) - 1
+    before = first_after - 1
+    if before >= 0 and key - keys[before] < keys[after] - key:
+        return before
+    return after
+
+
+def closest_before_index(keys, key):
+    """Return the index of the latest key at or before a key.
+
+    :param keys: A sorted, non empty, sequence.
+    :param key: The key to look for.
+    :return: The index of the closest key before, or 0 if there is none.
+    """
+    return max(bisect_right(keys, key) - 1, 0)
+
+
+def _array(typecode, data=b''):
+    """Build an array from little-endian bytes."""
+    values = array(typecode)
+    if hasattr(values, 'frombytes'):
+        values.frombytes(data)
+    else:  # pragma: no cover
+        values.fromstring(bytes(data))
+    if sys.byteorder != 'little':  # pragma: no cover
+        values.byteswap()
+    return values
+
+
+def _array_bytes(values):
+    """Return the little-endian bytes of an array."""
+    if sys.byteorder != 'little':  # pragma: no cover
+        values = array(values.typecode, values)
+        values.byteswap()
+    if hasattr(values, 'tobytes'):
+        return values.tobytes()
+    return values.tostring()  # pragma: no cover
+
+
+def _offsets(lengths):
+    """Return the ``uint32`` offsets delimiting consecutive chunks."""
+    offsets = _array('I')
+    offset = 0
+    offsets.append(offset)
+    for length in lengths:
+        offset += length
+        offsets.append(offset)
+    return offsets
+
+
+def _uris_size(uris):
+    """Return the estimated memory used by a list of URIs, in bytes."""
+    # Pointer in the list and string object header for each URI.
+    return sum(len(uri) + 57 for uri in uris)
+
+
+class TimeMap(object):
+    """Sorted TimeMap stored as parallel URI and timestamp arrays.
+
+    It behaves like the sorted ``[(uri_m, datetime), ...]`` list it
+    replaces: indexing and iterating yield ``(uri_m, datetime)`` tuples.
+    """
+
+    __slots__ = ('_uris', '_uris_size', 'timestamps', '_blob', '_offsets')
+
+    def __init__(self, uris=None, timestamps=None):
+        """Build a TimeMap from already sorted columns.
+
+        :param uris: List of URI-M strings.
+        :param timestamps: Ascending POSIX timestamps, one per URI-M.
+        """
+        self._uris = list(uris or [])
+        self._uris_size = _uris_size(self._uris)
+        self.timestamps = array(TIMESTAMP_TYPECODE, timestamps or [])
+        self._blob = self._offsets = None
+        if len(self._uris) != len(self.timestamps):
+            raise ValueError('TimeMap columns must have the same length.')
+
+    @classmethod
+    def from_mementos(cls, mementos):
+        """Build a TimeMap from ``(uri_m, datetime)`` pairs in any order.
+
+        :param mementos: Iterable of ``(uri_m, datetime)`` pairs.
+        :return: The sorted ``TimeMap``.
+        """
+        if isinstance(mementos, cls):
+            return mementos
+        mementos = sorted(mementos, key=itemgetter(1))
+        return cls([uri for (uri, _) in mementos],
+                   [int(math.floor(to_timestamp(dt)))
+                    for (_, dt) in mementos])
+
+    @classmethod
+    def _from_blob(cls, timestamps, blob, offsets):
+        """Build a TimeMap decoding its URIs from a blob on demand."""
+        timemap = cls.__new__(cls)
+        timemap._uris = timemap._uris_size = None
+        timemap.timestamps = timestamps
+        timemap._blob = blob
+        timemap._offsets = offsets
+        return timemap
+
+    @property
+    def uris(self):
+        """List of the URI-Ms."""
+        uris = self._uris
+        if uris is None:
+            # The blob is kept: other threads may be decoding from it.
+            uris = [self._uri(i) for i in range(len(self))]
+            # Measured once, before the URIs are visible to nbytes.
+            self._uris_size = _uris_size(uris)
+            self._uris = uris
+        return uris
+
+    def _uri(self, index):
+        if self._blob is None:
+            return self._uris[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('TimeMap index out of range')
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._blob[start:end].decode('utf-8')
+
+    @property
+    def first(self):
+        """The first memento, ``None`` if the TimeMap is empty."""
+        return self[0] if len(self) else None
+
+    @property
+    def last(self):
+        """The last memento, ``None`` if the TimeMap is empty."""
+        return self[-1] if len(self) else None
+
+    @property
+    def uris_nbytes(self):
+        """Total length of the URI-Ms encoded in UTF-8, in bytes.
+
+        It is read from the offsets of the TimeMaps loaded from the cache.
+        """
+        if self._blob is not None:
+            return self._offsets[-1]
+        return sum(len(uri.encode('utf-8')) for uri in self._uris)
+
+    @property
+    def plain_uris(self):
+        """Whether the URI-Ms are printable ASCII without ``"`` or ``\\``.
+
+        Such URIs are written as they are in JSON strings.
+        """
+        if self._blob is not None:
+            return not _UNPLAIN_URI_BYTES.search(self._blob)
+        return not any(_UNPLAIN_URI.search(uri) for uri in self._uris)
+
+    def iter_uris(self):
+        """Iterate over the URI-Ms without decoding them all at once."""
+        uris = self._uris
+        if uris is not None:
+            return iter(uris)
+        return (self._uri(i) for i in range(len(self)))
+
+    @property
+    def nbytes(self):
+        """Estimated memory used by the TimeMap, in bytes.
+
+        It grows when the URIs of a TimeMap loaded from the cache are all
+        decoded, as they are then kept alongside their blob.
+        """
+        size = self.timestamps.itemsize * len(self.timestamps)
+        if self._blob is not None:
+            size += (len(self._blob) +
+                     self._offsets.itemsize * len(self._offsets))
+        if self._uris_size is not None:
+            size += self._uris_size
+        return size
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            # Only the URIs of the slice are decoded.
+            uris = [self._uri(i) for i in range(*index.indices(len(self)))]
+            return self.__class__(uris, self.timestamps[index])
+        return (self._uri(index), from_timestamp(self.timestamps[index]))
+
+    def __iter__(self):
+        for uri, timestamp in zip(self.uris, self.timestamps):
+            yield (uri, from_timestamp(timestamp))
+
+    def __eq__(self, other):
+        if isinstance(other, TimeMap):
+            return (self.uris == other.uris and
+                    self.timestamps == other.timestamps)
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (self.__class__, (self.uris, self.timestamps))
+
+    def __repr__(self):
+        return '<{0} {1} mementos>'.format(self.__class__.__name__, len(self))
+
+    def merge(self, mementos):
+        """Return a TimeMap with the mementos of another one added.
+
+        Mementos present in both TimeMaps appear once. It is cheap when the
+        added mementos are all at or after the end of this TimeMap, e.g.
+        when they were retrieved since its last memento.
+
+        :param mementos: A ``TimeMap`` or ``(uri_m, datetime)`` pairs.
+        :return: The merged ``TimeMap``.
+        """
+        mementos = TimeMap.from_mementos(mementos)
+        if not len(mementos):
+            return self
+        start = bisect_left(self.timestamps, mementos.timestamps[0])
+        tail = set(zip(self.uris[start:], self.timestamps[start:]))
+        tail.update(zip(mementos.uris, mementos.timestamps))
+        tail = sorted(tail, key=itemgetter(1, 0))
+        return self.__class__(
+            self.uris[:start] + [uri for (uri, _) in tail],
+            list(self.timestamps[:start]) + [ts for (_, ts) in tail])
+
+    def index_range(self, start=None, until=None):
+        """Return the indices of the mementos between two datetimes.
+
+        :param start: (Optional) The earliest datetime, included.
+        :param until: (Optional) The latest datetime, included.
+        :return: The ``(first, end)`` indices of the mementos, the end
+            being excluded.
+        """
+        first, end = 0, len(self)
+        if start is not None:
+            first = bisect_left(self.timestamps, to_timestamp(start))
+        if until is not None:
+            end = bisect_right(self.timestamps, to_timestamp(until))
+        return first, max(first, end)
+
+    def http_dates(self):
+        """Iterate over the mementos datetimes formatted as HTTP dates."""
+        for timestamp in self.timestamps:
+            yield http_date(timestamp)
+
+    def closest(self, accept_datetime):
+        """Return the memento chronologically closest to a datetime.
+
+        See :func:`timegate.utils.closest`.
+        """
+        return self[closest_index(self.timestamps,
+                                  to_timestamp(accept_datetime))]
+
+    def closest_before(self, accept_datetime):
+        """Return the latest memento at or before a datetime.
+
+        See :func:`timegate.utils.closest_before`.
+        """
+        return self[closest_before_index(self.timestamps,
+                                         to_timestamp(accept_datetime))]
+
+
+class Page(object):
+    """Mementos of a TimeMap between two datetimes, at most a page of them.
+
+    Mementos sharing a datetime are always on the same page, so a page can
+    be bigger than the page size.
+    """
+
+    def __init__(self, timemap, start=None, until=None, size=0):
+        """Slice a page of a TimeMap.
+
+        :param timemap: The ``TimeMap``.
+        :param start: (Optional) The datetime of the first memento.
+        :param until: (Optional) The latest datetime of the mementos.
+        :param size: (Optional) The number of mementos per page. When 0,
+            all the mementos until *until* are on the page.
+        """
+        timestamps = timemap.timestamps
+        first, end = timemap.index_range(start, until)
+        last = end
+        self.start = start
+        self.until = until
+        self.prev = self.next = None
+        if size and end - first > size:
+            last = bisect_right(timestamps, timestamps[first + size - 1],
+                                first + size, end)
+            if last < end:
+                self.next = from_timestamp(timestamps[last])
+        if size and first > 0:
+            previous = bisect_left(timestamps,
+                                   timestamps[max(first - size, 0)])
+            self.prev = from_timestamp(timestamps[previous])
+        self.mementos = timemap[first:last]
+        self.has_first = first == 0
+        self.has_last = last == len(timemap)
+
+    @property
+    def complete(self):
+        """Whether the page is the whole TimeMap."""
+        return (self.start is None and self.until is None and
+                self.has_first and self.has_last)
+
+
+def dumps(timemap, compress=False):
+    """Serialize a TimeMap to its compact binary form.
+
+    The format is a header (magic, version, flags and count), the
+    timestamps as little-endian ``int64`` and the UTF-8 URIs as one blob
+    delimited by ``uint32`` offsets. With prefix compression, the blob
+    only holds what differs from the previous URI and a ``uint32`` array
+    gives the length of the shared prefix.
+
+    :param timemap: The ``TimeMap`` to serialize.
+    :param compress: (Optional) When true, URIs are prefix compressed.
+    :return: The bytes.
+    """
+    timemap = TimeMap.from_mementos(timemap)
+    uris = [uri.encode('utf-8') for uri in timemap.uris]
+    flags = 0
+    chunks = [None, _array_bytes(array('q', timemap.timestamps))]
+    if compress:
+        flags |= PREFIX_COMPRESSION
+        prefixes = _array('I')
+        previous = b''
+        suffixes = []
+        for uri in uris:
+            shared = 0
+            for a, b in zip(previous, uri):
+                if a != b:
+                    break
+                shared += 1
+            prefixes.append(shared)
+            suffixes.append(uri[shared:])
+            previous = uri
+        chunks.append(_array_bytes(prefixes))
+        uris = suffixes
+    chunks[0] = _HEADER.pack(MAGIC, VERSION, flags, len(uris))
+    chunks.append(_array_bytes(_offsets(len(uri) for uri in uris)))
+    chunks.extend(uris)
+    return b''.join(chunks)
+
+
+def loads(data):
+    """Deserialize a TimeMap written by :func:`dumps`.
+
+    Without prefix compression the URIs are only decoded when accessed,
+    so that looking up a few mementos does not decode all of them.
+
+    :param data: A bytes-like object, e.g. ``bytes`` or ``memoryview``.
+    :return: The ``TimeMap``.
+    :raises ValueError: If the data is not a supported serialized TimeMap.
+    """
+    data = memoryview(data)
+    try:
+        magic, version, flags, count = _HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError('Truncated TimeMap header.')
+    if magic != MAGIC:
+        raise ValueError('Not a serialized TimeMap.')
+    if version != VERSION:
+        raise ValueError('Unsupported TimeMap format version %d.' % version)
+
+    sizes = [8 * count, 4 * count if flags & PREFIX_COMPRESSION else 0,
+             4 * (count + 1)]
+    position = _HEADER.size
+    chunks = []
+    for size in sizes:
+        chunks.append(data[position:position + size])
+        position += size
+    timestamps = _array('q', chunks[0])
+    prefixes = _array('I', chunks[1]) if chunks[1] else None
+    offsets = _array('I', chunks[2])
+    if len(offsets) != count + 1 or len(data) < position + offsets[-1]:
+        raise ValueError('Truncated TimeMap data.')
+    blob = data[position:position + offsets[-1]].tobytes()
+    if TIMESTAMP_TYPECODE != 'q':  # pragma: no cover
+        timestamps = array(TIMESTAMP_TYPECODE, timestamps)
+
+    if not flags & PREFIX_COMPRESSION:
+        return TimeMap._from_blob(timestamps, blob, offsets)
+
+    uris = []
+    previous = b''
+    for i in range(count):
+        uri = previous[:prefixes[i]] + blob[offsets[i]:offsets[i + 1]]
+        uris.append(uri.decode('utf-8'))
+        previous = uri
+    return TimeMap(uris, timestamps)
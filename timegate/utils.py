@@ -13,6 +13,7 @@
 from __future__ import absolute_import, print_function
 
 import logging
+import re
 from datetime import datetime, timedelta
 
 from dateutil.parser import parse as parse_datestr
@@ -20,6 +21,7 @@ from dateutil.tz import tzutc
 
 from ._compat import urlparse
 from .errors import DateTimeError, URIRequestError
+from .timemap import TimeMap, closest_before_index, closest_index
 
 
 def validate_uristr(uristr):
@@ -35,13 +37,115 @@ def validate_uristr(uristr):
     return str(urlparse(uristr).geturl())
 
 
-def validate_date(datestr):
+UTC = tzutc()
+
+_MONTHS = dict((month, number + 1) for (number, month) in enumerate(
+    'Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec'.split()))
+
+_ISO8601_REX = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(?:\.(\d{1,6})\d*)?'
+    r'(?:Z|[+-]00:?00)?$')
+_WAYBACK_REX = re.compile(r'(\d{4})(\d\d)(\d\d)(\d\d)(\d\d)(\d\d)$')
+_RFC1123_REX = re.compile(
+    r'(?:[A-Z][a-z]{2}, )?(\d\d?) ([A-Z][a-z]{2}) (\d{4}) '
+    r'(\d\d):(\d\d):(\d\d) (?:GMT|UTC|\+0000)$')
+
+
+def parse_iso8601(datestr):
+    """Parse an ISO 8601 UTC datetime, e.g. ``2015-01-03T22:00:00Z``.
+
+    :raises ValueError: If the string is not in that format.
+    """
+    match = _ISO8601_REX.match(datestr)
+    if not match:
+        raise ValueError('Not an ISO 8601 UTC datetime: %r' % datestr)
+    year, month, day, hour, minute, second, fraction = match.groups()
+    return datetime(int(year), int(month), int(day), int(hour), int(minute),
+                    int(second), int((fraction or '0').ljust(6, '0')), UTC)
+
+
+def parse_wayback(datestr):
+    """Parse a Wayback timestamp of 14 digits, e.g. ``20150103220000``.
+
+    :raises ValueError: If the string is not in that format.
+    """
+    match = _WAYBACK_REX.match(datestr)
+    if not match:
+        raise ValueError('Not a 14 digits timestamp: %r' % datestr)
+    return datetime(*[int(value) for value in match.groups()], tzinfo=UTC)
+
+
+def parse_rfc1123(datestr):
+    """Parse an HTTP date, e.g. ``Sat, 03 Jan 2015 22:00:00 GMT``.
+
+    :raises ValueError: If the string is not in that format.
+    """
+    match = _RFC1123_REX.match(datestr)
+    if not match or match.group(2) not in _MONTHS:
+        raise ValueError('Not an RFC 1123 datetime: %r' % datestr)
+    day, month, year, hour, minute, second = match.groups()
+    return datetime(int(year), _MONTHS[month], int(day), int(hour),
+                    int(minute), int(second), tzinfo=UTC)
+
+
+DATE_FORMATS = {
+    'iso8601': parse_iso8601,
+    'wayback': parse_wayback,
+    'rfc1123': parse_rfc1123,
+}
+"""Parsers of the date formats handlers can declare, by name."""
+
+
+def parse_fuzzy(datestr):
+    """Parse a datetime in any format dateutil recognizes.
+
+    Time zones are ignored: the datetime is read as UTC.
+    """
+    return parse_datestr(datestr, fuzzy=True).replace(tzinfo=UTC)
+
+
+def date_parser(date_format=None):
+    """Return a function parsing date strings to UTC datetimes.
+
+    The common formats are parsed without dateutil: the format of the
+    last date parsed is tried first, then the others, then dateutil.
+
+    :param date_format: (Optional) The format the dates are expected in:
+        a name of :data:`DATE_FORMATS` or a ``strptime`` format, always
+        read as UTC. Other dates are still parsed.
+    :return: The function, taking the string and returning the datetime.
+    """
+    parsers = [parse_iso8601, parse_wayback, parse_rfc1123]
+    if date_format in DATE_FORMATS:
+        parsers.remove(DATE_FORMATS[date_format])
+        parsers.insert(0, DATE_FORMATS[date_format])
+    elif date_format:
+        parsers.insert(0, lambda datestr: datetime.strptime(
+            datestr, date_format).replace(tzinfo=UTC))
+
+    def parse(datestr):
+        for index, parser in enumerate(parsers):
+            try:
+                result = parser(datestr)
+            except (ValueError, TypeError):
+                continue
+            if index:
+                # The dates of a response usually share their format.
+                parsers.insert(0, parsers.pop(index))
+            return result
+        return parse_fuzzy(datestr)
+    return parse
+
+
+def validate_date(datestr, date_format=None):
     """Control and validate the date string.
 
     :param datestr: The date string representation.
+    :param date_format: (Optional) The format the date is expected in, see
+        :func:`date_parser`.
     :return: The datetime object form the parsed date string.
     """
-    return parse_datestr(datestr, fuzzy=True).replace(tzinfo=tzutc())
+    return date_parser(date_format)(datestr)
 
 
 def best(timemap, accept_datetime, timemap_type):
@@ -49,9 +153,9 @@ def best(timemap, accept_datetime, timemap_type):
     assert(timemap)
     assert(accept_datetime)
     if timemap_type == 'vcs':
-        return closest_before(timemap, accept_datetime)
+        return closest_before_binary(timemap, accept_datetime)
     else:
-        return closest(timemap, accept_datetime)
+        return closest_binary(timemap, accept_datetime)
 
 
 def closest(timemap, accept_datetime):
@@ -112,18 +216,36 @@ def closest_before(timemap, accept_datetime):
     return (prev_uri, prev_dt)
 
 
+class _Datetimes(object):
+    """Read-only sequence of the datetimes of a TimeMap, used for bisect."""
+
+    def __init__(self, timemap):
+        self.timemap = timemap
+
+    def __len__(self):
+        return len(self.timemap)
+
+    def __getitem__(self, index):
+        return self.timemap[index][1]
+
+
 def closest_binary(timemap, accept_datetime):
     """Finds the chronologically closest memento using binary search in a
     sorted list. Complexity O(log(n)) instead of O(n) Details of the
     requirements at http://www.mementoweb.org/guide/rfc/#SpecialCases, point
     4.5.3.
 
+    Ties are broken as in :func:`closest`: the latest of the equally close
+    mementos is returned.
+
     :param timemap: A sorted Timemap.
     :param accept_datetime: The time object for which the best memento
         must be found.
-    :return: The uri_m string of the closest memento.
+    :return: A tuple with memento URI and its datetime.
     """
-    # TODO implement
+    if isinstance(timemap, TimeMap):
+        return timemap.closest(accept_datetime)
+    return tuple(timemap[closest_index(_Datetimes(timemap), accept_datetime)])
 
 
 def closest_before_binary(timemap, accept_datetime):
@@ -133,9 +255,15 @@ def closest_before_binary(timemap, accept_datetime):
     instead of ``O(n)`` Details of the requirements at
     http://www.mementoweb.org/guide/rfc/#SpecialCases, point 4.5.3.
 
+    Ties are broken as in :func:`closest_before`: the latest memento at
+    or before the datetime, else the first one.
+
     :param timemap: A sorted Timemap.
     :param accept_datetime: The time object for which the best memento
         must be found.
-    :return: The uri_m string of the closest memento.
+    :return: A tuple with memento URI and its datetime.
     """
-    # TODO implement
+    if isinstance(timemap, TimeMap):
+        return timemap.closest_before(accept_datetime)
+    return tuple(timemap[closest_before_index(_Datetimes(timemap),
+                                              accept_datetime)])